@@ -1,10 +1,17 @@
 from django.contrib import admin
+from django.http import FileResponse
+from django.utils import timezone
 from django.utils.html import format_html
 from django import forms
 from .models import (
     Departamento, Empleado, Asistencia, TiempoExtra,
-    Visitante, RegistroVisita, ConfiguracionSistema, TipoHorario
+    Visitante, RegistroVisita, ConfiguracionSistema, TipoHorario, CorreoPendiente, ResumenDiario,
+    ArchivoPorEliminar
 )
+from .cache import invalidar_empleados
+from .gafetes import generar_pdf_gafetes
+from .horarios import recalcular_retardos
+from .resumenes import reconstruir_resumen_diario
 
 @admin.register(Departamento)
 class DepartamentoAdmin(admin.ModelAdmin):
@@ -38,27 +45,46 @@ class AsignarHorarioForm(forms.Form):
         help_text="Selecciona el tipo de horario a asignar"
     )
 
+# Formulario para la acción de recalcular retardos
+class RecalcularRetardosForm(forms.Form):
+    _selected_action = forms.CharField(widget=forms.MultipleHiddenInput)
+    desde = forms.DateField(label="Desde", widget=forms.DateInput(attrs={'type': 'date'}))
+    hasta = forms.DateField(label="Hasta", widget=forms.DateInput(attrs={'type': 'date'}))
+    dry_run = forms.BooleanField(
+        required=False,
+        label="Solo mostrar los cambios",
+        help_text="Lista las entradas que cambiarían sin modificar nada"
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        desde, hasta = cleaned_data.get('desde'), cleaned_data.get('hasta')
+        if desde and hasta and hasta < desde:
+            raise forms.ValidationError('La fecha final no puede ser anterior a la inicial')
+        return cleaned_data
+
 @admin.register(Empleado)
 class EmpleadoAdmin(admin.ModelAdmin):
     list_display = ['codigo_empleado', 'get_nombre', 'departamento', 'tipo_horario', 'tiempo_extra_habilitado', 'activo', 'ver_qr']
-    list_filter = ['activo', 'tiempo_extra_habilitado', 'departamento', 'tipo_horario']
+    list_filter = ['activo', 'baja_por_importacion', 'tiempo_extra_habilitado', 'departamento', 'tipo_horario']
     search_fields = ['codigo_empleado', 'user__first_name', 'user__last_name']
-    readonly_fields = ['qr_uuid', 'mostrar_qr']
-    actions = ['asignar_tipo_horario']
+    readonly_fields = ['qr_uuid', 'baja_por_importacion', 'mostrar_qr']
+    actions = ['asignar_tipo_horario', 'recalcular_retardos', 'imprimir_gafetes']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'departamento', 'tipo_horario')
 
     def get_nombre(self, obj):
         return obj.user.get_full_name()
     get_nombre.short_description = 'Nombre'
 
     def ver_qr(self, obj):
-        if obj.qr_code:
-            return format_html('<a href="{}" target="_blank">Ver QR</a>', obj.qr_code.url)
-        return '-'
+        return format_html('<a href="{}" target="_blank">Ver QR</a>', obj.url_imagen_qr())
     ver_qr.short_description = 'Código QR'
 
     def mostrar_qr(self, obj):
-        if obj.qr_code:
-            return format_html('<img src="{}" style="max-width: 300px;"/>', obj.qr_code.url)
+        if obj.pk:
+            return format_html('<img src="{}" style="max-width: 300px;"/>', obj.url_imagen_qr())
         return '-'
     mostrar_qr.short_description = 'Código QR'
 
@@ -89,10 +115,13 @@ class EmpleadoAdmin(admin.ModelAdmin):
                 # Filtrar empleados por los IDs
                 empleados_a_actualizar = queryset.model.objects.filter(pk__in=selected_ids)
                 count = empleados_a_actualizar.update(tipo_horario=tipo_horario)
+                # update() no dispara señales: vaciar el caché de QR manualmente
+                invalidar_empleados()
 
                 self.message_user(
                     request,
-                    f'Se asignó el tipo de horario "{tipo_horario.nombre}" a {count} empleado(s) exitosamente.',
+                    f'Se asignó el tipo de horario "{tipo_horario.nombre}" a {count} empleado(s) exitosamente. '
+                    f'Usa "Recalcular retardos" para aplicarlo a sus checadas anteriores.',
                     messages.SUCCESS
                 )
                 return redirect(request.get_full_path())
@@ -114,6 +143,69 @@ class EmpleadoAdmin(admin.ModelAdmin):
 
     asignar_tipo_horario.short_description = 'Asignar tipo de horario a empleados seleccionados'
 
+    def recalcular_retardos(self, request, queryset):
+        """Acción para recalcular los retardos de un rango de fechas con los horarios vigentes"""
+        from django.shortcuts import render, redirect
+        from django.contrib import messages
+
+        if 'apply' in request.POST:
+            form = RecalcularRetardosForm(request.POST)
+
+            if form.is_valid():
+                selected_ids = [int(pk) for pk in request.POST.getlist('_selected_action')]
+                resultado = recalcular_retardos(
+                    form.cleaned_data['desde'],
+                    form.cleaned_data['hasta'],
+                    selected_ids,
+                    dry_run=form.cleaned_data['dry_run'],
+                )
+
+                if form.cleaned_data['dry_run']:
+                    codigos = dict(queryset.model.objects.filter(pk__in=selected_ids).values_list('pk', 'codigo_empleado'))
+                    context = {
+                        'title': 'Recalcular Retardos',
+                        'queryset': queryset,
+                        'form': form,
+                        'resultado': resultado,
+                        'cambios': [(codigos.get(cambio.empleado_id), cambio) for cambio in resultado.cambios[:500]],
+                        'opts': self.model._meta,
+                    }
+                    return render(request, 'admin/recalcular_retardos.html', context)
+
+                self.message_user(
+                    request,
+                    f'Se revisaron {resultado.revisadas} entrada(s) y se corrigieron {len(resultado.cambios)}.',
+                    messages.SUCCESS
+                )
+                return redirect(request.get_full_path())
+        else:
+            hoy = timezone.localdate()
+            form = RecalcularRetardosForm(initial={
+                '_selected_action': queryset.values_list('pk', flat=True),
+                'desde': hoy.replace(day=1),
+                'hasta': hoy,
+                'dry_run': True,
+            })
+
+        context = {
+            'title': 'Recalcular Retardos',
+            'queryset': queryset,
+            'form': form,
+            'opts': self.model._meta,
+        }
+        return render(request, 'admin/recalcular_retardos.html', context)
+
+    recalcular_retardos.short_description = 'Recalcular retardos de empleados seleccionados'
+
+    def imprimir_gafetes(self, request, queryset):
+        """Descarga un PDF con los gafetes (QR, nombre y código) de los empleados seleccionados"""
+        datos = [
+            (empleado.qr_uuid, empleado.user.get_full_name(), empleado.codigo_empleado)
+            for empleado in queryset.select_related('user').order_by('codigo_empleado')
+        ]
+        return FileResponse(generar_pdf_gafetes(datos), as_attachment=True, filename='gafetes.pdf')
+    imprimir_gafetes.short_description = 'Imprimir gafetes de empleados seleccionados'
+
     fieldsets = (
         ('Información Básica', {
             'fields': ('user', 'codigo_empleado', 'departamento', 'tipo_horario', 'activo')
@@ -137,6 +229,26 @@ class AsistenciaAdmin(admin.ModelAdmin):
     def get_queryset(self, request):
         return super().get_queryset(request).select_related('empleado', 'empleado__user')
 
+    def save_model(self, request, obj, form, change):
+        anterior = None
+        if change:
+            anterior = Asistencia.objects.filter(pk=obj.pk).values_list('empleado_id', 'fecha').first()
+        super().save_model(request, obj, form, change)
+        # Mantener ResumenDiario al día tras correcciones manuales
+        if anterior and anterior != (obj.empleado_id, obj.fecha):
+            reconstruir_resumen_diario(anterior[1], anterior[1], [anterior[0]])
+        reconstruir_resumen_diario(obj.fecha, obj.fecha, [obj.empleado_id])
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        reconstruir_resumen_diario(obj.fecha, obj.fecha, [obj.empleado_id])
+
+    def delete_queryset(self, request, queryset):
+        dias = set(queryset.values_list('empleado_id', 'fecha'))
+        super().delete_queryset(request, queryset)
+        for empleado_id, fecha in dias:
+            reconstruir_resumen_diario(fecha, fecha, [empleado_id])
+
 @admin.register(TiempoExtra)
 class TiempoExtraAdmin(admin.ModelAdmin):
     list_display = ['empleado', 'fecha', 'horas_extra', 'aprobado', 'descripcion_corta']
@@ -146,6 +258,9 @@ class TiempoExtraAdmin(admin.ModelAdmin):
     readonly_fields = ['timestamp']
     actions = ['aprobar_tiempo_extra']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('empleado__user')
+
     def descripcion_corta(self, obj):
         return obj.descripcion[:50] + '...' if len(obj.descripcion) > 50 else obj.descripcion
     descripcion_corta.short_description = 'Descripción'
@@ -163,15 +278,16 @@ class VisitanteAdmin(admin.ModelAdmin):
     date_hierarchy = 'fecha_visita'
     readonly_fields = ['qr_uuid', 'timestamp', 'mostrar_qr']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('departamento_visita')
+
     def ver_qr(self, obj):
-        if obj.qr_code:
-            return format_html('<a href="{}" target="_blank">Ver QR</a>', obj.qr_code.url)
-        return '-'
+        return format_html('<a href="{}" target="_blank">Ver QR</a>', obj.url_imagen_qr())
     ver_qr.short_description = 'Código QR'
 
     def mostrar_qr(self, obj):
-        if obj.qr_code:
-            return format_html('<img src="{}" style="max-width: 300px;"/>', obj.qr_code.url)
+        if obj.pk:
+            return format_html('<img src="{}" style="max-width: 300px;"/>', obj.url_imagen_qr())
         return '-'
     mostrar_qr.short_description = 'Código QR'
 
@@ -198,6 +314,9 @@ class RegistroVisitaAdmin(admin.ModelAdmin):
     date_hierarchy = 'hora_entrada'
     readonly_fields = ['hora_entrada']
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('visitante__departamento_visita')
+
     def get_departamento(self, obj):
         return obj.visitante.departamento_visita.nombre
     get_departamento.short_description = 'Departamento'
@@ -220,4 +339,45 @@ class ConfiguracionSistemaAdmin(admin.ModelAdmin):
 
     def has_delete_permission(self, request, obj=None):
         # No permite eliminar la configuración
-        return False
\ No newline at end of file
+        return False
+
+@admin.register(CorreoPendiente)
+class CorreoPendienteAdmin(admin.ModelAdmin):
+    list_display = ['asunto', 'destinatarios', 'estado', 'intentos', 'siguiente_intento', 'enviado']
+    list_filter = ['estado']
+    search_fields = ['asunto', 'destinatarios']
+    date_hierarchy = 'creado'
+    readonly_fields = ['creado', 'enviado', 'ultimo_error']
+    actions = ['reintentar_correos']
+
+    def reintentar_correos(self, request, queryset):
+        from django.utils import timezone
+        from .models import EstadoCorreo
+        count = queryset.exclude(estado=EstadoCorreo.ENVIADO).update(
+            estado=EstadoCorreo.PENDIENTE, intentos=0, siguiente_intento=timezone.now()
+        )
+        self.message_user(request, f'{count} correos marcados para reintento')
+    reintentar_correos.short_description = 'Reintentar correos seleccionados'
+
+@admin.register(ResumenDiario)
+class ResumenDiarioAdmin(admin.ModelAdmin):
+    list_display = ['empleado', 'fecha', 'hora_entrada', 'retardo', 'minutos_retardo', 'hora_salida', 'minutos_trabajados']
+    list_filter = ['fecha', 'retardo', 'empleado__departamento']
+    search_fields = ['empleado__user__first_name', 'empleado__user__last_name', 'empleado__codigo_empleado']
+    date_hierarchy = 'fecha'
+    readonly_fields = ['actualizado']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('empleado', 'empleado__user')
+
+@admin.register(ArchivoPorEliminar)
+class ArchivoPorEliminarAdmin(admin.ModelAdmin):
+    list_display = ['nombre', 'creado', 'intentos', 'siguiente_intento', 'ultimo_error']
+    search_fields = ['nombre']
+    readonly_fields = ['creado', 'ultimo_error']
+    actions = ['reintentar_eliminacion']
+
+    def reintentar_eliminacion(self, request, queryset):
+        count = queryset.update(intentos=0, ultimo_error='', siguiente_intento=timezone.now())
+        self.message_user(request, f'{count} archivos marcados para reintento')
+    reintentar_eliminacion.short_description = 'Reintentar eliminación de archivos seleccionados'
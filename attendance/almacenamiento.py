@@ -0,0 +1,141 @@
+"""
+Borrado diferido de archivos del MediaStorage (DigitalOcean Spaces).
+
+Al borrar o reemplazar un QR no se llama a Spaces dentro del request: la
+señal solo inserta un ``ArchivoPorEliminar`` en la misma transacción, así
+que si la transacción se revierte el archivo no se toca. El comando
+``eliminar_archivos`` borra la cola en lotes con una sola petición
+DeleteObjects de S3 por cada 1000 archivos. Como la bandeja de correo
+(ver correo.py), primero reserva el lote y confirma la reserva; la petición
+a S3 se hace sin transacción abierta ni filas bloqueadas, y los archivos que
+fallan se reintentan con espera exponencial.
+"""
+import logging
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+from storages.backends.s3 import S3Storage
+from storages.utils import clean_name
+
+from checador.storage_backends import MediaStorage
+
+from .models import ArchivoPorEliminar
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 5
+ESPERA_MAXIMA_MINUTOS = 60
+# Tiempo que un worker tiene reservados los archivos de su lote antes de que otro los tome
+RESERVA_MINUTOS = 15
+# Límite de llaves por petición DeleteObjects en S3/Spaces
+MAX_LLAVES_S3 = 1000
+
+
+def programar_eliminacion(nombre):
+    """Registra ``nombre`` para borrarlo del storage cuando se confirme la transacción"""
+    ArchivoPorEliminar.objects.create(nombre=nombre)
+
+
+def _eliminar_en_s3(storage, archivos):
+    """Borra los archivos con DeleteObjects; regresa ``{pk: error}`` de los que fallaron"""
+    llaves = {}
+    for archivo in archivos:
+        llaves.setdefault(storage._normalize_name(clean_name(archivo.nombre)), []).append(archivo.pk)
+
+    respuesta = storage.bucket.delete_objects(Delete={
+        'Objects': [{'Key': llave} for llave in llaves],
+        'Quiet': True,
+    })
+    errores = {}
+    for error in respuesta.get('Errors', []):
+        for pk in llaves.get(error['Key'], []):
+            errores[pk] = f"{error.get('Code')}: {error.get('Message')}"
+    return errores
+
+
+def _eliminar_uno_por_uno(storage, archivos):
+    errores = {}
+    for archivo in archivos:
+        try:
+            storage.delete(archivo.nombre)
+        except Exception as e:
+            errores[archivo.pk] = f"{type(e).__name__}: {e}"
+    return errores
+
+
+def _espera(intentos):
+    """Espera exponencial: 1, 2, 4, ... minutos, con tope de una hora"""
+    return timedelta(minutes=min(2 ** (intentos - 1), ESPERA_MAXIMA_MINUTOS))
+
+
+def reservar_archivos(lote):
+    """
+    Toma hasta ``lote`` archivos vencidos y los aparta ``RESERVA_MINUTOS``.
+
+    El bloqueo con SKIP LOCKED dura solo lo que tarda esta transacción: al
+    hacer COMMIT los archivos ya tienen su siguiente intento en el futuro y
+    ningún otro worker los toma mientras se borran.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        archivos = list(
+            ArchivoPorEliminar.objects.select_for_update(skip_locked=True).filter(
+                intentos__lt=MAX_INTENTOS,
+                siguiente_intento__lte=ahora
+            ).order_by('siguiente_intento', 'pk')[:lote]
+        )
+        if archivos:
+            ArchivoPorEliminar.objects.filter(pk__in=[archivo.pk for archivo in archivos]).update(
+                siguiente_intento=ahora + timedelta(minutes=RESERVA_MINUTOS)
+            )
+    return archivos
+
+
+def eliminar_archivos_pendientes(lote=MAX_LLAVES_S3, storage=None):
+    """
+    Borra hasta ``lote`` archivos de la cola cuyo siguiente intento ya venció.
+
+    Primero los reserva (``reservar_archivos``) y confirma la reserva; luego
+    los borra del storage y al final, en otra transacción corta, saca de la
+    cola los borrados (o que ya no existían). Los que fallan se reintentan
+    con espera exponencial hasta ``MAX_INTENTOS`` veces. Regresa una tupla
+    ``(eliminados, fallidos)``.
+    """
+    storage = storage or MediaStorage()
+    lote = min(lote, MAX_LLAVES_S3)
+
+    archivos = reservar_archivos(lote)
+    if not archivos:
+        return 0, 0
+
+    try:
+        if isinstance(storage, S3Storage):
+            errores = _eliminar_en_s3(storage, archivos)
+        else:
+            errores = _eliminar_uno_por_uno(storage, archivos)
+    except Exception as e:
+        logger.error(f"❌ Error eliminando lote de {len(archivos)} archivos: {e}")
+        errores = {archivo.pk: f"{type(e).__name__}: {e}" for archivo in archivos}
+
+    ahora = timezone.now()
+    fallidos = [archivo for archivo in archivos if archivo.pk in errores]
+    for archivo in fallidos:
+        archivo.intentos += 1
+        archivo.ultimo_error = errores[archivo.pk]
+        archivo.siguiente_intento = ahora + _espera(archivo.intentos)
+        if archivo.intentos >= MAX_INTENTOS:
+            logger.error(f"❌ {archivo.nombre} descartado tras {archivo.intentos} intentos: {archivo.ultimo_error}")
+        else:
+            logger.warning(f"⚠️ No se pudo eliminar {archivo.nombre} (intento {archivo.intentos}): {archivo.ultimo_error}")
+
+    with transaction.atomic():
+        ArchivoPorEliminar.objects.bulk_update(fallidos, ['intentos', 'ultimo_error', 'siguiente_intento'])
+        ArchivoPorEliminar.objects.filter(
+            pk__in=[archivo.pk for archivo in archivos if archivo.pk not in errores]
+        ).delete()
+
+    eliminados = len(archivos) - len(fallidos)
+    if eliminados:
+        logger.info(f"🗑️ {eliminados} archivos eliminados del storage")
+    return eliminados, len(fallidos)
@@ -0,0 +1,230 @@
+"""
+Cachés en memoria (por proceso) para el checador y los reportes.
+
+Catálogos: la ``ConfiguracionSistema`` y todos los ``TipoHorario`` cambian
+unas cuantas veces al año, así que se leen completos una vez (al arrancar,
+ver ``precargar_catalogos``) y se sirven desde memoria hasta que una señal
+los invalida o pasan ``CATALOGOS_CACHE_TTL`` segundos.
+
+Empleados por QR:
+Cada worker guarda una copia compacta del empleado y de su tipo de horario
+indexada por ``qr_uuid`` para que un escaneo no tenga que ir a MySQL a buscar
+empleado, usuario y horario por separado. Las señales de ``Empleado``,
+``TipoHorario`` y ``User`` vacían el caché (ver signals.py).
+
+Para que la invalidación llegue también a los demás workers se publica una
+generación en el caché ``compartido`` (``CACHE_COMPARTIDO_URL``: una tabla de
+la base de datos por default, o Redis): cada lectura la compara con la que
+tiene el proceso y, si cambió, descarta su copia local. Los catálogos usan el
+mismo esquema con su propia clave. Además ``registrar_checada`` vuelve a
+comprobar ``activo`` bajo el lock del empleado, así que un gafete dado de
+baja deja de checar aunque un worker aún lo tenga en memoria.
+"""
+import logging
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .horarios import compilar_horario
+
+logger = logging.getLogger(__name__)
+
+HorarioCache = namedtuple('HorarioCache', [
+    'id', 'nombre', 'es_turno_24h', 'hora_entrada', 'hora_salida',
+    'minutos_tolerancia', 'tiene_horario_comida', 'hora_inicio_comida',
+    'hora_fin_comida',
+])
+
+ConfiguracionCache = namedtuple('ConfiguracionCache', [
+    'hora_entrada', 'minutos_tolerancia', 'email_gerente', 'ruta_red_reportes',
+])
+
+EmpleadoCache = namedtuple('EmpleadoCache', [
+    'id', 'user_id', 'codigo_empleado', 'nombre_completo', 'activo', 'tipo_horario',
+])
+
+CLAVE_GENERACION = 'attendance:qr:generacion'
+CLAVE_GENERACION_CATALOGOS = 'attendance:catalogos:generacion'
+
+_lock = threading.Lock()
+_empleados = {}  # qr_uuid -> (EmpleadoCache, momento de carga)
+_generacion = None
+_catalogos = None  # (ConfiguracionCache o None, {id: HorarioCache}, {id: HorarioCompilado}, momento, generación)
+
+
+def _ttl():
+    return getattr(settings, 'QR_CACHE_TTL', 300)
+
+
+def _ttl_catalogos():
+    return getattr(settings, 'CATALOGOS_CACHE_TTL', 3600)
+
+
+def _generacion_compartida(clave=CLAVE_GENERACION):
+    compartido = caches['compartido']
+    generacion = compartido.get(clave)
+    if generacion is None:
+        compartido.add(clave, uuid.uuid4().hex, None)
+        generacion = compartido.get(clave)
+    return generacion
+
+
+def _publicar_generacion(clave):
+    # Un valor nuevo en cada invalidación: no depende de que incr() sea atómico en el backend
+    caches['compartido'].set(clave, uuid.uuid4().hex, None)
+
+
+def horario_a_cache(tipo_horario):
+    """Convierte un TipoHorario en su versión inmutable para el caché"""
+    if tipo_horario is None:
+        return None
+    return HorarioCache(
+        id=tipo_horario.id,
+        nombre=tipo_horario.nombre,
+        es_turno_24h=tipo_horario.es_turno_24h,
+        hora_entrada=tipo_horario.hora_entrada,
+        hora_salida=tipo_horario.hora_salida,
+        minutos_tolerancia=tipo_horario.minutos_tolerancia,
+        tiene_horario_comida=tipo_horario.tiene_horario_comida,
+        hora_inicio_comida=tipo_horario.hora_inicio_comida,
+        hora_fin_comida=tipo_horario.hora_fin_comida,
+    )
+
+
+def configuracion_a_cache(configuracion):
+    if configuracion is None:
+        return None
+    return ConfiguracionCache(
+        hora_entrada=configuracion.hora_entrada,
+        minutos_tolerancia=configuracion.minutos_tolerancia,
+        email_gerente=configuracion.email_gerente,
+        ruta_red_reportes=configuracion.ruta_red_reportes,
+    )
+
+
+def _catalogos_vigentes():
+    """
+    Regresa ``(configuracion, horarios, compilados)``, recargándolos si
+    expiraron o se invalidaron. ``compilados[None]`` es la regla de los
+    empleados sin tipo de horario.
+    """
+    global _catalogos
+
+    generacion = _generacion_compartida(CLAVE_GENERACION_CATALOGOS)
+    ahora = time.monotonic()
+    catalogos = _catalogos
+    if catalogos and catalogos[4] == generacion and ahora - catalogos[3] < _ttl_catalogos():
+        return catalogos[:3]
+
+    from .models import ConfiguracionSistema, TipoHorario
+
+    configuracion = configuracion_a_cache(ConfiguracionSistema.objects.first())
+    horarios = {horario.id: horario_a_cache(horario) for horario in TipoHorario.objects.all()}
+    # Sin configuración no hay hora de entrada general: esos horarios no marcan retardo
+    general = (configuracion.hora_entrada, configuracion.minutos_tolerancia) if configuracion else (None, 0)
+    compilados = {id_: compilar_horario(horario, *general) for id_, horario in horarios.items()}
+    compilados[None] = compilar_horario(None, *general)
+    with _lock:
+        _catalogos = (configuracion, horarios, compilados, ahora, generacion)
+    return configuracion, horarios, compilados
+
+
+def obtener_configuracion():
+    """ConfiguracionCache del sistema o None si no se ha configurado"""
+    return _catalogos_vigentes()[0]
+
+
+def obtener_horario(tipo_horario_id):
+    """HorarioCache con ese id (None si el empleado no tiene tipo de horario)"""
+    if tipo_horario_id is None:
+        return None
+    return _catalogos_vigentes()[1].get(tipo_horario_id)
+
+
+def horario_compilado(tipo_horario_id):
+    """HorarioCompilado para calcular retardos de un empleado con ese tipo de horario"""
+    compilados = _catalogos_vigentes()[2]
+    return compilados.get(tipo_horario_id, compilados[None])
+
+
+def precargar_catalogos():
+    """Carga los catálogos al arrancar el proceso para que la primera checada no los consulte"""
+    try:
+        _catalogos_vigentes()
+    except Exception as e:
+        # Sin base de datos todavía (p. ej. antes de migrar): se cargan en la primera lectura
+        logger.warning(f"⚠️ No se pudieron precargar los catálogos: {e}")
+
+
+def invalidar_catalogos():
+    """Descarta los catálogos locales y avisa a los demás procesos"""
+    global _catalogos
+
+    with _lock:
+        _catalogos = None
+    _publicar_generacion(CLAVE_GENERACION_CATALOGOS)
+
+
+def empleado_a_cache(empleado):
+    """Convierte un Empleado (con user cargado) en su snapshot; el horario sale del catálogo"""
+    return EmpleadoCache(
+        id=empleado.id,
+        user_id=empleado.user_id,
+        codigo_empleado=empleado.codigo_empleado,
+        nombre_completo=empleado.user.get_full_name(),
+        activo=empleado.activo,
+        tipo_horario=obtener_horario(empleado.tipo_horario_id),
+    )
+
+
+def resolver_empleado(qr_code):
+    """
+    Devuelve el EmpleadoCache activo asociado al código QR o None si el código
+    no corresponde a ningún empleado activo.
+    """
+    global _generacion
+
+    try:
+        clave = str(uuid.UUID(str(qr_code).strip()))
+    except ValueError:
+        return None
+
+    generacion = _generacion_compartida()
+    ahora = time.monotonic()
+
+    with _lock:
+        if generacion != _generacion:
+            _empleados.clear()
+            _generacion = generacion
+        entrada = _empleados.get(clave)
+        if entrada and ahora - entrada[1] < _ttl():
+            return entrada[0]
+
+    from .models import Empleado
+
+    try:
+        empleado = Empleado.objects.select_related('user').get(
+            qr_uuid=clave, activo=True
+        )
+    except Empleado.DoesNotExist:
+        return None
+
+    snapshot = empleado_a_cache(empleado)
+    with _lock:
+        if generacion == _generacion:
+            _empleados[clave] = (snapshot, ahora)
+    return snapshot
+
+
+def invalidar_empleados():
+    """Vacía el caché local y avisa a los demás procesos incrementando la generación"""
+    global _generacion
+
+    with _lock:
+        _empleados.clear()
+        _generacion = None
+    _publicar_generacion(CLAVE_GENERACION)
@@ -0,0 +1,246 @@
+"""
+Registro de checadas de empleados.
+
+``registrar_checada`` decide el siguiente movimiento y lo guarda en una
+sola transacción: bloquea la fila del empleado (SELECT ... FOR UPDATE) para
+que dos escaneos simultáneos del mismo gafete, o dos tablets, se atiendan
+en orden y no dupliquen la ENTRADA; el retardo se calcula antes del INSERT
+para que cada checada sea una sola escritura.
+
+``registrar_lote`` recibe las checadas que la tablet guardó sin conexión.
+Cada una trae un id de evento generado en el dispositivo (reenviarla no la
+duplica) y la hora en que se escaneó, que es la que se usa para el retardo.
+Solo se aceptan checadas del día en curso con a lo más
+``LOTE_ANTIGUEDAD_MAXIMA`` minutos de antigüedad, y nunca una anterior a la
+última checada ya registrada del empleado: insertarla rompería la secuencia
+ENTRADA/SALIDA, así que se rechaza para corregirla a mano en el admin.
+
+``registrar_visita`` alterna la entrada y salida de un visitante.
+
+Cada etapa (resolver el QR, decidir el movimiento, calcular el retardo e
+insertar) y el resultado de cada escaneo se registran en ``metricas``.
+"""
+import logging
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import horario_compilado, resolver_empleado
+from .horarios import ultima_entrada
+from .metricas import DURACION_CHECADA, ESCANEOS, ETAPAS_CHECADA
+from .models import Asistencia, Empleado, RegistroVisita, TipoMovimiento, Visitante
+from .resumenes import registrar_en_resumen
+
+logger = logging.getLogger(__name__)
+
+# Desfase máximo aceptado entre el reloj de la tablet y el del servidor
+TOLERANCIA_RELOJ = timedelta(minutes=5)
+
+
+class ChecadaRechazada(Exception):
+    """El movimiento no está permitido por el horario del empleado"""
+
+
+def siguiente_movimiento(ultimo_movimiento, tipo_horario):
+    """Tipo de movimiento que sigue a ``ultimo_movimiento`` (None si es el primero del día)"""
+    if not ultimo_movimiento:
+        return TipoMovimiento.ENTRADA
+
+    if tipo_horario and (tipo_horario.es_turno_24h or not tipo_horario.tiene_horario_comida):
+        # Turnos de 24 horas y horarios sin comida: solo ENTRADA y SALIDA
+        if ultimo_movimiento == TipoMovimiento.ENTRADA:
+            return TipoMovimiento.SALIDA
+        return TipoMovimiento.ENTRADA
+
+    # Horario con comida (default): secuencia completa
+    if ultimo_movimiento == TipoMovimiento.ENTRADA:
+        return TipoMovimiento.SALIDA_COMIDA
+    if ultimo_movimiento == TipoMovimiento.SALIDA_COMIDA:
+        return TipoMovimiento.ENTRADA_COMIDA
+    if ultimo_movimiento == TipoMovimiento.ENTRADA_COMIDA:
+        return TipoMovimiento.SALIDA
+    return TipoMovimiento.ENTRADA
+
+
+def validar_salida_comida(tipo_horario, hora):
+    """Lanza ChecadaRechazada si la salida a comida no está permitida a esa hora"""
+    if not tipo_horario:
+        return
+    if not tipo_horario.tiene_horario_comida:
+        raise ChecadaRechazada("Tu horario no incluye salida a comida")
+    inicio, fin = tipo_horario.hora_inicio_comida, tipo_horario.hora_fin_comida
+    if inicio and fin and not (inicio <= hora <= fin):
+        raise ChecadaRechazada(
+            f"No puedes salir a comer fuera del horario permitido ({inicio.strftime('%H:%M')} - {fin.strftime('%H:%M')})"
+        )
+
+
+def registrar_checada(empleado, momento=None, evento_id=None):
+    """
+    Registra la siguiente checada de ``empleado`` (un EmpleadoCache) y la regresa.
+
+    ``momento`` es el instante de la checada (default: ahora); la fecha y la
+    hora se guardan en hora local. Si ya existe una checada con ``evento_id``
+    se regresa esa sin registrar otra. Lanza ChecadaRechazada si el horario no
+    permite el movimiento, si el empleado ya no está activo o si ya tiene una
+    checada posterior a ``momento`` ese día.
+    """
+    local = timezone.localtime(momento or timezone.now())
+    fecha, hora = local.date(), local.time()
+    tipo_horario = empleado.tipo_horario
+
+    with DURACION_CHECADA.medir(), transaction.atomic():
+        with ETAPAS_CHECADA.medir(etapa='decision'):
+            # Serializa las checadas del mismo empleado hasta el COMMIT; el caché de QR de
+            # otro worker puede no saber aún que el empleado se dio de baja
+            if not Empleado.objects.select_for_update().filter(
+                pk=empleado.id, activo=True
+            ).values_list('pk', flat=True).first():
+                ESCANEOS.inc(resultado='inactivo')
+                raise ChecadaRechazada("Tu gafete no está activo")
+
+            if evento_id:
+                existente = Asistencia.objects.filter(evento_id=evento_id).first()
+                if existente:
+                    ESCANEOS.inc(resultado='duplicado')
+                    return existente
+
+            ultima = Asistencia.objects.filter(
+                empleado_id=empleado.id,
+                fecha=fecha
+            ).order_by('-hora').values_list('hora', 'tipo_movimiento').first()
+            if ultima and ultima[0] > hora:
+                # Una checada sincronizada tarde cambiaría el tipo de las que ya siguen
+                ESCANEOS.inc(resultado='fuera_de_orden')
+                raise ChecadaRechazada(
+                    f"Ya hay una checada posterior ({ultima[0].strftime('%H:%M')}); corrígela en el admin"
+                )
+            ultimo_movimiento = ultima[1] if ultima else None
+
+            tipo = siguiente_movimiento(ultimo_movimiento, tipo_horario)
+            if tipo == TipoMovimiento.SALIDA_COMIDA:
+                try:
+                    validar_salida_comida(tipo_horario, hora)
+                except ChecadaRechazada:
+                    ESCANEOS.inc(resultado='rechazado_comida')
+                    raise
+
+        asistencia = Asistencia(
+            empleado_id=empleado.id,
+            fecha=fecha,
+            hora=hora,
+            tipo_movimiento=tipo,
+            evento_id=evento_id
+        )
+        if tipo == TipoMovimiento.ENTRADA:
+            with ETAPAS_CHECADA.medir(etapa='retardo'):
+                horario = horario_compilado(tipo_horario.id if tipo_horario else None)
+                anterior = ultima_entrada(empleado.id, fecha) if horario.es_turno_24h else None
+                asistencia.retardo, asistencia.minutos_retardo = horario.retardo(fecha, hora, anterior)
+
+        with ETAPAS_CHECADA.medir(etapa='insercion'):
+            asistencia.save(force_insert=True)
+            registrar_en_resumen(asistencia)
+
+    ESCANEOS.inc(resultado='registrado')
+    return asistencia
+
+
+def resolver_qr(qr_code):
+    """``resolver_empleado`` midiendo la etapa ``resolver_qr``; None si no es de un empleado"""
+    with ETAPAS_CHECADA.medir(etapa='resolver_qr'):
+        return resolver_empleado(qr_code)
+
+
+def resultado_checada(asistencia, empleado):
+    """Datos de una checada para las respuestas JSON"""
+    return {
+        'empleado': empleado.nombre_completo,
+        'tipo_movimiento': asistencia.tipo_movimiento,
+        'retardo': asistencia.retardo,
+        'minutos_retardo': asistencia.minutos_retardo,
+    }
+
+
+def registrar_lote(eventos):
+    """
+    Registra checadas sincronizadas desde la tablet.
+
+    ``eventos`` es una lista de dicts con ``id`` (UUID), ``qr_code`` y
+    ``momento`` (datetime con zona). Se procesan en orden cronológico y se
+    regresa un resultado por evento con ``estado`` ``registrado``,
+    ``duplicado`` o ``rechazado``.
+    """
+    ya_registrados = set(
+        Asistencia.objects.filter(evento_id__in=[e['id'] for e in eventos]).values_list('evento_id', flat=True)
+    )
+    ahora = timezone.now()
+    limite = ahora + TOLERANCIA_RELOJ
+    minimo = ahora - timedelta(minutes=settings.LOTE_ANTIGUEDAD_MAXIMA)
+    hoy = timezone.localdate(ahora)
+
+    resultados = []
+    for evento in sorted(eventos, key=lambda e: e['momento']):
+        resultado = {'id': str(evento['id'])}
+        resultados.append(resultado)
+
+        if evento['id'] in ya_registrados:
+            ESCANEOS.inc(resultado='duplicado')
+            resultado.update(estado='duplicado', mensaje='Checada ya registrada')
+            continue
+        if evento['momento'] > limite:
+            ESCANEOS.inc(resultado='rechazado_reloj')
+            resultado.update(estado='rechazado', mensaje='La hora de la tablet está adelantada')
+            continue
+        if evento['momento'] < minimo or timezone.localdate(evento['momento']) != hoy:
+            ESCANEOS.inc(resultado='rechazado_reloj')
+            resultado.update(estado='rechazado', mensaje='La checada es demasiado antigua o de otro día')
+            continue
+
+        empleado = resolver_qr(evento['qr_code'])
+        if empleado is None:
+            ESCANEOS.inc(resultado='qr_invalido')
+            resultado.update(estado='rechazado', mensaje='Código QR no válido')
+            continue
+
+        try:
+            asistencia = registrar_checada(empleado, evento['momento'], evento['id'])
+        except ChecadaRechazada as e:
+            logger.warning(f"⚠️ Checada sincronizada rechazada ({empleado.codigo_empleado} {evento['momento']}): {e}")
+            resultado.update(estado='rechazado', mensaje=str(e), empleado=empleado.nombre_completo)
+            continue
+        resultado.update(resultado_checada(asistencia, empleado), estado='registrado')
+
+    return resultados
+
+
+def resolver_visitante(qr_code):
+    """Regresa el Visitante de un código ``VISITANTE:<uuid>`` o None"""
+    if not qr_code.startswith('VISITANTE:'):
+        return None
+    try:
+        qr_uuid = uuid.UUID(qr_code[len('VISITANTE:'):])
+    except ValueError:
+        return None
+    return Visitante.objects.select_related('departamento_visita').filter(qr_uuid=qr_uuid).first()
+
+
+def registrar_visita(visitante):
+    """Cierra el registro abierto del visitante o abre uno nuevo; regresa ENTRADA o SALIDA"""
+    registro_abierto = RegistroVisita.objects.filter(
+        visitante=visitante,
+        hora_salida__isnull=True
+    ).first()
+
+    if registro_abierto:
+        registro_abierto.hora_salida = timezone.now()
+        registro_abierto.save(update_fields=['hora_salida'])
+        ESCANEOS.inc(resultado='visitante')
+        return TipoMovimiento.SALIDA
+
+    RegistroVisita.objects.create(visitante=visitante)
+    ESCANEOS.inc(resultado='visitante')
+    return TipoMovimiento.ENTRADA
@@ -0,0 +1,214 @@
+"""
+Envío de correo: sesión SMTP compartida y bandeja de salida en base de datos.
+
+``enviar_mensajes`` manda varios mensajes sobre una sola conexión SMTP (un
+solo handshake TCP+TLS+AUTH) y reporta tiempo y resultado de cada uno.
+
+Las vistas solo insertan un ``CorreoPendiente`` dentro de su transacción y
+regresan de inmediato; el comando ``procesar_correos`` drena la bandeja en
+lotes, reintentando con espera exponencial los envíos que fallen.
+"""
+import logging
+import time
+from collections import namedtuple
+from datetime import timedelta
+
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.utils import timezone
+
+from .models import CorreoPendiente, EstadoCorreo
+
+logger = logging.getLogger(__name__)
+
+MAX_INTENTOS = 8
+ESPERA_MAXIMA_MINUTOS = 60
+# Tiempo que un worker tiene reservados los correos de su lote antes de que otro los tome
+RESERVA_MINUTOS = 15
+
+ResultadoEnvio = namedtuple('ResultadoEnvio', ['mensaje', 'enviado', 'milisegundos', 'error'])
+
+
+def enviar_mensajes(mensajes, connection=None, lanzar_errores=False):
+    """
+    Envía ``mensajes`` reutilizando una sola conexión SMTP.
+
+    Regresa una lista de ``ResultadoEnvio`` en el mismo orden. Un error en un
+    mensaje no detiene a los demás: la sesión se cierra y se reabre para el
+    siguiente. Si no se puede abrir la conexión, los mensajes restantes se
+    marcan como fallidos con ese error. Con ``lanzar_errores`` se relanza el
+    primer error después de intentar todos los mensajes.
+    """
+    propia = connection is None
+    if propia:
+        connection = get_connection(fail_silently=False)
+
+    resultados = []
+    error_conexion = None
+    try:
+        for mensaje in mensajes:
+            if error_conexion:
+                resultados.append(ResultadoEnvio(mensaje, False, 0.0, error_conexion))
+                continue
+
+            inicio = time.perf_counter()
+            try:
+                connection.open()
+            except Exception as e:
+                error_conexion = e
+                milisegundos = (time.perf_counter() - inicio) * 1000
+                logger.error(f"❌ No se pudo abrir la conexión SMTP: {e}")
+                resultados.append(ResultadoEnvio(mensaje, False, milisegundos, e))
+                continue
+
+            try:
+                connection.send_messages([mensaje])
+            except Exception as e:
+                milisegundos = (time.perf_counter() - inicio) * 1000
+                logger.warning(f"⚠️ Error enviando '{mensaje.subject}' a {mensaje.to} ({milisegundos:.0f} ms): {e}")
+                resultados.append(ResultadoEnvio(mensaje, False, milisegundos, e))
+                # Tras un error SMTP la sesión puede quedar inutilizable
+                connection.close()
+            else:
+                milisegundos = (time.perf_counter() - inicio) * 1000
+                logger.info(f"📧 Enviado '{mensaje.subject}' a {mensaje.to} ({milisegundos:.0f} ms)")
+                resultados.append(ResultadoEnvio(mensaje, True, milisegundos, None))
+    finally:
+        if propia:
+            connection.close()
+
+    if lanzar_errores:
+        for resultado in resultados:
+            if resultado.error:
+                raise resultado.error
+    return resultados
+
+
+def enviar_por_departamento(departamentos, construir_mensaje_departamento, mensajes=(), connection=None,
+                            lanzar_errores=False):
+    """
+    Envía ``mensajes`` y uno específico para cada departamento sobre una sola sesión SMTP.
+
+    ``construir_mensaje_departamento(departamento)`` debe regresar el mensaje
+    (o None para omitir ese departamento). Regresa los ``ResultadoEnvio`` de
+    ``mensajes`` seguidos de los de los departamentos.
+    """
+    mensajes = list(mensajes)
+    for departamento in departamentos:
+        mensaje = construir_mensaje_departamento(departamento)
+        if mensaje is not None:
+            mensajes.append(mensaje)
+    return enviar_mensajes(mensajes, connection=connection, lanzar_errores=lanzar_errores)
+
+
+def encolar_correo(mensaje):
+    """Guarda un EmailMessage/EmailMultiAlternatives en la bandeja de salida"""
+    html = ''
+    for contenido, mimetype in getattr(mensaje, 'alternatives', []):
+        if mimetype == 'text/html':
+            html = contenido
+    return CorreoPendiente.objects.create(
+        asunto=mensaje.subject,
+        texto=mensaje.body,
+        html=html,
+        remitente=mensaje.from_email,
+        destinatarios=', '.join(mensaje.to),
+    )
+
+
+def construir_mensaje(correo, connection=None):
+    """Reconstruye el EmailMultiAlternatives de un CorreoPendiente"""
+    destinatarios = [d.strip() for d in correo.destinatarios.split(',') if d.strip()]
+    mensaje = EmailMultiAlternatives(
+        correo.asunto, correo.texto, correo.remitente, destinatarios, connection=connection
+    )
+    if correo.html:
+        mensaje.attach_alternative(correo.html, "text/html")
+    return mensaje
+
+
+def _espera(intentos):
+    """Espera exponencial: 1, 2, 4, ... minutos, con tope de una hora"""
+    return timedelta(minutes=min(2 ** (intentos - 1), ESPERA_MAXIMA_MINUTOS))
+
+
+def reservar_correos(lote):
+    """
+    Toma hasta ``lote`` correos vencidos y los aparta ``RESERVA_MINUTOS``.
+
+    El bloqueo con SKIP LOCKED dura solo lo que tarda esta transacción: al
+    hacer COMMIT los correos ya tienen su siguiente intento en el futuro y
+    ningún otro worker los toma mientras se envían.
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        correos = list(
+            CorreoPendiente.objects.select_for_update(skip_locked=True).filter(
+                estado=EstadoCorreo.PENDIENTE,
+                siguiente_intento__lte=ahora
+            ).order_by('siguiente_intento')[:lote]
+        )
+        if correos:
+            CorreoPendiente.objects.filter(pk__in=[correo.pk for correo in correos]).update(
+                siguiente_intento=ahora + timedelta(minutes=RESERVA_MINUTOS)
+            )
+    return correos
+
+
+def _registrar_resultado(correo, error):
+    if error:
+        correo.intentos += 1
+        correo.ultimo_error = f"{type(error).__name__}: {error}"
+        if correo.intentos >= MAX_INTENTOS:
+            correo.estado = EstadoCorreo.FALLIDO
+            logger.error(f"❌ Correo {correo.pk} descartado tras {correo.intentos} intentos: {error}")
+        else:
+            correo.siguiente_intento = timezone.now() + _espera(correo.intentos)
+            logger.warning(f"⚠️ Correo {correo.pk} falló (intento {correo.intentos}): {error}")
+    else:
+        correo.estado = EstadoCorreo.ENVIADO
+        correo.enviado = timezone.now()
+        correo.ultimo_error = ''
+
+    # Un UPDATE en autocommit: queda guardado aunque el worker muera con el siguiente correo
+    correo.save(update_fields=[
+        'estado', 'intentos', 'siguiente_intento', 'ultimo_error', 'enviado'
+    ])
+
+
+def procesar_correos_pendientes(lote=50):
+    """
+    Envía hasta ``lote`` correos cuyo siguiente intento ya venció.
+
+    Primero los reserva (``reservar_correos``) y confirma la reserva; luego
+    los envía sobre una sola sesión SMTP y guarda el resultado de cada uno en
+    cuanto se envía. Si el worker muere a medio lote, solo el correo que
+    estaba enviando puede salir dos veces; los demás sin enviar se reintentan
+    al vencer la reserva. Regresa una tupla ``(enviados, fallidos)``.
+    """
+    correos = reservar_correos(lote)
+    if not correos:
+        return 0, 0
+
+    enviados = fallidos = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.error(f"❌ No se pudo abrir la conexión SMTP: {e}")
+        for correo in correos:
+            _registrar_resultado(correo, e)
+        return 0, len(correos)
+
+    try:
+        for correo in correos:
+            resultado = enviar_mensajes([construir_mensaje(correo)], connection=connection)[0]
+            _registrar_resultado(correo, resultado.error)
+            if resultado.error:
+                fallidos += 1
+            else:
+                enviados += 1
+    finally:
+        connection.close()
+
+    return enviados, fallidos
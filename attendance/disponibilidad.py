@@ -0,0 +1,199 @@
+"""
+Verificación de dependencias (readiness): base de datos, storage y SMTP.
+
+Cada verificación corre en su propio hilo, al mismo tiempo que las demás, y
+tiene su propio timeout (``DISPONIBILIDAD_TIMEOUT``); ninguna toca el
+timeout global de sockets del proceso. La base de datos y Spaces se
+verifican con una conexión y un cliente propios, configurados con ese
+timeout, para que un hilo colgado no sobreviva al health check. El resultado se guarda en el caché
+de Django durante ``DISPONIBILIDAD_TTL`` segundos, así que los health checks
+de la plataforma leen el último resultado en lugar de ir a MySQL en cada
+petición, y solo un hilo por proceso verifica a la vez.
+"""
+import os
+import smtplib
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+Verificacion = namedtuple('Verificacion', ['nombre', 'ok', 'latencia_ms', 'detalle', 'verificado'])
+
+CLAVE_CACHE = 'attendance:disponibilidad'
+# Si fallan estas, la aplicación no puede atender checadas
+CRITICAS = ('db',)
+
+_lock = threading.Lock()
+
+
+def _timeout():
+    return getattr(settings, 'DISPONIBILIDAD_TIMEOUT', 3)
+
+
+def _ttl():
+    return getattr(settings, 'DISPONIBILIDAD_TTL', 15)
+
+
+def _conexion_verificacion():
+    """Conexión nueva a la base de datos con connect/read timeout de ``DISPONIBILIDAD_TIMEOUT``"""
+    conexion = connections.create_connection(DEFAULT_DB_ALIAS)
+    if conexion.vendor == 'mysql':
+        opciones = dict(conexion.settings_dict.get('OPTIONS', {}))
+        opciones.update(connect_timeout=_timeout(), read_timeout=_timeout())
+        conexion.settings_dict = {**conexion.settings_dict, 'OPTIONS': opciones}
+    return conexion
+
+
+def verificar_db():
+    """Abre una conexión propia y le hace ping"""
+    conexion = _conexion_verificacion()
+    try:
+        conexion.ensure_connection()
+        if not conexion.is_usable():
+            raise ConnectionError('la conexión no responde')
+        return conexion.vendor
+    finally:
+        conexion.close()
+
+
+def verificar_storage():
+    """HEAD del bucket de Spaces o, con storage local, permiso de escritura en MEDIA_ROOT"""
+    if not getattr(settings, 'USE_SPACES', False):
+        if not os.access(settings.MEDIA_ROOT, os.W_OK):
+            raise PermissionError(f'sin permiso de escritura en {settings.MEDIA_ROOT}')
+        return 'local'
+
+    from botocore.config import Config
+    from checador.storage_backends import MediaStorage
+
+    storage = MediaStorage()
+    # Un solo intento con el timeout de la verificación (los reintentos de botocore lo multiplicarían);
+    # total_max_attempts cuenta el primer intento, max_attempts=1 todavía permitiría un reintento
+    storage.client_config = storage.client_config.merge(Config(
+        connect_timeout=_timeout(), read_timeout=_timeout(), retries={'total_max_attempts': 1}
+    ))
+    storage.connection.meta.client.head_bucket(Bucket=storage.bucket_name)
+    return storage.bucket_name
+
+
+def verificar_smtp():
+    """Conecta al servidor SMTP y manda NOOP (sin TLS ni login)"""
+    if not settings.EMAIL_BACKEND.endswith('smtp.EmailBackend'):
+        return settings.EMAIL_BACKEND.rsplit('.', 2)[-2]
+    with smtplib.SMTP(settings.EMAIL_HOST, settings.EMAIL_PORT, timeout=_timeout()) as servidor:
+        codigo, _ = servidor.noop()
+        if codigo != 250:
+            raise smtplib.SMTPResponseException(codigo, 'NOOP rechazado')
+    return settings.EMAIL_HOST
+
+
+VERIFICACIONES = {
+    'db': verificar_db,
+    'storage': verificar_storage,
+    'smtp': verificar_smtp,
+}
+
+
+def _ejecutar(nombre, funcion):
+    inicio = time.perf_counter()
+    try:
+        detalle = funcion()
+        ok = True
+    except Exception as e:
+        detalle = f"{type(e).__name__}: {e}"
+        ok = False
+    return Verificacion(nombre, ok, round((time.perf_counter() - inicio) * 1000, 1), str(detalle), time.time())
+
+
+def ejecutar_verificaciones():
+    """Corre todas las verificaciones en paralelo; las que excedan el timeout cuentan como fallidas"""
+    pool = ThreadPoolExecutor(max_workers=len(VERIFICACIONES), thread_name_prefix='disponibilidad')
+    futuros = {nombre: pool.submit(_ejecutar, nombre, funcion) for nombre, funcion in VERIFICACIONES.items()}
+    wait(futuros.values(), timeout=_timeout())
+    # No esperar a los hilos colgados: terminan solos cuando expire su socket
+    pool.shutdown(wait=False)
+
+    resultados = []
+    for nombre, futuro in futuros.items():
+        if futuro.done():
+            resultados.append(futuro.result())
+        else:
+            resultados.append(Verificacion(
+                nombre, False, _timeout() * 1000, f'sin respuesta en {_timeout()} s', time.time()
+            ))
+    return resultados
+
+
+def estado_dependencias(forzar=False):
+    """Último resultado de las verificaciones (a lo más ``DISPONIBILIDAD_TTL`` segundos de antigüedad)"""
+    if not forzar:
+        resultados = cache.get(CLAVE_CACHE)
+        if resultados is not None:
+            return resultados
+
+    with _lock:
+        # Otro hilo pudo haber verificado mientras esperábamos el lock
+        resultados = None if forzar else cache.get(CLAVE_CACHE)
+        if resultados is None:
+            resultados = ejecutar_verificaciones()
+            cache.set(CLAVE_CACHE, resultados, _ttl())
+    return resultados
+
+
+def listo(resultados):
+    """True si todas las dependencias críticas respondieron"""
+    return all(v.ok for v in resultados if v.nombre in CRITICAS)
+
+
+def como_json(resultados):
+    if all(v.ok for v in resultados):
+        estado = 'ok'
+    else:
+        estado = 'degradado' if listo(resultados) else 'error'
+    return {
+        'estado': estado,
+        'dependencias': {
+            v.nombre: {
+                'ok': v.ok,
+                'latencia_ms': v.latencia_ms,
+                'detalle': v.detalle,
+                'antiguedad_s': round(time.time() - v.verificado, 1),
+            }
+            for v in resultados
+        },
+    }
+
+
+def como_prometheus(resultados):
+    """Resultados en el formato de texto de Prometheus"""
+    lineas = [
+        '# HELP checador_dependencia_ok 1 si la dependencia respondió en la última verificación',
+        '# TYPE checador_dependencia_ok gauge',
+    ]
+    lineas += [f'checador_dependencia_ok{{dependencia="{v.nombre}"}} {int(v.ok)}' for v in resultados]
+    lineas += [
+        '# HELP checador_dependencia_latencia_segundos Duración de la última verificación',
+        '# TYPE checador_dependencia_latencia_segundos gauge',
+    ]
+    lineas += [
+        f'checador_dependencia_latencia_segundos{{dependencia="{v.nombre}"}} {v.latencia_ms / 1000:.4f}'
+        for v in resultados
+    ]
+    lineas += [
+        '# HELP checador_dependencia_verificada_timestamp_segundos Momento de la última verificación',
+        '# TYPE checador_dependencia_verificada_timestamp_segundos gauge',
+    ]
+    lineas += [
+        f'checador_dependencia_verificada_timestamp_segundos{{dependencia="{v.nombre}"}} {v.verificado:.0f}'
+        for v in resultados
+    ]
+    lineas += [
+        '# HELP checador_listo 1 si todas las dependencias críticas están disponibles',
+        '# TYPE checador_listo gauge',
+        f'checador_listo {int(listo(resultados))}',
+    ]
+    return '\n'.join(lineas) + '\n'
@@ -0,0 +1,96 @@
+"""
+Hojas de gafetes para imprimir: QR, nombre y código de cada empleado.
+
+Cada gafete se dibuja por separado (en un pool de procesos cuando son
+muchos) y se acomodan 12 por página tamaño carta. Las páginas se agregan
+una por una a un PDF en un archivo temporal, así que en memoria solo vive
+la página actual sin importar cuántos empleados se impriman.
+"""
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from PIL import Image, ImageDraw, ImageFont
+
+from .qr import contenido_qr, crear_qr
+
+RESOLUCION = 150  # DPI
+PAGINA = (1275, 1650)  # Carta a 150 DPI
+COLUMNAS, FILAS = 3, 4
+MARGEN = 60
+TAMANO_QR = 300
+# Con menos gafetes no vale la pena arrancar procesos
+MINIMO_PARA_POOL = 48
+
+
+def _fuente(tamano):
+    return ImageFont.load_default(size=tamano)
+
+
+def renderizar_gafete(datos):
+    """PNG de un gafete a partir de ``(qr_uuid, nombre, codigo_empleado)``"""
+    qr_uuid, nombre, codigo = datos
+    ancho = (PAGINA[0] - 2 * MARGEN) // COLUMNAS
+    alto = (PAGINA[1] - 2 * MARGEN) // FILAS
+
+    gafete = Image.new('RGB', (ancho, alto), 'white')
+    qr = crear_qr(contenido_qr('empleado', qr_uuid)).make_image(fill_color="black", back_color="white")
+    qr = qr.get_image().convert('RGB').resize((TAMANO_QR, TAMANO_QR), Image.NEAREST)
+    gafete.paste(qr, ((ancho - TAMANO_QR) // 2, 10))
+
+    dibujo = ImageDraw.Draw(gafete)
+    dibujo.rectangle([0, 0, ancho - 1, alto - 1], outline='#d1d5db', width=2)
+    y = TAMANO_QR + 20
+    for texto, tamano in ((nombre, 24), (codigo, 22)):
+        fuente = _fuente(tamano)
+        # Recortar nombres que no caben en el ancho del gafete
+        while texto and dibujo.textlength(texto, font=fuente) > ancho - 20:
+            texto = texto[:-1]
+        dibujo.text(((ancho - dibujo.textlength(texto, font=fuente)) // 2, y), texto, fill='black', font=fuente)
+        y += tamano + 12
+
+    buffer = BytesIO()
+    gafete.save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def _gafetes(datos):
+    """Genera los PNG en orden, en paralelo si son muchos"""
+    if len(datos) < MINIMO_PARA_POOL:
+        yield from map(renderizar_gafete, datos)
+        return
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, 4)) as pool:
+        yield from pool.map(renderizar_gafete, datos, chunksize=16)
+
+
+def generar_pdf_gafetes(datos):
+    """
+    Escribe el PDF de gafetes de ``datos`` (lista de ``(qr_uuid, nombre, codigo)``)
+    en un archivo temporal y lo regresa abierto al inicio, listo para
+    ``FileResponse``. El archivo se borra al cerrarse.
+    """
+    archivo = tempfile.TemporaryFile(suffix='.pdf')
+    ancho = (PAGINA[0] - 2 * MARGEN) // COLUMNAS
+    alto = (PAGINA[1] - 2 * MARGEN) // FILAS
+    por_pagina = COLUMNAS * FILAS
+
+    pagina = None
+    paginas = 0
+    for i, png in enumerate(_gafetes(datos)):
+        posicion = i % por_pagina
+        if posicion == 0:
+            if pagina is not None:
+                pagina.save(archivo, format='PDF', resolution=RESOLUCION, append=paginas > 0)
+                paginas += 1
+            pagina = Image.new('RGB', PAGINA, 'white')
+        columna, fila = posicion % COLUMNAS, posicion // COLUMNAS
+        with Image.open(BytesIO(png)) as gafete:
+            pagina.paste(gafete, (MARGEN + columna * ancho, MARGEN + fila * alto))
+
+    if pagina is None:
+        pagina = Image.new('RGB', PAGINA, 'white')
+    pagina.save(archivo, format='PDF', resolution=RESOLUCION, append=paginas > 0)
+
+    archivo.seek(0)
+    return archivo
@@ -0,0 +1,206 @@
+"""
+Reglas de retardo compiladas por tipo de horario.
+
+``compilar_horario`` convierte un TipoHorario (o la configuración general
+para empleados sin horario) en un ``HorarioCompilado``: la hora de entrada
+y el límite con tolerancia quedan en segundos desde la medianoche, así que
+decidir un retardo es una resta de enteros sin ``strptime`` ni
+``datetime.combine``. El catálogo en memoria (cache.py) guarda uno por tipo
+de horario; el recálculo masivo usa ``retardos_en_serie``.
+
+``recalcular_retardos`` vuelve a aplicar las reglas vigentes a las entradas
+históricas (p. ej. después de editar un TipoHorario o reasignarlo) y
+guarda solo las que cambiaron, con ``bulk_update``.
+"""
+from collections import namedtuple
+from datetime import datetime
+from itertools import groupby
+
+# Turnos de 24h: 24h de trabajo + 24h de descanso; hay retardo después de 50h
+CICLO_24H = 48 * 3600
+LIMITE_24H = 50 * 3600
+
+SEGUNDOS_DIA = 24 * 3600
+
+CambioRetardo = namedtuple('CambioRetardo', [
+    'asistencia_id', 'empleado_id', 'fecha', 'hora', 'antes', 'despues',
+])
+
+ResultadoRecalculo = namedtuple('ResultadoRecalculo', ['revisadas', 'cambios'])
+
+
+def segundos(hora):
+    """Segundos (con fracción) desde la medianoche de un ``time``"""
+    return hora.hour * 3600 + hora.minute * 60 + hora.second + hora.microsecond / 1_000_000
+
+
+def _a_time(hora):
+    if isinstance(hora, str):
+        return datetime.strptime(hora, "%H:%M:%S").time()
+    return hora
+
+
+class HorarioCompilado:
+    """Regla de retardo de un horario; ``retardo()`` regresa ``(retardo, minutos_retardo)``"""
+
+    __slots__ = ('tipo_horario_id', 'es_turno_24h', 'entrada', 'limite')
+
+    def __init__(self, tipo_horario_id=None, es_turno_24h=False, hora_entrada=None, minutos_tolerancia=0):
+        self.tipo_horario_id = tipo_horario_id
+        self.es_turno_24h = es_turno_24h
+        self.entrada = segundos(hora_entrada) if hora_entrada is not None else None
+        self.limite = self.entrada + minutos_tolerancia * 60 if self.entrada is not None else None
+
+    def retardo(self, fecha, hora, ultima_entrada=None):
+        """
+        Retardo de una ENTRADA el ``fecha`` a la ``hora``.
+
+        En turnos de 24h ``ultima_entrada`` es ``(fecha, hora)`` de la ENTRADA
+        anterior a ``fecha``; sin ella (primera entrada) no hay retardo.
+        """
+        if self.es_turno_24h:
+            if ultima_entrada is None:
+                return False, 0
+            diferencia = (
+                (fecha - ultima_entrada[0]).days * SEGUNDOS_DIA
+                + segundos(hora) - segundos(ultima_entrada[1])
+            )
+            if diferencia > LIMITE_24H:
+                return True, int((diferencia - CICLO_24H) / 60)
+            return False, 0
+
+        if self.limite is None:
+            return False, 0
+        actual = segundos(hora)
+        if actual > self.limite:
+            return True, int((actual - self.entrada) / 60)
+        return False, 0
+
+
+def compilar_horario(tipo_horario=None, hora_entrada=None, minutos_tolerancia=15):
+    """
+    Compila la regla de ``tipo_horario`` (TipoHorario o HorarioCache).
+
+    ``hora_entrada`` (``time`` o ``"HH:MM:SS"``) y ``minutos_tolerancia`` son
+    los de la configuración general, que aplican a empleados sin tipo de
+    horario o cuyo horario no define hora de entrada. Sin ninguno de los dos
+    el horario nunca marca retardo.
+    """
+    if tipo_horario is not None:
+        if tipo_horario.es_turno_24h:
+            return HorarioCompilado(tipo_horario.id, es_turno_24h=True)
+        if tipo_horario.hora_entrada:
+            return HorarioCompilado(
+                tipo_horario.id, hora_entrada=tipo_horario.hora_entrada,
+                minutos_tolerancia=tipo_horario.minutos_tolerancia
+            )
+    return HorarioCompilado(
+        tipo_horario.id if tipo_horario is not None else None,
+        hora_entrada=_a_time(hora_entrada), minutos_tolerancia=minutos_tolerancia
+    )
+
+
+def retardos_en_serie(horario, entradas, ultima_entrada=None):
+    """
+    Retardos de las ENTRADAS de un empleado en orden cronológico.
+
+    ``entradas`` es una secuencia de ``(fecha, hora)`` ordenada; en turnos de
+    24h cada una se compara con la última ENTRADA de un día anterior, igual
+    que en la checada. ``ultima_entrada`` es la ENTRADA previa al rango.
+    Regresa una lista de ``(retardo, minutos_retardo)``.
+    """
+    if not horario.es_turno_24h:
+        return [horario.retardo(fecha, hora) for fecha, hora in entradas]
+
+    resultados = []
+    anterior = ultima_entrada  # Última ENTRADA de un día anterior al actual
+    del_dia = None  # Última ENTRADA vista en el día actual
+    for fecha, hora in entradas:
+        if del_dia is not None and del_dia[0] < fecha:
+            anterior = del_dia
+        resultados.append(horario.retardo(fecha, hora, anterior))
+        del_dia = (fecha, hora)
+    return resultados
+
+
+def ultima_entrada(empleado_id, fecha):
+    """``(fecha, hora)`` de la última ENTRADA del empleado antes de ``fecha`` (o None)"""
+    from .models import Asistencia, TipoMovimiento
+
+    return Asistencia.objects.filter(
+        empleado_id=empleado_id,
+        tipo_movimiento=TipoMovimiento.ENTRADA,
+        fecha__lt=fecha
+    ).order_by('-fecha', '-hora').values_list('fecha', 'hora').first()
+
+
+def recalcular_retardos(fecha_inicio, fecha_fin, empleado_ids=None, dry_run=False,
+                        tamano_lote=1000, progreso=None):
+    """
+    Recalcula ``retardo``/``minutos_retardo`` de las ENTRADAS del rango.
+
+    Las entradas se leen ordenadas por empleado, fecha y hora en una sola
+    consulta; cada empleado se evalúa con su regla compilada y solo las
+    filas que cambian se escriben, en lotes de ``tamano_lote`` (cada lote es
+    su propia transacción: si se interrumpe basta con volver a correrlo).
+    Después se reconstruye el ResumenDiario de los empleados afectados. Con
+    ``dry_run`` no se escribe nada. ``progreso(revisadas, total)`` se llama
+    cada ``tamano_lote`` entradas revisadas. Regresa un ``ResultadoRecalculo`` con la lista de ``CambioRetardo``
+    (``antes``/``despues`` son tuplas ``(retardo, minutos_retardo)``).
+    """
+    from .cache import horario_compilado
+    from .models import Asistencia, Empleado, TipoMovimiento
+    from .resumenes import reconstruir_resumen_diario
+
+    entradas = Asistencia.objects.filter(
+        tipo_movimiento=TipoMovimiento.ENTRADA,
+        fecha__gte=fecha_inicio,
+        fecha__lte=fecha_fin,
+    )
+    if empleado_ids is not None:
+        entradas = entradas.filter(empleado_id__in=empleado_ids)
+    total = entradas.count()
+
+    empleados = Empleado.objects.all()
+    if empleado_ids is not None:
+        empleados = empleados.filter(pk__in=empleado_ids)
+    horarios = dict(empleados.values_list('pk', 'tipo_horario_id'))
+
+    filas = entradas.order_by('empleado_id', 'fecha', 'hora', 'pk').values_list(
+        'pk', 'empleado_id', 'fecha', 'hora', 'retardo', 'minutos_retardo'
+    )
+
+    cambios, pendientes = [], []
+    revisadas = avisadas = 0
+
+    def escribir():
+        nonlocal avisadas
+        if pendientes and not dry_run:
+            Asistencia.objects.bulk_update(pendientes, ['retardo', 'minutos_retardo'])
+        pendientes.clear()
+        if progreso:
+            progreso(revisadas, total)
+        avisadas = revisadas
+
+    for empleado_id, grupo in groupby(filas.iterator(chunk_size=tamano_lote), key=lambda f: f[1]):
+        grupo = list(grupo)
+        horario = horario_compilado(horarios.get(empleado_id))
+        anterior = ultima_entrada(empleado_id, fecha_inicio) if horario.es_turno_24h else None
+        resultados = retardos_en_serie(horario, [(f[2], f[3]) for f in grupo], anterior)
+
+        for (pk, _, fecha, hora, retardo, minutos), despues in zip(grupo, resultados):
+            if (retardo, minutos) != despues:
+                cambios.append(CambioRetardo(pk, empleado_id, fecha, hora, (retardo, minutos), despues))
+                pendientes.append(Asistencia(pk=pk, retardo=despues[0], minutos_retardo=despues[1]))
+        revisadas += len(grupo)
+        if len(pendientes) >= tamano_lote or revisadas - avisadas >= tamano_lote:
+            escribir()
+    if pendientes or revisadas != avisadas:
+        escribir()
+
+    if cambios and not dry_run:
+        reconstruir_resumen_diario(
+            fecha_inicio, fecha_fin, sorted({cambio.empleado_id for cambio in cambios})
+        )
+
+    return ResultadoRecalculo(revisadas=revisadas, cambios=cambios)
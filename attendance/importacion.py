@@ -0,0 +1,302 @@
+"""
+Importación masiva de empleados desde el CSV de RH (columnas No, Nombre,
+Puesto, Departamento).
+
+Se precargan en memoria los departamentos, usernames y empleados existentes,
+las colisiones de username se resuelven contra ese conjunto y todo se
+escribe con ``bulk_create``/``bulk_update`` en una sola transacción. La
+contraseña temporal se hashea una sola vez. Los QR se generan después, en
+un paso aparte, porque cada uno implica una subida a Spaces.
+
+Cada fila guarda en ``Empleado.hash_importacion`` un hash de su contenido:
+en una sincronización solo se tocan las filas cuyo hash cambió, y los
+empleados importados que ya no vienen en el CSV se desactivan y quedan
+marcados con ``baja_por_importacion``. Si vuelven a venir en el CSV se
+reactivan; a los que se dieron de baja a mano en el admin la importación
+nunca los reactiva.
+"""
+import csv
+import hashlib
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .cache import invalidar_empleados
+from .models import Departamento, Empleado
+
+logger = logging.getLogger(__name__)
+
+PASSWORD_TEMPORAL = 'temp12345'
+TAMANO_LOTE = 500
+
+# Nombres de departamento del CSV que difieren de los de la base de datos
+MAPEO_DEPARTAMENTOS = {
+    'Compras y Logística / Cadena de Suministro': 'Compras y Logística',
+}
+
+FilaEmpleado = namedtuple('FilaEmpleado', [
+    'linea', 'codigo_empleado', 'nombre_completo', 'first_name', 'last_name', 'departamento', 'hash',
+])
+
+Cambio = namedtuple('Cambio', ['accion', 'codigo_empleado', 'nombre', 'detalle'])
+
+ResultadoImportacion = namedtuple('ResultadoImportacion', [
+    'creados', 'actualizados', 'sin_cambios', 'desactivados', 'departamentos_creados', 'cambios', 'errores',
+])
+
+
+def email_departamento(nombre):
+    return f"{nombre.lower().replace(' ', '_').replace('/', '_')}@empresa.com"
+
+
+def username_base(nombre_completo):
+    """``nombre.apellido`` con las dos primeras palabras del nombre"""
+    partes = nombre_completo.lower().split()
+    return '.'.join(partes[:2])
+
+
+def hash_fila(codigo_empleado, nombre_completo, departamento):
+    """Hash del contenido importable de una fila (lo que termina en la base de datos)"""
+    return hashlib.sha1(f"{codigo_empleado}|{nombre_completo}|{departamento}".encode()).hexdigest()
+
+
+def leer_csv(archivo):
+    """Lee el CSV y regresa ``(filas, errores)`` con las filas válidas ya normalizadas"""
+    filas, errores = [], []
+    with open(archivo, newline='', encoding='utf-8-sig') as f:
+        for linea, registro in enumerate(csv.DictReader(f), start=2):
+            try:
+                numero = registro['No'].strip()
+                nombre_completo = ' '.join(registro['Nombre'].split())
+                departamento = registro['Departamento'].strip()
+            except (KeyError, AttributeError) as e:
+                errores.append(f"Línea {linea}: columna faltante {e}")
+                continue
+
+            # Plazas sin ocupar
+            if not nombre_completo or nombre_completo.upper() == 'VACANTE':
+                continue
+            if not numero:
+                errores.append(f"Línea {linea}: {nombre_completo} sin número de empleado")
+                continue
+
+            partes = nombre_completo.split()
+            codigo_empleado = f"EMP{numero.zfill(3)}"
+            departamento = MAPEO_DEPARTAMENTOS.get(departamento, departamento)
+            filas.append(FilaEmpleado(
+                linea=linea,
+                codigo_empleado=codigo_empleado,
+                nombre_completo=nombre_completo,
+                first_name=' '.join(partes[:-1]) if len(partes) > 1 else partes[0],
+                last_name=partes[-1] if len(partes) > 1 else '',
+                departamento=departamento,
+                hash=hash_fila(codigo_empleado, nombre_completo, departamento),
+            ))
+    return filas, errores
+
+
+def _username_libre(base, usados):
+    username, contador = base, 1
+    while username in usados:
+        username = f"{base}{contador}"
+        contador += 1
+    usados.add(username)
+    return username
+
+
+def importar_empleados(filas, dry_run=False, desactivar_faltantes=True):
+    """
+    Crea o actualiza los empleados de ``filas`` (ver ``leer_csv``).
+
+    Las filas cuyo hash coincide con el guardado no se tocan, salvo para
+    reactivar a los empleados que la propia importación desactivó (los dados
+    de baja a mano siguen inactivos). Con ``desactivar_faltantes`` los empleados activos
+    que se importaron antes y ya no vienen en ``filas`` quedan con
+    ``activo=False``; los creados a mano (sin hash) no se desactivan. Con
+    ``dry_run`` no se escribe nada y solo se calculan los cambios. Los
+    empleados nuevos quedan sin QR (ver ``generar_qr_pendientes``). Regresa
+    un ``ResultadoImportacion``.
+    """
+    cambios, errores = [], []
+
+    vistos = set()
+    unicas = []
+    for fila in filas:
+        if fila.codigo_empleado in vistos:
+            errores.append(f"Línea {fila.linea}: código {fila.codigo_empleado} repetido en el CSV")
+            continue
+        vistos.add(fila.codigo_empleado)
+        unicas.append(fila)
+
+    departamentos = {d.nombre: d for d in Departamento.objects.all()}
+    usernames = set(User.objects.values_list('username', flat=True))
+    existentes = {
+        e.codigo_empleado: e
+        for e in Empleado.objects.select_related('user', 'departamento').filter(codigo_empleado__in=vistos)
+    }
+
+    departamentos_nuevos = sorted({f.departamento for f in unicas} - set(departamentos))
+    for nombre in departamentos_nuevos:
+        cambios.append(Cambio('crear departamento', '', nombre, email_departamento(nombre)))
+
+    nuevos = []  # (fila, username)
+    empleados_cambiados, usuarios_cambiados = [], []  # empleados: (empleado, departamento)
+    sin_cambios = 0
+    for fila in unicas:
+        empleado = existentes.get(fila.codigo_empleado)
+        if empleado is None:
+            username = _username_libre(username_base(fila.nombre_completo), usernames)
+            nuevos.append((fila, username))
+            cambios.append(Cambio('crear', fila.codigo_empleado, fila.nombre_completo, fila.departamento))
+            continue
+
+        if empleado.hash_importacion == fila.hash and not empleado.baja_por_importacion:
+            sin_cambios += 1
+            continue
+
+        usuario = empleado.user
+        detalle = []
+        valores = {
+            'first_name': fila.first_name,
+            'last_name': fila.last_name,
+            'email': f"{usuario.username}@empresa.com",
+        }
+        for campo, valor in valores.items():
+            if getattr(usuario, campo) != valor:
+                detalle.append(f"{campo}: {getattr(usuario, campo)!r} → {valor!r}")
+                setattr(usuario, campo, valor)
+        if detalle:
+            usuarios_cambiados.append(usuario)
+
+        departamento_actual = empleado.departamento.nombre if empleado.departamento else None
+        if departamento_actual != fila.departamento:
+            detalle.append(f"departamento: {departamento_actual!r} → {fila.departamento!r}")
+        if empleado.baja_por_importacion:
+            detalle.append("reactivar (vuelve a venir en el CSV)")
+            empleado.activo = True
+            empleado.baja_por_importacion = False
+        # El hash se guarda aunque los datos ya coincidan (p. ej. la primera sincronización)
+        empleado.hash_importacion = fila.hash
+        empleados_cambiados.append((empleado, fila.departamento))
+
+        if detalle:
+            cambios.append(Cambio('actualizar', fila.codigo_empleado, fila.nombre_completo, '; '.join(detalle)))
+        else:
+            sin_cambios += 1
+
+    faltantes = []
+    if desactivar_faltantes:
+        faltantes = list(
+            Empleado.objects.filter(activo=True).exclude(hash_importacion='').exclude(
+                codigo_empleado__in=vistos
+            ).select_related('user')
+        )
+        for empleado in faltantes:
+            cambios.append(Cambio(
+                'desactivar', empleado.codigo_empleado, empleado.user.get_full_name(), 'no viene en el CSV'
+            ))
+
+    resultado = ResultadoImportacion(
+        creados=len(nuevos),
+        actualizados=len({c.codigo_empleado for c in cambios if c.accion == 'actualizar'}),
+        sin_cambios=sin_cambios,
+        desactivados=len(faltantes),
+        departamentos_creados=len(departamentos_nuevos),
+        cambios=cambios,
+        errores=errores,
+    )
+    if dry_run:
+        return resultado
+
+    with transaction.atomic():
+        if departamentos_nuevos:
+            Departamento.objects.bulk_create([
+                Departamento(nombre=nombre, email=email_departamento(nombre)) for nombre in departamentos_nuevos
+            ])
+            # MySQL no regresa los ids de bulk_create
+            departamentos.update({
+                d.nombre: d for d in Departamento.objects.filter(nombre__in=departamentos_nuevos)
+            })
+
+        if nuevos:
+            password = make_password(PASSWORD_TEMPORAL)
+            User.objects.bulk_create([
+                User(
+                    username=username,
+                    email=f"{username}@empresa.com",
+                    password=password,
+                    first_name=fila.first_name,
+                    last_name=fila.last_name,
+                )
+                for fila, username in nuevos
+            ], batch_size=TAMANO_LOTE)
+            ids_usuario = dict(
+                User.objects.filter(username__in=[u for _, u in nuevos]).values_list('username', 'id')
+            )
+            # bulk_create no llama a save(): los QR se generan en generar_qr_pendientes
+            Empleado.objects.bulk_create([
+                Empleado(
+                    user_id=ids_usuario[username],
+                    codigo_empleado=fila.codigo_empleado,
+                    departamento=departamentos[fila.departamento],
+                    tiempo_extra_habilitado=False,
+                    activo=True,
+                    hash_importacion=fila.hash,
+                )
+                for fila, username in nuevos
+            ], batch_size=TAMANO_LOTE)
+
+        if usuarios_cambiados:
+            User.objects.bulk_update(
+                usuarios_cambiados, ['first_name', 'last_name', 'email'], batch_size=TAMANO_LOTE
+            )
+        if empleados_cambiados:
+            for empleado, departamento in empleados_cambiados:
+                empleado.departamento = departamentos[departamento]
+            Empleado.objects.bulk_update(
+                [e for e, _ in empleados_cambiados],
+                ['departamento', 'activo', 'baja_por_importacion', 'hash_importacion'],
+                batch_size=TAMANO_LOTE
+            )
+        if faltantes:
+            Empleado.objects.filter(pk__in=[e.pk for e in faltantes]).update(activo=False, baja_por_importacion=True)
+
+        # Las operaciones masivas no disparan señales
+        transaction.on_commit(invalidar_empleados)
+
+    return resultado
+
+
+def generar_qr_pendientes(hilos=8):
+    """
+    Genera y sube el QR de los empleados que no lo tienen.
+
+    Las subidas a Spaces son E/S, así que se hacen en varios hilos; los
+    nombres se guardan con ``bulk_update``. Regresa cuántos se generaron.
+    """
+    if not settings.QR_GUARDAR_EN_STORAGE:
+        return 0
+
+    pendientes = list(Empleado.objects.filter(qr_code=''))
+    if not pendientes:
+        return 0
+
+    def generar(empleado):
+        try:
+            empleado.generar_qr()
+            return empleado
+        except Exception as e:
+            logger.error(f"❌ Error generando QR de {empleado.codigo_empleado}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        generados = [e for e in pool.map(generar, pendientes) if e is not None]
+
+    Empleado.objects.bulk_update(generados, ['qr_code'], batch_size=TAMANO_LOTE)
+    logger.info(f"📸 {len(generados)} códigos QR generados")
+    return len(generados)
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from attendance.almacenamiento import MAX_LLAVES_S3, eliminar_archivos_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Borra del storage (Spaces) los archivos pendientes de QR reemplazados o eliminados'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lote', type=int, default=MAX_LLAVES_S3,
+            help=f'Archivos a borrar por lote (máximo {MAX_LLAVES_S3})'
+        )
+        parser.add_argument(
+            '--continuo', action='store_true',
+            help='Seguir procesando la cola indefinidamente (modo worker)'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=60.0,
+            help='Segundos de espera cuando la cola está vacía (modo continuo)'
+        )
+
+    def handle(self, *args, **options):
+        lote = min(options['lote'], MAX_LLAVES_S3)
+        total_eliminados = total_fallidos = 0
+
+        while True:
+            close_old_connections()
+            eliminados, fallidos = eliminar_archivos_pendientes(lote)
+            total_eliminados += eliminados
+            total_fallidos += fallidos
+
+            if options['continuo'] and (eliminados or fallidos):
+                self.stdout.write(f'Eliminados: {eliminados} | Fallidos: {fallidos}')
+
+            # Un lote incompleto significa que ya no quedan archivos pendientes
+            if eliminados + fallidos < lote:
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Cola de archivos procesada. Eliminados: {total_eliminados} | Fallidos: {total_fallidos}'
+        ))
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.importacion import generar_qr_pendientes, importar_empleados, leer_csv
+
+
+class Command(BaseCommand):
+    help = 'Importa o actualiza empleados desde el CSV de RH (columnas No, Nombre, Puesto, Departamento)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', help='Ruta al archivo CSV')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Mostrar los cambios que se aplicarían sin escribir nada'
+        )
+        parser.add_argument(
+            '--sin-qr', action='store_true',
+            help='No generar los QR de los empleados nuevos (se sirven desde /qr/ bajo demanda)'
+        )
+        parser.add_argument(
+            '--sin-desactivar', action='store_true',
+            help='No desactivar a los empleados importados que ya no vienen en el CSV'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            filas, errores = leer_csv(options['archivo'])
+        except FileNotFoundError:
+            raise CommandError(f"No se encontró el archivo {options['archivo']}")
+
+        # Con filas ilegibles no se sabe quién falta de verdad: no desactivar a nadie
+        desactivar = not options['sin_desactivar'] and not errores
+        if errores and not options['sin_desactivar']:
+            self.stdout.write(self.style.WARNING('El CSV tiene errores; no se desactivará a ningún empleado'))
+
+        resultado = importar_empleados(filas, dry_run=options['dry_run'], desactivar_faltantes=desactivar)
+        errores += resultado.errores
+
+        # Las altas solo se listan con --dry-run o -v 2 (en la carga inicial son todas las filas)
+        detallar_altas = options['dry_run'] or options['verbosity'] > 1
+        for cambio in resultado.cambios:
+            if cambio.accion.startswith('crear') and not detallar_altas:
+                continue
+            prefijo = {'crear': '+', 'actualizar': '~', 'desactivar': '-'}.get(cambio.accion, '*')
+            self.stdout.write(f"{prefijo} {cambio.accion} {cambio.codigo_empleado} {cambio.nombre}: {cambio.detalle}")
+
+        for error in errores:
+            self.stdout.write(self.style.ERROR(f'  {error}'))
+
+        encabezado = 'Cambios por aplicar' if options['dry_run'] else 'Importación completada'
+        self.stdout.write(self.style.SUCCESS(
+            f'{encabezado}. Creados: {resultado.creados} | Actualizados: {resultado.actualizados} | '
+            f'Sin cambios: {resultado.sin_cambios} | Desactivados: {resultado.desactivados} | Departamentos nuevos: {resultado.departamentos_creados} | '
+            f'Errores: {len(errores)}'
+        ))
+
+        if not options['dry_run'] and not options['sin_qr'] and resultado.creados:
+            self.stdout.write('Generando códigos QR...')
+            self.stdout.write(f'QR generados: {generar_qr_pendientes()}')
@@ -0,0 +1,66 @@
+import time
+import uuid
+from datetime import datetime, time as dtime, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from attendance.cache import empleado_a_cache
+from attendance.checadas import registrar_checada
+from attendance.models import Empleado
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide consultas SQL y tiempo por checada registrando días completos de un empleado '
+        'sintético dentro de una transacción que se revierte'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=20, help='Días de checadas a registrar')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._medir(options['dias'])
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+    def _medir(self, dias):
+        sufijo = uuid.uuid4().hex[:6]
+        usuario = User.objects.create(username=f'medicion_{sufijo}', first_name='Medición')
+        # bulk_create no llama a save(), así que no se genera ni sube QR
+        empleado = Empleado.objects.bulk_create([Empleado(user=usuario, codigo_empleado=f'M{sufijo}')])[0]
+        empleado = empleado_a_cache(Empleado.objects.select_related('user').get(pk=empleado.pk))
+
+        horas = (dtime(9, 5), dtime(14, 0), dtime(15, 0), dtime(18, 0))
+        inicio_fecha = timezone.localdate() - timedelta(days=dias)
+        consultas = {}
+        total_ms = 0.0
+        checadas = 0
+
+        for dia in range(dias):
+            fecha = inicio_fecha + timedelta(days=dia)
+            for hora in horas:
+                momento = timezone.make_aware(datetime.combine(fecha, hora))
+                with CaptureQueriesContext(connection) as capturadas:
+                    inicio = time.perf_counter()
+                    asistencia = registrar_checada(empleado, momento)
+                    total_ms += (time.perf_counter() - inicio) * 1000
+                checadas += 1
+                consultas.setdefault(asistencia.tipo_movimiento, []).append(len(capturadas.captured_queries))
+
+        for tipo, conteos in consultas.items():
+            self.stdout.write(f'  {tipo}: {sum(conteos) / len(conteos):.1f} consultas por checada')
+        self.stdout.write(self.style.SUCCESS(
+            f'{checadas} checadas, {sum(map(sum, consultas.values())) / checadas:.1f} consultas '
+            f'y {total_ms / checadas:.2f} ms en promedio'
+        ))
@@ -0,0 +1,83 @@
+import csv
+import os
+import random
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from attendance.importacion import hash_fila, importar_empleados, leer_csv
+
+
+class _Rollback(Exception):
+    pass
+
+
+NOMBRES = ['JUAN', 'MARIA', 'JOSE', 'ANA', 'LUIS', 'SOFIA', 'CARLOS', 'LAURA', 'PEDRO', 'ELENA']
+APELLIDOS = ['GARCIA', 'LOPEZ', 'MARTINEZ', 'HERNANDEZ', 'PEREZ', 'SANCHEZ', 'RAMIREZ', 'TORRES']
+DEPARTAMENTOS = ['Operaciones', 'Seguridad', 'Servicio al Cliente', 'Mantenimiento y Taller']
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera un CSV sintético de empleados y mide la importación (alta, reimportación '
+        'sin cambios, dry-run y sincronización con cambios) dentro de una transacción que se revierte'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, default=10000, help='Empleados en el CSV sintético')
+
+    def handle(self, *args, **options):
+        archivo = self._generar_csv(options['filas'])
+        try:
+            with transaction.atomic():
+                filas, _ = leer_csv(archivo)
+                self._medir('Alta inicial', lambda: importar_empleados(filas))
+                self._medir('Reimportación sin cambios', lambda: importar_empleados(filas))
+                self._medir('Dry-run', lambda: importar_empleados(filas, dry_run=True))
+                self._medir('Sincronización (1% cambia, 1% sale)', lambda: importar_empleados(self._variar(filas)))
+                raise _Rollback()
+        except _Rollback:
+            pass
+        finally:
+            os.remove(archivo)
+
+    def _generar_csv(self, total):
+        aleatorio = random.Random(0)
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, newline='', encoding='utf-8') as f:
+            escritor = csv.writer(f)
+            escritor.writerow(['No', 'Nombre', 'Puesto', 'Departamento'])
+            for numero in range(1, total + 1):
+                # Pocos nombres distintos para forzar colisiones de username
+                nombre = f'{aleatorio.choice(NOMBRES)} {aleatorio.choice(APELLIDOS)} {aleatorio.choice(APELLIDOS)}'
+                escritor.writerow([900000 + numero, nombre, 'PUESTO', aleatorio.choice(DEPARTAMENTOS)])
+            return f.name
+
+    def _variar(self, filas):
+        """Copia de ``filas`` con el 1% en otro departamento y otro 1% fuera del CSV"""
+        paso = max(len(filas) // 100, 1)
+        variadas = []
+        for i, fila in enumerate(filas):
+            if i % paso == 1:
+                continue
+            if i % paso == 0:
+                departamento = DEPARTAMENTOS[(DEPARTAMENTOS.index(fila.departamento) + 1) % len(DEPARTAMENTOS)]
+                fila = fila._replace(
+                    departamento=departamento,
+                    hash=hash_fila(fila.codigo_empleado, fila.nombre_completo, departamento),
+                )
+            variadas.append(fila)
+        return variadas
+
+    def _medir(self, etiqueta, funcion):
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            resultado = funcion()
+            segundos = time.perf_counter() - inicio
+        self.stdout.write(
+            f'{etiqueta}: {segundos:.2f} s, {len(consultas.captured_queries)} consultas '
+            f'(creados {resultado.creados}, actualizados {resultado.actualizados}, '
+            f'sin cambios {resultado.sin_cambios}, desactivados {resultado.desactivados})'
+        )
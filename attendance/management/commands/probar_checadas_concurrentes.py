@@ -0,0 +1,100 @@
+import threading
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+
+from attendance.cache import empleado_a_cache
+from attendance.checadas import ChecadaRechazada, registrar_checada, siguiente_movimiento
+from attendance.models import Asistencia, Empleado, ResumenDiario
+
+
+class Command(BaseCommand):
+    help = (
+        'Dispara escaneos simultáneos del mismo gafete desde varios hilos y verifica '
+        'que la secuencia de movimientos guardada no tenga duplicados'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8, help='Escaneos simultáneos por ronda')
+        parser.add_argument('--rondas', type=int, default=5, help='Número de rondas')
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'sqlite':
+            self.stdout.write(self.style.WARNING(
+                'SQLite no soporta SELECT ... FOR UPDATE; usa la base MySQL para una prueba representativa'
+            ))
+
+        sufijo = uuid.uuid4().hex[:6]
+        usuario = User.objects.create(username=f'concurrencia_{sufijo}', first_name='Prueba')
+        # bulk_create no llama a save(), así que no se genera ni sube QR
+        empleado = Empleado.objects.bulk_create([
+            Empleado(user=usuario, codigo_empleado=f'C{sufijo}')
+        ])[0]
+        empleado = empleado_a_cache(Empleado.objects.select_related('user').get(pk=empleado.pk))
+
+        try:
+            errores = []
+            for _ in range(options['rondas']):
+                errores += self._ronda(empleado, options['hilos'])
+            fallas = self._verificar(empleado)
+        finally:
+            usuario.delete()
+
+        for error in errores:
+            self.stdout.write(self.style.WARNING(f'  {type(error).__name__}: {error}'))
+        # En SQLite los escaneos concurrentes pueden fallar con "database is locked"
+        if errores and connection.vendor != 'sqlite':
+            fallas.append(f'{len(errores)} escaneos terminaron con error')
+        if fallas:
+            raise CommandError('; '.join(fallas))
+        self.stdout.write(self.style.SUCCESS(
+            f'Secuencia correcta tras {options["rondas"]} rondas de {options["hilos"]} escaneos simultáneos'
+        ))
+
+    def _ronda(self, empleado, hilos):
+        barrera = threading.Barrier(hilos)
+        errores = []
+
+        def escanear():
+            try:
+                barrera.wait()
+                registrar_checada(empleado)
+            except ChecadaRechazada:
+                pass
+            except Exception as e:
+                errores.append(e)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=escanear) for _ in range(hilos)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        close_old_connections()
+        return errores
+
+    def _verificar(self, empleado):
+        fallas = []
+        movimientos = list(
+            Asistencia.objects.filter(empleado_id=empleado.id).order_by('fecha', 'hora', 'id').values_list(
+                'fecha', 'tipo_movimiento'
+            )
+        )
+        self.stdout.write(f'Movimientos guardados: {len(movimientos)}')
+
+        anterior = (None, None)
+        for fecha, tipo in movimientos:
+            ultimo = anterior[1] if anterior[0] == fecha else None
+            esperado = siguiente_movimiento(ultimo, empleado.tipo_horario)
+            if tipo != esperado:
+                fallas.append(f'{fecha}: se esperaba {esperado} después de {ultimo} y se guardó {tipo}')
+            anterior = (fecha, tipo)
+
+        entradas = ResumenDiario.objects.filter(empleado_id=empleado.id, hora_entrada__isnull=False).count()
+        dias = len({fecha for fecha, _ in movimientos})
+        if entradas != dias:
+            fallas.append(f'ResumenDiario con {entradas} entradas para {dias} días con checadas')
+        return fallas
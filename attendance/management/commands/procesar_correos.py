@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from attendance.correo import procesar_correos_pendientes
+
+
+class Command(BaseCommand):
+    help = 'Envía los correos pendientes de la bandeja de salida (visitantes, notificaciones)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=50, help='Correos a enviar por lote')
+        parser.add_argument(
+            '--continuo', action='store_true',
+            help='Seguir procesando la bandeja indefinidamente (modo worker)'
+        )
+        parser.add_argument(
+            '--intervalo', type=float, default=5.0,
+            help='Segundos de espera cuando la bandeja está vacía (modo continuo)'
+        )
+
+    def handle(self, *args, **options):
+        total_enviados = total_fallidos = 0
+
+        while True:
+            close_old_connections()
+            enviados, fallidos = procesar_correos_pendientes(options['lote'])
+            total_enviados += enviados
+            total_fallidos += fallidos
+
+            if options['continuo'] and (enviados or fallidos):
+                self.stdout.write(f'Enviados: {enviados} | Fallidos: {fallidos}')
+
+            # Un lote incompleto significa que ya no quedan correos vencidos
+            if enviados + fallidos < options['lote']:
+                if not options['continuo']:
+                    break
+                time.sleep(options['intervalo'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Bandeja de salida procesada. Enviados: {total_enviados} | Fallidos: {total_fallidos}'
+        ))
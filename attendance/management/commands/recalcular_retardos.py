@@ -0,0 +1,84 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from attendance.horarios import recalcular_retardos
+from attendance.models import Asistencia, Empleado
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor} (usa AAAA-MM-DD)')
+
+
+def _describir(valores):
+    retardo, minutos = valores
+    return f'retardo {minutos} min' if retardo else 'a tiempo'
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula retardo/minutos_retardo de las entradas con los horarios vigentes '
+        '(después de editar un tipo de horario o reasignarlo) y reconstruye el resumen diario'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=_fecha, help='Fecha inicial AAAA-MM-DD (default: primera checada)')
+        parser.add_argument('--hasta', type=_fecha, help='Fecha final AAAA-MM-DD (default: hoy)')
+        parser.add_argument('--empleado', action='append', type=int, help='ID de empleado (se puede repetir)')
+        parser.add_argument(
+            '--tipo-horario', action='append', type=int,
+            help='Solo empleados con este tipo de horario (ID, se puede repetir)'
+        )
+        parser.add_argument('--lote', type=int, default=1000, help='Entradas por lote de escritura')
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Mostrar las entradas que cambiarían sin escribir nada'
+        )
+
+    def handle(self, *args, **options):
+        desde = options['desde'] or Asistencia.objects.aggregate(primera=Min('fecha'))['primera']
+        if desde is None:
+            self.stdout.write(self.style.WARNING('No hay checadas registradas'))
+            return
+        hasta = options['hasta'] or timezone.localdate()
+        if hasta < desde:
+            raise CommandError('--hasta no puede ser anterior a --desde')
+
+        empleado_ids = options['empleado']
+        if options['tipo_horario']:
+            empleados = Empleado.objects.filter(tipo_horario_id__in=options['tipo_horario'])
+            if empleado_ids:
+                empleados = empleados.filter(pk__in=empleado_ids)
+            empleado_ids = list(empleados.values_list('pk', flat=True))
+
+        def progreso(revisadas, total):
+            if total:
+                self.stdout.write(f'  {revisadas}/{total} entradas revisadas ({revisadas * 100 // total}%)')
+
+        self.stdout.write(f'Recalculando retardos del {desde} al {hasta}...')
+        resultado = recalcular_retardos(
+            desde, hasta, empleado_ids, dry_run=options['dry_run'],
+            tamano_lote=options['lote'], progreso=progreso
+        )
+
+        if options['dry_run'] or options['verbosity'] > 1:
+            nombres = dict(
+                Empleado.objects.filter(
+                    pk__in={cambio.empleado_id for cambio in resultado.cambios}
+                ).values_list('pk', 'codigo_empleado')
+            )
+            for cambio in resultado.cambios:
+                self.stdout.write(
+                    f'~ {nombres.get(cambio.empleado_id)} {cambio.fecha} {cambio.hora:%H:%M}: '
+                    f'{_describir(cambio.antes)} → {_describir(cambio.despues)}'
+                )
+
+        encabezado = 'Cambios por aplicar' if options['dry_run'] else 'Recálculo completado'
+        self.stdout.write(self.style.SUCCESS(
+            f'{encabezado}. Entradas revisadas: {resultado.revisadas} | Modificadas: {len(resultado.cambios)}'
+        ))
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+from django.utils import timezone
+
+from attendance.models import Asistencia
+from attendance.resumenes import reconstruir_resumen_diario
+
+
+def _fecha(valor):
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {valor} (usa AAAA-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye la tabla ResumenDiario a partir de las checadas. Sin fechas '
+        'procesa todo el historial (necesario después de aplicar la migración)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=_fecha, help='Fecha inicial AAAA-MM-DD (default: primera checada)')
+        parser.add_argument('--hasta', type=_fecha, help='Fecha final AAAA-MM-DD (default: hoy)')
+        parser.add_argument('--empleado', action='append', type=int, help='ID de empleado (se puede repetir)')
+
+    def handle(self, *args, **options):
+        limites = Asistencia.objects.aggregate(primera=Min('fecha'), ultima=Max('fecha'))
+        if limites['primera'] is None:
+            self.stdout.write(self.style.WARNING('No hay checadas registradas'))
+            return
+
+        desde = options['desde'] or limites['primera']
+        hasta = options['hasta'] or max(limites['ultima'], timezone.localdate())
+        if hasta < desde:
+            raise CommandError('--hasta no puede ser anterior a --desde')
+
+        self.stdout.write(f'Reconstruyendo resúmenes del {desde} al {hasta}...')
+        creados = reconstruir_resumen_diario(desde, hasta, options['empleado'])
+        self.stdout.write(self.style.SUCCESS(f'Resúmenes diarios creados: {creados}'))
@@ -0,0 +1,135 @@
+import random
+import time
+import uuid
+from datetime import date, time as dtime, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from attendance.models import (
+    Asistencia, Departamento, Empleado, RegistroVisita, TipoMovimiento, Visitante
+)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Siembra un año de checadas sintéticas dentro de una transacción (que se revierte), '
+        'mide las consultas más frecuentes y verifica con EXPLAIN que usen los índices compuestos'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--empleados', type=int, default=100, help='Empleados sintéticos a crear')
+        parser.add_argument('--dias', type=int, default=365, help='Días de historia a sembrar')
+        parser.add_argument('--repeticiones', type=int, default=20, help='Ejecuciones por consulta medida')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._sembrar(options['empleados'], options['dias'])
+                fallas = self._verificar(options['repeticiones'])
+                raise _Rollback()
+        except _Rollback:
+            pass
+
+        if fallas:
+            raise CommandError(f'Consultas sin usar el índice esperado: {", ".join(fallas)}')
+        self.stdout.write(self.style.SUCCESS('Todas las consultas usan sus índices'))
+
+    def _sembrar(self, num_empleados, dias):
+        self.stdout.write(f'Sembrando {num_empleados} empleados x {dias} días...')
+        sufijo = uuid.uuid4().hex[:6]
+        departamento = Departamento.objects.create(nombre=f'Bench {sufijo}', email='bench@example.com')
+        usuarios = User.objects.bulk_create([
+            User(username=f'bench_{sufijo}_{i}', first_name='Bench', last_name=str(i))
+            for i in range(num_empleados)
+        ])
+        # bulk_create no llama a save(), así que no se generan ni suben QR
+        empleados = Empleado.objects.bulk_create([
+            Empleado(user=u, codigo_empleado=f'B{sufijo}{i}', departamento=departamento)
+            for i, u in enumerate(usuarios)
+        ])
+
+        hoy = date.today()
+        secuencia = [
+            TipoMovimiento.ENTRADA, TipoMovimiento.SALIDA_COMIDA,
+            TipoMovimiento.ENTRADA_COMIDA, TipoMovimiento.SALIDA,
+        ]
+        lote = []
+        for dia in range(dias):
+            fecha = hoy - timedelta(days=dia)
+            if fecha.weekday() >= 5:
+                continue
+            for empleado in empleados:
+                for tipo in secuencia:
+                    minutos = random.randint(0, 30)
+                    retardo = tipo == TipoMovimiento.ENTRADA and minutos > 15
+                    lote.append(Asistencia(
+                        empleado=empleado, fecha=fecha, tipo_movimiento=tipo,
+                        retardo=retardo, minutos_retardo=minutos if retardo else 0,
+                    ))
+            if len(lote) >= 5000:
+                Asistencia.objects.bulk_create(lote)
+                lote = []
+        Asistencia.objects.bulk_create(lote)
+
+        visitantes = Visitante.objects.bulk_create([
+            Visitante(
+                nombre=f'Visita {i}', email='visita@example.com', telefono='0',
+                departamento_visita=departamento, motivo='bench',
+                fecha_visita=hoy - timedelta(days=i % dias), hora_visita=dtime(10, 0),
+            )
+            for i in range(num_empleados * 10)
+        ])
+        RegistroVisita.objects.bulk_create([RegistroVisita(visitante=v) for v in visitantes])
+
+        if connection.vendor == 'mysql':
+            with connection.cursor() as cursor:
+                for modelo in (Asistencia, Visitante, RegistroVisita):
+                    cursor.execute(f'ANALYZE TABLE {modelo._meta.db_table}')
+        elif connection.vendor in ('sqlite', 'postgresql'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+        self._empleado = empleados[len(empleados) // 2]
+        self._visitante = visitantes[0]
+        self._hoy = hoy
+
+    def _consultas(self):
+        empleado, hoy = self._empleado, self._hoy
+        return [
+            ('ultimo_movimiento_del_dia', 'asist_emp_fecha_hora_idx', Asistencia.objects.filter(
+                empleado=empleado, fecha=hoy
+            ).order_by('-hora')[:1]),
+            ('ultima_entrada_turno_24h', 'asist_emp_tipo_fecha_idx', Asistencia.objects.filter(
+                empleado=empleado, tipo_movimiento=TipoMovimiento.ENTRADA, fecha__lt=hoy
+            ).order_by('-fecha', '-hora')[:1]),
+            ('retardos_del_dia', 'asist_fecha_tipo_ret_idx', Asistencia.objects.filter(
+                fecha=hoy, tipo_movimiento=TipoMovimiento.ENTRADA, retardo=True
+            )),
+            ('registro_visita_abierto', 'registro_vis_salida_idx', RegistroVisita.objects.filter(
+                visitante=self._visitante, hora_salida__isnull=True
+            )[:1]),
+            ('visitas_del_dia', 'visitante_fecha_idx', Visitante.objects.filter(fecha_visita=hoy)),
+        ]
+
+    def _verificar(self, repeticiones):
+        fallas = []
+        for nombre, indice, queryset in self._consultas():
+            plan = queryset.explain()
+            inicio = time.perf_counter()
+            for _ in range(repeticiones):
+                list(queryset.all())
+            promedio_ms = (time.perf_counter() - inicio) * 1000 / repeticiones
+
+            if indice in plan:
+                self.stdout.write(f'  ✓ {nombre}: {promedio_ms:.2f} ms ({indice})')
+            else:
+                fallas.append(nombre)
+                self.stdout.write(self.style.ERROR(f'  ✗ {nombre}: {promedio_ms:.2f} ms, plan sin {indice}'))
+                self.stdout.write(f'    {plan}')
+        return fallas
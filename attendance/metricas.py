@@ -0,0 +1,263 @@
+"""
+Métricas en formato Prometheus (contadores e histogramas) para ``/metrics``.
+
+Cada proceso acumula sus métricas en memoria y un hilo de fondo vuelca una
+foto cada ``INTERVALO_VOLCADO`` segundos (si hubo cambios) a
+``METRICAS_DIR/<pid>-<inicio>.json`` con escritura atómica; el nombre
+incluye el momento de arranque para que un pid reciclado no pise la foto de
+un worker muerto. ``/metrics`` suma las fotos de los workers vivos más
+``historico.json``, donde se acumulan (y se borran) las de los workers que
+ya terminaron, así que los contadores nunca bajan. Sin ``METRICAS_DIR``
+cada proceso solo reporta lo suyo.
+"""
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Segundos; pensados para checadas (decenas de ms) con cola hasta varios segundos
+BUCKETS_LATENCIA = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+INTERVALO_VOLCADO = 1.0
+HISTORICO = 'historico.json'
+
+_lock = threading.Lock()
+_valores = {}  # (nombre, etiquetas) -> número o [conteos por bucket..., suma, total]
+_metricas = {}  # nombre -> Contador/Histograma
+_pendiente = False  # hay cambios sin volcar
+_proceso = None  # (pid, nombre del archivo) del proceso que tiene el hilo de volcado
+
+
+def _directorio():
+    return getattr(settings, 'METRICAS_DIR', '')
+
+
+def _escribir(destino, valores):
+    temporal = f'{destino}.tmp'
+    with open(temporal, 'w') as f:
+        json.dump([[nombre, list(etiquetas), valor] for (nombre, etiquetas), valor in valores.items()], f)
+    os.replace(temporal, destino)
+
+
+def _volcar():
+    """Escribe la foto de este proceso; llamar con ``_lock`` tomado"""
+    global _pendiente
+
+    _pendiente = False
+    directorio = _directorio()
+    if not directorio or _proceso is None:
+        return
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        _escribir(os.path.join(directorio, _proceso[1]), _valores)
+    except OSError as e:
+        logger.warning(f"⚠️ No se pudieron guardar las métricas en {directorio}: {e}")
+
+
+def _hilo_volcado():
+    while True:
+        time.sleep(INTERVALO_VOLCADO)
+        with _lock:
+            if _pendiente:
+                _volcar()
+
+
+def _iniciar_proceso():
+    """Arranca el hilo de volcado en este proceso; llamar con ``_lock`` tomado"""
+    global _proceso
+
+    pid = os.getpid()
+    if _proceso is not None and _proceso[0] == pid:
+        return
+    if _proceso is not None:
+        # Proceso hijo de un fork: lo acumulado es del padre
+        _valores.clear()
+    _proceso = (pid, f'{pid}-{time.time_ns()}.json')
+    threading.Thread(target=_hilo_volcado, name='metricas', daemon=True).start()
+
+
+def _registrar(clave, actualizar):
+    global _pendiente
+
+    with _lock:
+        _iniciar_proceso()
+        actualizar(clave)
+        _pendiente = True
+
+
+class Contador:
+    def __init__(self, nombre, ayuda, etiquetas=()):
+        self.nombre, self.ayuda, self.etiquetas = nombre, ayuda, tuple(etiquetas)
+        _metricas[nombre] = self
+
+    def inc(self, cantidad=1, **etiquetas):
+        def actualizar(clave):
+            _valores[clave] = _valores.get(clave, 0) + cantidad
+        _registrar((self.nombre, tuple(str(etiquetas[e]) for e in self.etiquetas)), actualizar)
+
+
+class Histograma:
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_LATENCIA):
+        self.nombre, self.ayuda, self.etiquetas = nombre, ayuda, tuple(etiquetas)
+        self.buckets = tuple(buckets)
+        _metricas[nombre] = self
+
+    def observar(self, valor, **etiquetas):
+        def actualizar(clave):
+            datos = _valores.get(clave)
+            if datos is None:
+                datos = _valores[clave] = [0] * len(self.buckets) + [0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    datos[i] += 1
+                    break
+            datos[-2] += valor
+            datos[-1] += 1
+        _registrar((self.nombre, tuple(str(etiquetas[e]) for e in self.etiquetas)), actualizar)
+
+    @contextmanager
+    def medir(self, **etiquetas):
+        """Observa la duración del bloque en segundos (también si lanza una excepción)"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observar(time.perf_counter() - inicio, **etiquetas)
+
+
+def _sumar(total, clave, valor):
+    if isinstance(valor, list):
+        actual = total.get(clave)
+        total[clave] = valor[:] if actual is None else [a + b for a, b in zip(actual, valor)]
+    else:
+        total[clave] = total.get(clave, 0) + valor
+
+
+def _vivo(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _leer(archivo, total):
+    try:
+        with open(archivo) as f:
+            for nombre, etiquetas, valor in json.load(f):
+                _sumar(total, (nombre, tuple(etiquetas)), valor)
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ No se pudo leer {archivo}: {e}")
+
+
+def _archivar_muertos(directorio):
+    """Suma a ``historico.json`` las fotos de los workers que ya terminaron y las borra"""
+    with open(os.path.join(directorio, '.lock'), 'w') as candado:
+        fcntl.flock(candado, fcntl.LOCK_EX)
+        muertos = [
+            archivo for archivo in glob.glob(os.path.join(directorio, '*-*.json'))
+            if not _vivo(int(os.path.basename(archivo).split('-', 1)[0]))
+        ]
+        if not muertos:
+            return
+        historico = os.path.join(directorio, HISTORICO)
+        total = {}
+        for archivo in [historico] + muertos:
+            _leer(archivo, total)
+        _escribir(historico, total)
+        for archivo in muertos:
+            os.remove(archivo)
+
+
+def _leer_todos():
+    """Suma las fotos de todos los procesos (o solo la de este sin ``METRICAS_DIR``)"""
+    with _lock:
+        _iniciar_proceso()
+        _volcar()
+        propios = dict(_valores)
+
+    directorio = _directorio()
+    if not directorio:
+        return propios
+
+    total = {}
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        _archivar_muertos(directorio)
+    except OSError as e:
+        logger.warning(f"⚠️ No se pudieron archivar las métricas de workers terminados: {e}")
+    for archivo in glob.glob(os.path.join(directorio, '*.json')):
+        _leer(archivo, total)
+    return total
+
+
+def _formato_etiquetas(nombres, valores, extra=None):
+    pares = [f'{n}="{v}"' for n, v in zip(nombres, valores)]
+    if extra:
+        pares.append(extra)
+    return '{' + ','.join(pares) + '}' if pares else ''
+
+
+def exportar():
+    """Todas las métricas en el formato de texto de Prometheus"""
+    valores = _leer_todos()
+    lineas = []
+    for nombre, metrica in _metricas.items():
+        series = sorted((etiquetas, valor) for (n, etiquetas), valor in valores.items() if n == nombre)
+        if isinstance(metrica, Histograma):
+            lineas += [f'# HELP {nombre} {metrica.ayuda}', f'# TYPE {nombre} histogram']
+            for etiquetas, datos in series:
+                acumulado = 0
+                for limite, conteo in zip(metrica.buckets, datos):
+                    acumulado += conteo
+                    le = _formato_etiquetas(metrica.etiquetas, etiquetas, f'le="{limite}"')
+                    lineas.append(f'{nombre}_bucket{le} {acumulado}')
+                le = _formato_etiquetas(metrica.etiquetas, etiquetas, 'le="+Inf"')
+                lineas.append(f'{nombre}_bucket{le} {datos[-1]}')
+                base = _formato_etiquetas(metrica.etiquetas, etiquetas)
+                lineas.append(f'{nombre}_sum{base} {datos[-2]:.6f}')
+                lineas.append(f'{nombre}_count{base} {datos[-1]}')
+        else:
+            lineas += [f'# HELP {nombre} {metrica.ayuda}', f'# TYPE {nombre} counter']
+            for etiquetas, valor in series:
+                lineas.append(f'{nombre}{_formato_etiquetas(metrica.etiquetas, etiquetas)} {valor}')
+    return '\n'.join(lineas) + '\n'
+
+
+def _volcar_al_salir():
+    with _lock:
+        if _pendiente:
+            _volcar()
+
+
+atexit.register(_volcar_al_salir)
+
+
+# Métricas del checador
+
+ESCANEOS = Contador(
+    'checador_escaneos_total',
+    'Escaneos por resultado (registrado, duplicado, rechazado_comida, rechazado_reloj, fuera_de_orden, inactivo, qr_invalido, visitante)',
+    ['resultado'],
+)
+ETAPAS_CHECADA = Histograma(
+    'checador_checada_etapa_segundos',
+    'Duración de cada etapa de una checada (resolver_qr, decision, retardo, insercion)',
+    ['etapa'],
+)
+DURACION_CHECADA = Histograma(
+    'checador_checada_segundos',
+    'Duración total del registro de una checada de empleado (sin resolver el QR)',
+)
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:34
+
+import checador.storage_backends
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_add_default_horarios'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='empleado',
+            name='qr_code',
+            field=models.ImageField(blank=True, storage=checador.storage_backends.MediaStorage(), upload_to='qr_codes/'),
+        ),
+        migrations.AlterField(
+            model_name='visitante',
+            name='qr_code',
+            field=models.ImageField(blank=True, storage=checador.storage_backends.MediaStorage(), upload_to='qr_visitantes/'),
+        ),
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['empleado', 'fecha', 'hora'], name='asist_emp_fecha_hora_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['empleado', 'tipo_movimiento', 'fecha', 'hora'], name='asist_emp_tipo_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='asistencia',
+            index=models.Index(fields=['fecha', 'tipo_movimiento', 'retardo'], name='asist_fecha_tipo_ret_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='registrovisita',
+            index=models.Index(fields=['visitante', 'hora_salida'], name='registro_vis_salida_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visitante',
+            index=models.Index(fields=['fecha_visita'], name='visitante_fecha_idx'),
+        ),
+    ]
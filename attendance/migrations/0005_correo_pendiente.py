@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_indices_asistencia_visitas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorreoPendiente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('asunto', models.CharField(max_length=255)),
+                ('texto', models.TextField()),
+                ('html', models.TextField(blank=True)),
+                ('remitente', models.CharField(max_length=255)),
+                ('destinatarios', models.TextField(help_text='Direcciones separadas por coma')),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('ENVIADO', 'Enviado'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=20)),
+                ('intentos', models.IntegerField(default=0)),
+                ('siguiente_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('enviado', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Correos Pendientes',
+                'ordering': ['siguiente_intento'],
+                'indexes': [models.Index(fields=['estado', 'siguiente_intento'], name='correo_estado_sig_idx')],
+            },
+        ),
+    ]
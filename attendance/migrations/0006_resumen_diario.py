@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_correo_pendiente'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('hora_entrada', models.TimeField(blank=True, null=True)),
+                ('retardo', models.BooleanField(default=False)),
+                ('minutos_retardo', models.IntegerField(default=0)),
+                ('hora_salida_comida', models.TimeField(blank=True, null=True)),
+                ('hora_entrada_comida', models.TimeField(blank=True, null=True)),
+                ('hora_salida', models.TimeField(blank=True, null=True)),
+                ('minutos_trabajados', models.IntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('empleado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='attendance.empleado')),
+            ],
+            options={
+                'verbose_name_plural': 'Resúmenes Diarios',
+                'ordering': ['-fecha'],
+                'indexes': [models.Index(fields=['fecha', 'retardo'], name='resumen_fecha_retardo_idx')],
+                'constraints': [models.UniqueConstraint(fields=('empleado', 'fecha'), name='resumen_empleado_fecha_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:41
+
+import attendance.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_resumen_diario'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='asistencia',
+            name='hora',
+            field=models.TimeField(default=attendance.models.hora_local),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0007_hora_local'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='asistencia',
+            name='evento_id',
+            field=models.UUIDField(blank=True, editable=False, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0008_asistencia_evento_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivoPorEliminar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.CharField(max_length=500)),
+                ('creado', models.DateTimeField(auto_now_add=True)),
+                ('intentos', models.IntegerField(default=0)),
+                ('ultimo_error', models.TextField(blank=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Archivos por Eliminar',
+                'ordering': ['creado'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 05:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0009_archivo_por_eliminar'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empleado',
+            name='hash_importacion',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0011_cache_compartido'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='empleado',
+            name='baja_por_importacion',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:31
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0012_empleado_baja_por_importacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivoporeliminar',
+            name='siguiente_intento',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='archivoporeliminar',
+            index=models.Index(fields=['siguiente_intento'], name='archivo_siguiente_idx'),
+        ),
+    ]
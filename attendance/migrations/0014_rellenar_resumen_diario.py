@@ -0,0 +1,26 @@
+from django.db import migrations
+
+from attendance.resumenes import crear_resumenes
+
+
+def rellenar_resumenes(apps, schema_editor):
+    """Reconstruye ResumenDiario con toda la historia de Asistencia (los reportes leen de ahí)"""
+    Asistencia = apps.get_model('attendance', 'Asistencia')
+    ResumenDiario = apps.get_model('attendance', 'ResumenDiario')
+
+    ResumenDiario.objects.all().delete()
+    filas = Asistencia.objects.order_by('empleado_id', 'fecha', 'hora', 'id').values_list(
+        'empleado_id', 'fecha', 'tipo_movimiento', 'hora', 'retardo', 'minutos_retardo'
+    ).iterator(chunk_size=2000)
+    crear_resumenes(filas, modelo=ResumenDiario)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0013_archivo_siguiente_intento'),
+    ]
+
+    operations = [
+        migrations.RunPython(rellenar_resumenes, migrations.RunPython.noop),
+    ]
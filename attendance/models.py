@@ -1,13 +1,12 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-from datetime import datetime, timedelta
-import qrcode
-from io import BytesIO
-from django.core.files import File
+from django.conf import settings
+from django.core.files.base import ContentFile
 import uuid
 
 from checador.storage_backends import MediaStorage
+from .qr import contenido_qr, renderizar_qr, url_qr
 
 class Departamento(models.Model):
     nombre = models.CharField(max_length=100)
@@ -46,25 +45,31 @@ class Empleado(models.Model):
     qr_uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
     tiempo_extra_habilitado = models.BooleanField(default=False)
     activo = models.BooleanField(default=True)
+    # Hash de la fila del CSV de RH con la que se importó (ver importacion.py)
+    hash_importacion = models.CharField(max_length=40, blank=True, editable=False)
+    # La importación lo desactivó por no venir en el CSV (se reactiva si vuelve a venir)
+    baja_por_importacion = models.BooleanField(default=False, editable=False)
 
     def __str__(self):
         return f"{self.user.get_full_name()} - {self.codigo_empleado}"
 
     def generar_qr(self):
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(str(self.qr_uuid))
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
+        contenido = renderizar_qr(contenido_qr('empleado', self.qr_uuid))
         filename = f'qr_{self.codigo_empleado}.png'
-        self.qr_code.save(filename, File(buffer), save=False)
-        buffer.close()
+        self.qr_code.save(filename, ContentFile(contenido), save=False)
+
+    def url_imagen_qr(self, absoluta=False):
+        """URL del QR: el archivo en storage si existe, si no el endpoint que lo genera"""
+        if self.qr_code:
+            return self.qr_code.url
+        return url_qr('empleado', self.qr_uuid, absoluta=absoluta)
 
     def save(self, *args, **kwargs):
-        if not self.qr_code:
+        if not self.qr_code and settings.QR_GUARDAR_EN_STORAGE:
             self.generar_qr()
+        if self.activo:
+            # Reactivado a mano: una baja posterior en el admin ya no es de la importación
+            self.baja_por_importacion = False
         super().save(*args, **kwargs)
 
     class Meta:
@@ -76,85 +81,73 @@ class TipoMovimiento(models.TextChoices):
     ENTRADA_COMIDA = 'ENTRADA_COMIDA', 'Entrada de Comida'
     SALIDA = 'SALIDA', 'Salida'
 
+def hora_local():
+    return timezone.localtime().time()
+
 class Asistencia(models.Model):
     empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE)
     fecha = models.DateField(default=timezone.now)
-    hora = models.TimeField(auto_now_add=True)
+    hora = models.TimeField(default=hora_local)
     tipo_movimiento = models.CharField(max_length=20, choices=TipoMovimiento.choices)
     retardo = models.BooleanField(default=False)
     minutos_retardo = models.IntegerField(default=0)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Id generado por la tablet para sincronizar checadas sin duplicarlas
+    evento_id = models.UUIDField(null=True, blank=True, unique=True, editable=False)
 
     def __str__(self):
         return f"{self.empleado.user.get_full_name()} - {self.tipo_movimiento} - {self.fecha}"
 
-    def calcular_retardo(self, hora_entrada_esperada="09:00:00", minutos_tolerancia=15):
-        """Calcula si hay retardo considerando minutos de tolerancia"""
+    def calcular_retardo(self, hora_entrada_esperada="09:00:00", minutos_tolerancia=15, tipo_horario=None):
+        """Calcula si hay retardo considerando minutos de tolerancia (ver horarios.py)"""
+        from .horarios import compilar_horario, ultima_entrada
+
         if self.tipo_movimiento == TipoMovimiento.ENTRADA:
             # Obtener configuración del tipo de horario del empleado
-            tipo_horario = self.empleado.tipo_horario
-
-            # Si el empleado tiene tipo de horario asignado, usar esa configuración
-            if tipo_horario:
-                # Para turnos de 24 horas, verificar el ciclo
-                if tipo_horario.es_turno_24h:
-                    # Buscar última entrada del empleado para calcular el ciclo esperado
-                    ultima_entrada = Asistencia.objects.filter(
-                        empleado=self.empleado,
-                        tipo_movimiento=TipoMovimiento.ENTRADA,
-                        fecha__lt=self.fecha
-                    ).order_by('-fecha', '-hora').first()
-
-                    if ultima_entrada:
-                        # Ciclo: 24h trabajo + 24h descanso = 48h total
-                        ultima_entrada_dt = datetime.combine(ultima_entrada.fecha, ultima_entrada.hora)
-                        entrada_actual_dt = datetime.combine(self.fecha, self.hora)
-                        diferencia_horas = (entrada_actual_dt - ultima_entrada_dt).total_seconds() / 3600
-
-                        # El empleado debería entrar ~48 horas después (permitir tolerancia de 2 horas)
-                        if diferencia_horas < 46:  # Menos de 46 horas = entrada anticipada
-                            self.retardo = False
-                            self.minutos_retardo = 0
-                        elif diferencia_horas > 50:  # Más de 50 horas = retardo
-                            self.retardo = True
-                            self.minutos_retardo = int((diferencia_horas - 48) * 60)
-                        else:
-                            self.retardo = False
-                            self.minutos_retardo = 0
-                    else:
-                        # Primera entrada, no hay retardo
-                        self.retardo = False
-                        self.minutos_retardo = 0
-                    return
-
-                # Para horarios regulares, usar hora_entrada del tipo de horario
-                if tipo_horario.hora_entrada:
-                    hora_esperada = tipo_horario.hora_entrada
-                    tolerancia = timedelta(minutes=tipo_horario.minutos_tolerancia)
-                else:
-                    # Si no tiene hora_entrada definida, usar parámetro
-                    hora_esperada = datetime.strptime(hora_entrada_esperada, "%H:%M:%S").time()
-                    tolerancia = timedelta(minutes=minutos_tolerancia)
-            else:
-                # Fallback a configuración global o parámetros
-                hora_esperada = datetime.strptime(hora_entrada_esperada, "%H:%M:%S").time()
-                tolerancia = timedelta(minutes=minutos_tolerancia)
-
-            hora_limite = (datetime.combine(datetime.today(), hora_esperada) + tolerancia).time()
-
-            if self.hora > hora_limite:
-                self.retardo = True
-                hora_esperada_dt = datetime.combine(datetime.today(), hora_esperada)
-                hora_real_dt = datetime.combine(datetime.today(), self.hora)
-                diferencia = hora_real_dt - hora_esperada_dt
-                self.minutos_retardo = int(diferencia.total_seconds() / 60)
-            else:
-                self.retardo = False
-                self.minutos_retardo = 0
+            if tipo_horario is None:
+                tipo_horario = self.empleado.tipo_horario
+
+            horario = compilar_horario(tipo_horario, hora_entrada_esperada, minutos_tolerancia)
+            anterior = ultima_entrada(self.empleado_id, self.fecha) if horario.es_turno_24h else None
+            self.retardo, self.minutos_retardo = horario.retardo(self.fecha, self.hora, anterior)
 
     class Meta:
         verbose_name_plural = "Asistencias"
         ordering = ['-fecha', '-hora']
+        indexes = [
+            # Checador: último movimiento del día del empleado
+            models.Index(fields=['empleado', 'fecha', 'hora'], name='asist_emp_fecha_hora_idx'),
+            # Turnos 24h: última ENTRADA anterior del empleado
+            models.Index(fields=['empleado', 'tipo_movimiento', 'fecha', 'hora'], name='asist_emp_tipo_fecha_idx'),
+            # Reportes y dashboard: entradas/retardos por fecha
+            models.Index(fields=['fecha', 'tipo_movimiento', 'retardo'], name='asist_fecha_tipo_ret_idx'),
+        ]
+
+class ResumenDiario(models.Model):
+    """Una fila por empleado por día, recalculada en cada checada (ver resumenes.py)"""
+    empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE)
+    fecha = models.DateField()
+    hora_entrada = models.TimeField(null=True, blank=True)
+    retardo = models.BooleanField(default=False)
+    minutos_retardo = models.IntegerField(default=0)
+    hora_salida_comida = models.TimeField(null=True, blank=True)
+    hora_entrada_comida = models.TimeField(null=True, blank=True)
+    hora_salida = models.TimeField(null=True, blank=True)
+    minutos_trabajados = models.IntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.empleado} - {self.fecha}"
+
+    class Meta:
+        verbose_name_plural = "Resúmenes Diarios"
+        ordering = ['-fecha']
+        constraints = [
+            models.UniqueConstraint(fields=['empleado', 'fecha'], name='resumen_empleado_fecha_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['fecha', 'retardo'], name='resumen_fecha_retardo_idx'),
+        ]
 
 class TiempoExtra(models.Model):
     empleado = models.ForeignKey(Empleado, on_delete=models.CASCADE)
@@ -189,26 +182,28 @@ class Visitante(models.Model):
         return f"{self.nombre} - {self.departamento_visita} - {self.fecha_visita}"
 
     def generar_qr(self):
-        qr = qrcode.QRCode(version=1, box_size=10, border=5)
-        qr.add_data(f"VISITANTE:{str(self.qr_uuid)}")
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-
-        buffer = BytesIO()
-        img.save(buffer, format='PNG')
+        contenido = renderizar_qr(contenido_qr('visitante', self.qr_uuid))
         filename = f'qr_visitante_{self.id}.png'
-        self.qr_code.save(filename, File(buffer), save=False)
-        buffer.close()
+        self.qr_code.save(filename, ContentFile(contenido), save=False)
+
+    def url_imagen_qr(self, absoluta=False):
+        """URL del QR: el archivo en storage si existe, si no el endpoint que lo genera"""
+        if self.qr_code:
+            return self.qr_code.url
+        return url_qr('visitante', self.qr_uuid, absoluta=absoluta)
 
     def save(self, *args, **kwargs):
         is_new = self.pk is None
         super().save(*args, **kwargs)
-        if is_new and not self.qr_code:
+        if is_new and not self.qr_code and settings.QR_GUARDAR_EN_STORAGE:
             self.generar_qr()
             super().save(update_fields=['qr_code'])
 
     class Meta:
         verbose_name_plural = "Visitantes"
+        indexes = [
+            models.Index(fields=['fecha_visita'], name='visitante_fecha_idx'),
+        ]
 
 class RegistroVisita(models.Model):
     visitante = models.ForeignKey(Visitante, on_delete=models.CASCADE)
@@ -222,6 +217,10 @@ class RegistroVisita(models.Model):
     class Meta:
         verbose_name_plural = "Registros de Visitas"
         ordering = ['-hora_entrada']
+        indexes = [
+            # Checador: registro abierto (sin salida) del visitante
+            models.Index(fields=['visitante', 'hora_salida'], name='registro_vis_salida_idx'),
+        ]
 
 class ConfiguracionSistema(models.Model):
     hora_entrada = models.TimeField(default="09:00:00")
@@ -233,4 +232,51 @@ class ConfiguracionSistema(models.Model):
         return "Configuración del Sistema"
 
     class Meta:
-        verbose_name_plural = "Configuración del Sistema"
\ No newline at end of file
+        verbose_name_plural = "Configuración del Sistema"
+
+class EstadoCorreo(models.TextChoices):
+    PENDIENTE = 'PENDIENTE', 'Pendiente'
+    ENVIADO = 'ENVIADO', 'Enviado'
+    FALLIDO = 'FALLIDO', 'Fallido'
+
+class CorreoPendiente(models.Model):
+    """Bandeja de salida: correos que el worker procesar_correos envía fuera del request"""
+    asunto = models.CharField(max_length=255)
+    texto = models.TextField()
+    html = models.TextField(blank=True)
+    remitente = models.CharField(max_length=255)
+    destinatarios = models.TextField(help_text="Direcciones separadas por coma")
+    estado = models.CharField(max_length=20, choices=EstadoCorreo.choices, default=EstadoCorreo.PENDIENTE)
+    intentos = models.IntegerField(default=0)
+    siguiente_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+    creado = models.DateTimeField(auto_now_add=True)
+    enviado = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.asunto} - {self.estado}"
+
+    class Meta:
+        verbose_name_plural = "Correos Pendientes"
+        ordering = ['siguiente_intento']
+        indexes = [
+            models.Index(fields=['estado', 'siguiente_intento'], name='correo_estado_sig_idx'),
+        ]
+
+class ArchivoPorEliminar(models.Model):
+    """Archivo del MediaStorage pendiente de borrar (ver almacenamiento.py)"""
+    nombre = models.CharField(max_length=500)
+    creado = models.DateTimeField(auto_now_add=True)
+    intentos = models.IntegerField(default=0)
+    siguiente_intento = models.DateTimeField(default=timezone.now)
+    ultimo_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return self.nombre
+
+    class Meta:
+        verbose_name_plural = "Archivos por Eliminar"
+        ordering = ['creado']
+        indexes = [
+            models.Index(fields=['siguiente_intento'], name='archivo_siguiente_idx'),
+        ]
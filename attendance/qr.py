@@ -0,0 +1,70 @@
+"""
+Renderizado de códigos QR bajo demanda.
+
+El contenido de un QR depende solo del ``qr_uuid`` (y del prefijo
+``VISITANTE:`` para visitas), así que la imagen es determinista: se genera
+al pedirla, se guarda en un caché LRU acotado por proceso y se sirve con
+un ETag fuerte calculado sin renderizar. Con ``QR_GUARDAR_EN_STORAGE=False``
+los modelos ya no generan ni suben el PNG a Spaces al guardarse.
+"""
+import hashlib
+from functools import lru_cache
+from io import BytesIO
+
+import qrcode
+import qrcode.image.svg
+from django.conf import settings
+from django.urls import reverse
+
+# Configuración única del codificador (QR, gafetes y archivos en storage).
+# Cambiar VERSION_RENDER si cambian los parámetros (invalida los ETag).
+PARAMETROS_QR = {'version': 1, 'box_size': 10, 'border': 5}
+VERSION_RENDER = 1
+
+FORMATOS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+TIPOS = ('empleado', 'visitante')
+
+
+def contenido_qr(tipo, qr_uuid):
+    """Texto codificado en el QR, el mismo que lee el checador"""
+    if tipo == 'visitante':
+        return f"VISITANTE:{qr_uuid}"
+    return str(qr_uuid)
+
+
+def crear_qr(contenido):
+    """QRCode ya codificado con la configuración compartida"""
+    qr = qrcode.QRCode(**PARAMETROS_QR)
+    qr.add_data(contenido)
+    qr.make(fit=True)
+    return qr
+
+
+@lru_cache(maxsize=getattr(settings, 'QR_CACHE_TAMANO', 512))
+def renderizar_qr(contenido, formato='png'):
+    """Bytes de la imagen del QR en ``formato`` (png o svg)"""
+    qr = crear_qr(contenido)
+
+    buffer = BytesIO()
+    if formato == 'svg':
+        qr.make_image(image_factory=qrcode.image.svg.SvgPathImage).save(buffer)
+    else:
+        qr.make_image(fill_color="black", back_color="white").save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def etag_qr(contenido, formato='png'):
+    """ETag fuerte de la imagen, calculado sin renderizarla"""
+    return hashlib.sha256(f"{VERSION_RENDER}:{formato}:{contenido}".encode()).hexdigest()[:32]
+
+
+def url_qr(tipo, qr_uuid, formato='png', absoluta=False):
+    """URL del endpoint de QR; ``absoluta`` antepone ``SITIO_URL`` (para correos)"""
+    url = reverse('qr', kwargs={'tipo': tipo, 'qr_uuid': qr_uuid, 'formato': formato})
+    if absoluta:
+        return settings.SITIO_URL.rstrip('/') + url
+    return url
@@ -0,0 +1,63 @@
+"""
+Renderizado de reportes con plantillas de Django compiladas.
+
+Los reportes reciben sus filas ya calculadas y se renderizan en una sola
+pasada. Los reportes grandes se generan por partes (inicio, una plantilla
+por fila y fin) para poder escribirlos a disco o a un storage sin armar el
+documento completo en memoria.
+"""
+import tempfile
+
+from django.core.files import File
+from django.template.loader import get_template
+
+CARPETA_PLANTILLAS = 'attendance/reportes'
+
+
+def renderizar_reporte(nombre, contexto):
+    """Renderiza ``attendance/reportes/<nombre>.html`` con el contexto dado"""
+    return get_template(f'{CARPETA_PLANTILLAS}/{nombre}.html').render(contexto)
+
+
+def generar_reporte_por_partes(nombre, contexto, filas, contexto_final=None):
+    """
+    Genera el HTML del reporte en fragmentos.
+
+    Usa las plantillas ``<nombre>_inicio``, ``<nombre>_fila`` (una vez por
+    cada elemento de ``filas``) y ``<nombre>_fin``. ``contexto_final`` puede
+    ser un callable que se evalúa después de consumir las filas, útil para
+    totales acumulados durante el recorrido.
+    """
+    inicio = get_template(f'{CARPETA_PLANTILLAS}/{nombre}_inicio.html')
+    fila = get_template(f'{CARPETA_PLANTILLAS}/{nombre}_fila.html')
+    fin = get_template(f'{CARPETA_PLANTILLAS}/{nombre}_fin.html')
+
+    yield inicio.render(contexto)
+    for datos in filas:
+        yield fila.render(datos)
+
+    if callable(contexto_final):
+        contexto_final = contexto_final()
+    yield fin.render({**contexto, **(contexto_final or {})})
+
+
+def escribir_reporte(fragmentos, destino, storage=None):
+    """
+    Escribe los fragmentos de un reporte conforme se generan.
+
+    Sin ``storage`` ``destino`` es una ruta de archivo (por ejemplo la ruta de
+    red de reportes). Con ``storage`` el contenido pasa por un archivo temporal
+    que se vuelca a disco a partir de 1 MB y se sube con ``storage.save``.
+    Regresa la ruta o el nombre guardado.
+    """
+    if storage is None:
+        with open(destino, 'w', encoding='utf-8') as f:
+            for fragmento in fragmentos:
+                f.write(fragmento)
+        return destino
+
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as temporal:
+        for fragmento in fragmentos:
+            temporal.write(fragmento.encode('utf-8'))
+        temporal.seek(0)
+        return storage.save(destino, File(temporal, name=destino))
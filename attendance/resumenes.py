@@ -0,0 +1,229 @@
+"""
+Resúmenes de asistencia por período.
+
+``resumen_periodo`` calcula para cualquier rango de fechas los días
+asistidos, retardos, minutos de retardo y días/turnos esperados de cada
+empleado con una sola consulta agrupada y aritmética de calendario, en
+lugar de varias consultas por empleado y recorrer el rango día por día.
+
+Los totales salen de ``ResumenDiario`` (una fila por empleado por día), que
+se recalcula en cada checada con ``registrar_en_resumen`` y se puede
+reconstruir para cualquier rango con ``reconstruir_resumen_diario``.
+"""
+from collections import namedtuple
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from .cache import obtener_horario
+from .models import Asistencia, Empleado, ResumenDiario, TipoMovimiento
+
+# Campos de ResumenDiario que salen de las checadas del día
+CAMPOS_CALCULADOS = [
+    'hora_entrada', 'retardo', 'minutos_retardo', 'hora_salida_comida',
+    'hora_entrada_comida', 'hora_salida', 'minutos_trabajados',
+]
+
+ResumenEmpleado = namedtuple('ResumenEmpleado', [
+    'empleado', 'dias_asistidos', 'retardos', 'minutos_retardo', 'dias_esperados', 'faltas',
+])
+
+
+def contar_dias_habiles(fecha_inicio, fecha_fin):
+    """Días de lunes a viernes en el rango (inclusive), sin recorrerlo día por día"""
+    if fecha_fin < fecha_inicio:
+        return 0
+    semanas, resto = divmod((fecha_fin - fecha_inicio).days + 1, 7)
+    primer_dia = fecha_inicio.weekday()
+    return semanas * 5 + sum(1 for i in range(resto) if (primer_dia + i) % 7 < 5)
+
+
+def contar_turnos_24h(fecha_inicio, fecha_fin):
+    """Turnos esperados en el rango para un ciclo de 24h trabajo + 24h descanso"""
+    if fecha_fin < fecha_inicio:
+        return 0
+    return ((fecha_fin - fecha_inicio).days + 1) // 2
+
+
+def _minutos(hora):
+    return hora.hour * 60 + hora.minute
+
+
+def calcular_minutos_trabajados(resumen):
+    """Minutos entre la primera entrada y la salida, descontando la comida"""
+    if not (resumen.hora_entrada and resumen.hora_salida):
+        return 0
+    total = _minutos(resumen.hora_salida) - _minutos(resumen.hora_entrada)
+    if resumen.hora_salida_comida and resumen.hora_entrada_comida:
+        total -= max(0, _minutos(resumen.hora_entrada_comida) - _minutos(resumen.hora_salida_comida))
+    # Salidas del día siguiente (turnos de 24h) quedan en el resumen de ese día
+    return max(0, total)
+
+
+def aplicar_movimiento(resumen, tipo_movimiento, hora, retardo=False, minutos_retardo=0):
+    """
+    Incorpora una checada al resumen del día.
+
+    Se conserva la primera entrada (con su retardo) y la primera salida a
+    comida; el regreso de comida y la salida se toman de la última checada.
+    Los movimientos deben aplicarse en orden de hora.
+    """
+    if tipo_movimiento == TipoMovimiento.ENTRADA:
+        if resumen.hora_entrada is None:
+            resumen.hora_entrada = hora
+            resumen.retardo = retardo
+            resumen.minutos_retardo = minutos_retardo if retardo else 0
+    elif tipo_movimiento == TipoMovimiento.SALIDA_COMIDA:
+        if resumen.hora_salida_comida is None:
+            resumen.hora_salida_comida = hora
+    elif tipo_movimiento == TipoMovimiento.ENTRADA_COMIDA:
+        resumen.hora_entrada_comida = hora
+    elif tipo_movimiento == TipoMovimiento.SALIDA:
+        resumen.hora_salida = hora
+    resumen.minutos_trabajados = calcular_minutos_trabajados(resumen)
+    return resumen
+
+
+def registrar_en_resumen(asistencia):
+    """
+    Recalcula el ResumenDiario del empleado y día de una checada recién guardada.
+
+    Se vuelve a aplicar todas las checadas del día en orden de hora (una
+    consulta pequeña) en lugar de solo la nueva, así que una checada que
+    llega tarde o fuera de orden no deja el resumen distinto de Asistencia.
+    """
+    resumen, _ = ResumenDiario.objects.get_or_create(
+        empleado_id=asistencia.empleado_id,
+        fecha=asistencia.fecha
+    )
+    calculado = ResumenDiario(empleado_id=asistencia.empleado_id, fecha=asistencia.fecha)
+    checadas = Asistencia.objects.filter(
+        empleado_id=asistencia.empleado_id,
+        fecha=asistencia.fecha
+    ).order_by('hora', 'id').values_list('tipo_movimiento', 'hora', 'retardo', 'minutos_retardo')
+    for tipo, hora, retardo, minutos in checadas:
+        aplicar_movimiento(calculado, tipo, hora, retardo, minutos)
+    for campo in CAMPOS_CALCULADOS:
+        setattr(resumen, campo, getattr(calculado, campo))
+    resumen.save()
+    return resumen
+
+
+def reconstruir_resumen_diario(fecha_inicio, fecha_fin, empleado_ids=None, tamano_lote=1000):
+    """
+    Reconstruye los ResumenDiario del rango a partir de las checadas.
+
+    Borra los resúmenes existentes del rango y los vuelve a crear recorriendo
+    las asistencias ordenadas por empleado, fecha y hora en una sola consulta.
+    Regresa el número de resúmenes creados.
+    """
+    asistencias = Asistencia.objects.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin)
+    existentes = ResumenDiario.objects.filter(fecha__gte=fecha_inicio, fecha__lte=fecha_fin)
+    if empleado_ids is not None:
+        asistencias = asistencias.filter(empleado_id__in=empleado_ids)
+        existentes = existentes.filter(empleado_id__in=empleado_ids)
+
+    filas = asistencias.order_by('empleado_id', 'fecha', 'hora', 'id').values_list(
+        'empleado_id', 'fecha', 'tipo_movimiento', 'hora', 'retardo', 'minutos_retardo'
+    ).iterator(chunk_size=2000)
+
+    with transaction.atomic():
+        existentes.delete()
+        return crear_resumenes(filas, tamano_lote=tamano_lote)
+
+
+def crear_resumenes(filas, modelo=ResumenDiario, tamano_lote=1000):
+    """
+    Crea con ``bulk_create`` un resumen por cada empleado y día de ``filas``.
+
+    ``filas`` son tuplas ``(empleado_id, fecha, tipo_movimiento, hora,
+    retardo, minutos_retardo)`` ordenadas por empleado, fecha y hora.
+    ``modelo`` permite usar el modelo histórico desde una migración. Regresa
+    el número de resúmenes creados.
+    """
+    creados = 0
+    lote = []
+    resumen = None
+    for empleado_id, fecha, tipo, hora, retardo, minutos in filas:
+        if resumen is None or (resumen.empleado_id, resumen.fecha) != (empleado_id, fecha):
+            resumen = modelo(empleado_id=empleado_id, fecha=fecha)
+            lote.append(resumen)
+            # El último resumen del lote puede seguir recibiendo checadas
+            if len(lote) > tamano_lote:
+                modelo.objects.bulk_create(lote[:-1])
+                creados += len(lote) - 1
+                lote = lote[-1:]
+        aplicar_movimiento(resumen, tipo, hora, retardo, minutos)
+
+    modelo.objects.bulk_create(lote)
+    return creados + len(lote)
+
+
+def totales_por_empleado(fecha_inicio, fecha_fin, empleado_ids=None):
+    """
+    Regresa ``{empleado_id: {'dias', 'retardos', 'minutos'}}`` con los
+    resúmenes diarios del rango, en una sola consulta agrupada.
+    """
+    resumenes = ResumenDiario.objects.filter(
+        fecha__gte=fecha_inicio,
+        fecha__lte=fecha_fin,
+        hora_entrada__isnull=False
+    )
+    if empleado_ids is not None:
+        resumenes = resumenes.filter(empleado_id__in=empleado_ids)
+
+    filas = resumenes.order_by().values('empleado').annotate(
+        dias=Count('id'),
+        retardos=Count('id', filter=Q(retardo=True)),
+        minutos=Sum('minutos_retardo', filter=Q(retardo=True)),
+    )
+    return {
+        fila['empleado']: {
+            'dias': fila['dias'],
+            'retardos': fila['retardos'],
+            'minutos': fila['minutos'] or 0,
+        }
+        for fila in filas
+    }
+
+
+def resumen_periodo(fecha_inicio, fecha_fin, empleados=None, solo_dias_habiles=True):
+    """
+    Resumen de asistencia por empleado para el rango ``fecha_inicio``-``fecha_fin``.
+
+    ``empleados`` es un iterable de Empleado (el horario se lee del catálogo
+    en memoria); sin él se incluyen solo los empleados con entradas en el
+    período. Para horarios regulares los días esperados son de lunes a
+    viernes o, con ``solo_dias_habiles=False``, todos los días del rango;
+    para turnos de 24h es un turno cada dos días. Regresa una lista de
+    ``ResumenEmpleado`` en el orden de ``empleados``.
+    """
+    if empleados is None:
+        totales = totales_por_empleado(fecha_inicio, fecha_fin)
+        empleados = Empleado.objects.filter(pk__in=totales).select_related(
+            'user', 'departamento'
+        ).order_by('pk')
+    else:
+        empleados = list(empleados)
+        totales = totales_por_empleado(fecha_inicio, fecha_fin, [e.pk for e in empleados])
+
+    if solo_dias_habiles:
+        dias_regulares = contar_dias_habiles(fecha_inicio, fecha_fin)
+    else:
+        dias_regulares = max(0, (fecha_fin - fecha_inicio).days + 1)
+    turnos_24h = contar_turnos_24h(fecha_inicio, fecha_fin)
+
+    resumen = []
+    for empleado in empleados:
+        datos = totales.get(empleado.pk, {'dias': 0, 'retardos': 0, 'minutos': 0})
+        tipo_horario = obtener_horario(empleado.tipo_horario_id)
+        dias_esperados = turnos_24h if tipo_horario and tipo_horario.es_turno_24h else dias_regulares
+        resumen.append(ResumenEmpleado(
+            empleado=empleado,
+            dias_asistidos=datos['dias'],
+            retardos=datos['retardos'],
+            minutos_retardo=datos['minutos'],
+            dias_esperados=dias_esperados,
+            faltas=max(0, dias_esperados - datos['dias']),
+        ))
+    return resumen
@@ -0,0 +1,42 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from checador.storage_backends import connect_file_cleanup
+
+from .almacenamiento import programar_eliminacion
+from .cache import invalidar_catalogos, invalidar_empleados
+from .models import ConfiguracionSistema, Empleado, TipoHorario, Visitante
+
+# Los QR reemplazados o de registros eliminados se borran del storage en
+# segundo plano (comando eliminar_archivos)
+connect_file_cleanup(Empleado, delete_file=programar_eliminacion)
+connect_file_cleanup(Visitante, delete_file=programar_eliminacion)
+
+
+@receiver(post_save, sender=Empleado)
+@receiver(post_delete, sender=Empleado)
+@receiver(post_save, sender=TipoHorario)
+@receiver(post_delete, sender=TipoHorario)
+def invalidar_cache_qr(sender, **kwargs):
+    """Vacía el caché de QR cuando cambia un empleado o un tipo de horario"""
+    invalidar_empleados()
+
+
+@receiver(post_save, sender=TipoHorario)
+@receiver(post_delete, sender=TipoHorario)
+@receiver(post_save, sender=ConfiguracionSistema)
+@receiver(post_delete, sender=ConfiguracionSistema)
+def invalidar_cache_catalogos(sender, **kwargs):
+    """Recarga la configuración y los horarios cuando se editan en el admin"""
+    invalidar_catalogos()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidar_cache_qr_usuario(sender, instance, **kwargs):
+    """Vacía el caché de QR cuando cambia el usuario de un empleado"""
+    update_fields = kwargs.get('update_fields')
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return  # Los inicios de sesión no afectan el nombre ni el estado
+    invalidar_empleados()
@@ -1,3 +1,765 @@
-from django.test import TestCase
+import importlib
+import json
+import logging
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time as reloj
+import uuid
+from datetime import date, time, timedelta
+from io import StringIO
+from unittest import mock, skipIf
 
-# Create your tests here.
+from botocore.stub import Stubber
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.signals import post_delete, post_init, pre_save
+from django.test import AsyncClient, Client, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from storages.backends.s3 import S3Storage
+
+from checador.perfil_sql import presupuesto_queries
+
+from . import correo
+from .almacenamiento import MAX_INTENTOS, eliminar_archivos_pendientes
+from .cache import (
+    CLAVE_GENERACION, CLAVE_GENERACION_CATALOGOS, _publicar_generacion, invalidar_catalogos, invalidar_empleados,
+    obtener_configuracion, resolver_empleado
+)
+from .checadas import ChecadaRechazada, registrar_checada
+from .correo import encolar_correo, procesar_correos_pendientes
+from .gafetes import generar_pdf_gafetes
+from .horarios import HorarioCompilado, compilar_horario, recalcular_retardos, retardos_en_serie
+from .importacion import PASSWORD_TEMPORAL, FilaEmpleado, hash_fila, importar_empleados
+from .metricas import ESCANEOS, INTERVALO_VOLCADO, exportar
+from .models import (
+    ArchivoPorEliminar, Asistencia, ConfiguracionSistema, CorreoPendiente, Departamento, Empleado, EstadoCorreo, RegistroVisita,
+    ResumenDiario, TiempoExtra, TipoHorario, TipoMovimiento, Visitante
+)
+from .qr import etag_qr
+from .resumenes import reconstruir_resumen_diario, registrar_en_resumen, totales_por_empleado
+from .utils import empleados_con_retardos, generar_reporte_semanal
+
+
+def crear_empleado(codigo, departamento=None, **campos):
+    usuario = User.objects.create(username=f'emp{codigo}', first_name='Empleado', last_name=codigo)
+    return Empleado.objects.create(
+        user=usuario,
+        codigo_empleado=codigo,
+        departamento=departamento or Departamento.objects.get_or_create(nombre='Operaciones')[0],
+        **campos
+    )
+
+
+# Sin credenciales de Spaces: el QR se genera bajo demanda, no al guardar
+@override_settings(QR_GUARDAR_EN_STORAGE=False)
+class CacheQRTests(TestCase):
+    def setUp(self):
+        invalidar_empleados()
+        self.empleado = crear_empleado('1001')
+
+    def test_baja_publicada_por_otro_worker(self):
+        self.assertIsNotNone(resolver_empleado(self.empleado.qr_uuid))
+        # Otro worker da de baja al empleado: aquí solo llega la nueva generación
+        Empleado.objects.filter(pk=self.empleado.pk).update(activo=False)
+        _publicar_generacion(CLAVE_GENERACION)
+        self.assertIsNone(resolver_empleado(self.empleado.qr_uuid))
+
+    def test_gafete_inactivo_en_cache_no_checa(self):
+        snapshot = resolver_empleado(self.empleado.qr_uuid)
+        Empleado.objects.filter(pk=self.empleado.pk).update(activo=False)
+        with self.assertRaises(ChecadaRechazada):
+            registrar_checada(snapshot)
+        self.assertFalse(Asistencia.objects.exists())
+
+
+class VistaQRTests(SimpleTestCase):
+    qr_uuid = uuid.UUID('7f1c5a0e-3b5d-4c1e-9a57-2f0d8c6b4e21')
+
+    def url(self, formato='png', tipo='empleado'):
+        return reverse('qr', kwargs={'tipo': tipo, 'qr_uuid': self.qr_uuid, 'formato': formato})
+
+    def test_png_con_etag(self):
+        respuesta = self.client.get(self.url())
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'image/png')
+        self.assertTrue(respuesta.content.startswith(b'\x89PNG\r\n\x1a\n'))
+        self.assertEqual(respuesta['ETag'], f'"{etag_qr(str(self.qr_uuid))}"')
+        self.assertIn('immutable', respuesta['Cache-Control'])
+
+    def test_if_none_match_regresa_304_sin_renderizar(self):
+        etag = self.client.get(self.url())['ETag']
+        with mock.patch('attendance.views.renderizar_qr') as renderizar:
+            respuesta = self.client.get(self.url(), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta.content, b'')
+        renderizar.assert_not_called()
+        # Otro formato es otra imagen: el ETag del PNG no le sirve
+        self.assertEqual(self.client.get(self.url('svg'), HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_formato_desconocido(self):
+        self.assertEqual(self.client.get(self.url('gif')).status_code, 404)
+
+
+class CatalogosTests(TestCase):
+    def test_cambio_publicado_por_otro_worker(self):
+        ConfiguracionSistema.objects.create(minutos_tolerancia=10, email_gerente='gerente@example.com')
+        self.assertEqual(obtener_configuracion().minutos_tolerancia, 10)
+        # update() no dispara señales: el catálogo local sigue vigente...
+        ConfiguracionSistema.objects.update(minutos_tolerancia=30)
+        self.assertEqual(obtener_configuracion().minutos_tolerancia, 10)
+        # ...hasta que otro worker publica una generación nueva
+        _publicar_generacion(CLAVE_GENERACION_CATALOGOS)
+        self.assertEqual(obtener_configuracion().minutos_tolerancia, 30)
+
+
+@override_settings(QR_GUARDAR_EN_STORAGE=False)
+class ApiCheckinTests(TestCase):
+    def setUp(self):
+        invalidar_empleados()
+        self.empleado = crear_empleado('4001')
+
+    def checar(self, **datos):
+        return self.client.post(reverse('api_checkin'), json.dumps(datos), content_type='application/json')
+
+    def test_respuesta_de_checada_registrada(self):
+        evento = str(uuid.uuid4())
+        respuesta = self.checar(qr_code=str(self.empleado.qr_uuid), id=evento)
+        self.assertEqual(respuesta.status_code, 200)
+        asistencia = Asistencia.objects.get()
+        self.assertEqual(respuesta.json(), {
+            'empleado': 'Empleado 4001',
+            'tipo_movimiento': TipoMovimiento.ENTRADA,
+            'retardo': asistencia.retardo,
+            'minutos_retardo': asistencia.minutos_retardo,
+        })
+        # La tablet reintenta el mismo evento: misma respuesta, sin otra checada
+        self.assertEqual(self.checar(qr_code=str(self.empleado.qr_uuid), id=evento).json(), respuesta.json())
+        self.assertEqual(Asistencia.objects.count(), 1)
+
+    def test_respuesta_de_checada_rechazada(self):
+        resolver_empleado(self.empleado.qr_uuid)
+        # Baja que el caché de este worker todavía no conoce
+        Empleado.objects.filter(pk=self.empleado.pk).update(activo=False)
+        respuesta = self.checar(qr_code=str(self.empleado.qr_uuid))
+        self.assertEqual(respuesta.status_code, 409)
+        self.assertEqual(respuesta.json(), {'error': 'Tu gafete no está activo', 'empleado': 'Empleado 4001'})
+        self.assertFalse(Asistencia.objects.exists())
+
+    def test_errores_de_solicitud(self):
+        for datos, estado, error in (
+            ({}, 400, 'Falta qr_code'),
+            ({'qr_code': str(uuid.uuid4())}, 404, 'Código QR no válido'),
+            ({'qr_code': str(self.empleado.qr_uuid), 'id': 'x'}, 400, 'id de evento inválido'),
+        ):
+            with self.subTest(datos=datos):
+                respuesta = self.checar(**datos)
+                self.assertEqual(respuesta.status_code, estado)
+                self.assertEqual(respuesta.json(), {'error': error})
+        self.assertFalse(Asistencia.objects.exists())
+
+
+@override_settings(QR_GUARDAR_EN_STORAGE=False, TABLET_TOKENS=['token-prueba'])
+class LoteTabletTests(TestCase):
+    def setUp(self):
+        invalidar_empleados()
+        self.empleado = crear_empleado('2001')
+
+    def sincronizar(self, *momentos, token='token-prueba'):
+        # Igual que sincronizar() en checkin_tablet.html: CSRF del formulario y token de la tablet
+        cliente = Client(enforce_csrf_checks=True)
+        pagina = cliente.get(reverse('checkin_tablet'))
+        self.assertContains(pagina, "'X-Tablet-Token': TOKEN_TABLET")
+        csrf = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', pagina.content.decode()).group(1)
+        eventos = [
+            {'id': str(uuid.uuid4()), 'qr_code': str(self.empleado.qr_uuid), 'momento': momento.isoformat()}
+            for momento in momentos
+        ]
+        return cliente.post(
+            reverse('api_checkin_lote'), json.dumps({'eventos': eventos}),
+            content_type='application/json', HTTP_X_CSRFTOKEN=csrf, HTTP_X_TABLET_TOKEN=token
+        )
+
+    def test_sin_token_no_registra(self):
+        respuesta = self.sincronizar(timezone.now(), token='otro')
+        self.assertEqual(respuesta.status_code, 401)
+        self.assertFalse(Asistencia.objects.exists())
+
+    def test_registra_checada_reciente(self):
+        respuesta = self.sincronizar(timezone.now() - timedelta(seconds=1))
+        self.assertEqual(respuesta.json()['resultados'][0]['estado'], 'registrado')
+
+    def test_rechaza_checada_antigua(self):
+        respuesta = self.sincronizar(timezone.now() - timedelta(days=20))
+        self.assertEqual(respuesta.json()['resultados'][0]['estado'], 'rechazado')
+        self.assertFalse(Asistencia.objects.exists())
+
+    def test_rechaza_checada_anterior_a_una_registrada(self):
+        ahora = timezone.now()
+        registrar_checada(resolver_empleado(self.empleado.qr_uuid), ahora)
+        respuesta = self.sincronizar(ahora - timedelta(minutes=1))
+        self.assertEqual(respuesta.json()['resultados'][0]['estado'], 'rechazado')
+        self.assertEqual(Asistencia.objects.count(), 1)
+
+
+@skipIf(connection.vendor == 'sqlite', "SQLite no soporta SELECT ... FOR UPDATE")
+@override_settings(QR_GUARDAR_EN_STORAGE=False)
+class ChecadasConcurrentesTests(TransactionTestCase):
+    def test_escaneos_simultaneos_registran_una_entrada(self):
+        invalidar_empleados()
+        empleado = resolver_empleado(crear_empleado('5001').qr_uuid)
+        barrera = threading.Barrier(8)
+
+        def escanear():
+            barrera.wait()
+            try:
+                registrar_checada(empleado)
+            except ChecadaRechazada:
+                pass
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=escanear) for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(
+            Asistencia.objects.filter(empleado_id=empleado.id, tipo_movimiento=TipoMovimiento.ENTRADA).count(), 1
+        )
+
+
+@override_settings(QR_GUARDAR_EN_STORAGE=False)
+class ResumenDiarioTests(TestCase):
+    def setUp(self):
+        self.empleado = crear_empleado('3001')
+        self.fecha = date(2025, 3, 3)
+
+    def checar(self, tipo, hora, retardo=False, minutos=0):
+        asistencia = Asistencia.objects.create(
+            empleado=self.empleado, fecha=self.fecha, hora=hora, tipo_movimiento=tipo,
+            retardo=retardo, minutos_retardo=minutos
+        )
+        return registrar_en_resumen(asistencia)
+
+    def test_checadas_fuera_de_orden(self):
+        self.checar(TipoMovimiento.ENTRADA, time(9, 30), retardo=True, minutos=20)
+        self.checar(TipoMovimiento.SALIDA, time(18, 0))
+        # Llegan tarde una entrada y una salida anteriores a las ya registradas
+        self.checar(TipoMovimiento.ENTRADA, time(8, 55))
+        resumen = self.checar(TipoMovimiento.SALIDA, time(17, 0))
+
+        self.assertEqual(resumen.hora_entrada, time(8, 55))
+        self.assertFalse(resumen.retardo)
+        self.assertEqual(resumen.minutos_retardo, 0)
+        self.assertEqual(resumen.hora_salida, time(18, 0))
+        self.assertEqual(ResumenDiario.objects.get().minutos_trabajados, 9 * 60 + 5)
+
+    def test_retardos_cuentan_la_primera_entrada_del_dia(self):
+        for dias in range(3):
+            self.fecha = date(2025, 3, 3) + timedelta(days=dias)
+            self.checar(TipoMovimiento.ENTRADA, time(9, 30), retardo=True, minutos=20)
+            self.checar(TipoMovimiento.SALIDA, time(12, 0))
+            self.checar(TipoMovimiento.ENTRADA, time(13, 0), retardo=True, minutos=20)
+
+        inicio, fin = date(2025, 3, 3), date(2025, 3, 5)
+        self.assertEqual(empleados_con_retardos(inicio, fin)[0]['retardos'], 3)
+        self.assertEqual(totales_por_empleado(inicio, fin)[self.empleado.pk]['retardos'], 3)
+
+    def test_migracion_llena_el_historial(self):
+        rellenar = importlib.import_module('attendance.migrations.0014_rellenar_resumen_diario').rellenar_resumenes
+        self.checar(TipoMovimiento.ENTRADA, time(9, 30), retardo=True, minutos=20)
+        ResumenDiario.objects.all().delete()
+
+        rellenar(django_apps, None)
+        resumen = ResumenDiario.objects.get()
+        self.assertEqual((resumen.fecha, resumen.hora_entrada, resumen.minutos_retardo), (self.fecha, time(9, 30), 20))
+
+
+@override_settings(QR_GUARDAR_EN_STORAGE=False)
+class ImportacionTests(TestCase):
+    def fila(self, nombre, codigo='EMP007', departamento='Operaciones'):
+        return FilaEmpleado(
+            linea=2, codigo_empleado=codigo, nombre_completo=nombre, first_name=nombre.split()[0],
+            last_name=nombre.split()[-1], departamento=departamento,
+            hash=hash_fila(codigo, nombre, departamento),
+        )
+
+    def test_consultas_no_crecen_con_el_csv(self):
+        consultas = []
+        for cantidad in (5, 50):
+            Empleado.objects.all().delete()
+            User.objects.all().delete()
+            Departamento.objects.all().delete()
+            filas = [
+                self.fila(f'Empleado {i} Prueba', codigo=f'EMP{i:03}', departamento=('Operaciones', 'Almacén')[i % 2])
+                for i in range(cantidad)
+            ]
+            with CaptureQueriesContext(connection) as capturadas:
+                resultado = importar_empleados(filas)
+            consultas.append(len(capturadas))
+
+            self.assertEqual((resultado.creados, resultado.departamentos_creados), (cantidad, 2))
+            self.assertEqual(Empleado.objects.filter(activo=True).exclude(hash_importacion='').count(), cantidad)
+            self.assertEqual(Empleado.objects.filter(departamento__nombre='Almacén').count(), cantidad // 2)
+        self.assertEqual(consultas[0], consultas[1])
+        self.assertTrue(User.objects.get(username='empleado.10').check_password(PASSWORD_TEMPORAL))
+
+    def test_colisiones_de_username(self):
+        User.objects.create(username='ana.pérez')
+        resultado = importar_empleados([
+            self.fila('Ana Pérez'), self.fila('Ana Pérez', codigo='EMP008'), self.fila('Ana Pérez Ruiz', codigo='EMP009'),
+        ])
+        self.assertEqual(resultado.creados, 3)
+        self.assertEqual(
+            list(Empleado.objects.order_by('codigo_empleado').values_list('user__username', flat=True)),
+            ['ana.pérez1', 'ana.pérez2', 'ana.pérez3']
+        )
+
+    def test_dry_run_no_escribe(self):
+        importar_empleados([self.fila('Ana Pérez'), self.fila('Luis Gómez', codigo='EMP008')])
+        antes = (
+            list(User.objects.order_by('pk').values_list('username', 'last_name')),
+            list(Empleado.objects.order_by('pk').values_list('codigo_empleado', 'departamento__nombre', 'activo')),
+            list(Departamento.objects.order_by('pk').values_list('nombre', flat=True)),
+        )
+
+        resultado = importar_empleados([
+            self.fila('Ana López', departamento='Almacén'), self.fila('Eva Ríos', codigo='EMP009'),
+        ], dry_run=True)
+        self.assertEqual(
+            (resultado.creados, resultado.actualizados, resultado.desactivados, resultado.departamentos_creados),
+            (1, 1, 1, 1)
+        )
+        self.assertEqual(antes, (
+            list(User.objects.order_by('pk').values_list('username', 'last_name')),
+            list(Empleado.objects.order_by('pk').values_list('codigo_empleado', 'departamento__nombre', 'activo')),
+            list(Departamento.objects.order_by('pk').values_list('nombre', flat=True)),
+        ))
+
+    def test_no_reactiva_empleados_dados_de_baja(self):
+        importar_empleados([self.fila('Ana Pérez')])
+        # Baja hecha a mano en el admin
+        empleado = Empleado.objects.get()
+        empleado.activo = False
+        empleado.save()
+
+        for nombre in ('Ana Pérez', 'Ana López'):
+            with self.subTest(nombre=nombre):
+                importar_empleados([self.fila(nombre)])
+                empleado = Empleado.objects.select_related('user').get()
+                self.assertFalse(empleado.activo)
+                self.assertEqual(empleado.user.last_name, nombre.split()[-1])
+
+    def test_reactiva_a_los_que_desactivo_la_importacion(self):
+        filas = [self.fila('Ana Pérez'), self.fila('Luis Gómez', codigo='EMP008')]
+        importar_empleados(filas)
+        # Una exportación incompleta de RH
+        self.assertEqual(importar_empleados(filas[:1]).desactivados, 1)
+        self.assertFalse(Empleado.objects.get(codigo_empleado='EMP008').activo)
+
+        resultado = importar_empleados(filas)
+        self.assertIn(('actualizar', 'EMP008'), [(c.accion, c.codigo_empleado) for c in resultado.cambios])
+        empleado = Empleado.objects.get(codigo_empleado='EMP008')
+        self.assertTrue(empleado.activo)
+        self.assertFalse(empleado.baja_por_importacion)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class BandejaCorreoTests(TestCase):
+    def test_cada_correo_queda_marcado_al_enviarse(self):
+        for i in range(3):
+            encolar_correo(mail.EmailMessage(f'Aviso {i}', 'Texto', 'checador@example.com', ['a@example.com']))
+
+        self.assertEqual(procesar_correos_pendientes(lote=10), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(CorreoPendiente.objects.filter(estado=EstadoCorreo.ENVIADO).count(), 3)
+        # Ya enviados: otra pasada no los vuelve a mandar
+        self.assertEqual(procesar_correos_pendientes(lote=10), (0, 0))
+        self.assertEqual(len(mail.outbox), 3)
+
+
+@override_settings(QR_GUARDAR_EN_STORAGE=False, EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class ReportePorDepartamentoTests(TestCase):
+    def test_un_correo_por_departamento_en_una_sesion(self):
+        ConfiguracionSistema.objects.create(email_gerente='gerente@example.com')
+        invalidar_catalogos()
+        for nombre in ('Almacén', 'Ventas'):
+            crear_empleado(f'{nombre[:3]}1', Departamento.objects.create(nombre=nombre, email=f'{nombre[:3]}@example.com'))
+        Departamento.objects.create(nombre='Sin empleados', email='vacio@example.com')
+
+        with mock.patch('attendance.correo.get_connection', wraps=correo.get_connection) as conexiones:
+            generar_reporte_semanal()
+
+        conexiones.assert_called_once()
+        self.assertEqual(
+            [m.to for m in mail.outbox], [['gerente@example.com'], ['Alm@example.com'], ['Ven@example.com']]
+        )
+        html_ventas = mail.outbox[2].alternatives[0][0]
+        self.assertIn('Ven1', html_ventas)
+        self.assertNotIn('Alm1', html_ventas)
+
+
+# (nombre de la URL, máximo de consultas); el máximo no depende de cuántas filas haya
+PRESUPUESTOS = [
+    ('dashboard', 7),
+    ('api_dashboard', 7),
+    ('reporte_mensual', 6),
+    ('admin:attendance_empleado_changelist', 11),
+    ('admin:attendance_asistencia_changelist', 11),
+    ('admin:attendance_resumendiario_changelist', 11),
+    ('admin:attendance_tiempoextra_changelist', 11),
+    ('admin:attendance_visitante_changelist', 11),
+    ('admin:attendance_registrovisita_changelist', 11),
+]
+
+
+def paginas_pdf(contenido):
+    # Cada página agregada es una actualización incremental; vale el último /Count
+    return int(re.findall(rb'/Count (\d+)', contenido)[-1])
+
+
+@override_settings(QR_GUARDAR_EN_STORAGE=False)
+class GafetesTests(TestCase):
+    def test_doce_gafetes_por_pagina(self):
+        for cantidad, paginas in ((1, 1), (12, 1), (13, 2)):
+            with self.subTest(gafetes=cantidad):
+                datos = [(uuid.uuid4(), f'Empleado {i}', f'G{i}') for i in range(cantidad)]
+                with generar_pdf_gafetes(datos) as archivo:
+                    contenido = archivo.read()
+                self.assertTrue(contenido.startswith(b'%PDF'))
+                self.assertEqual(paginas_pdf(contenido), paginas)
+
+    def test_accion_del_admin(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        empleados = [crear_empleado(f'G{i:02}') for i in range(14)]
+        self.client.force_login(admin)
+        respuesta = self.client.post(reverse('admin:attendance_empleado_changelist'), {
+            'action': 'imprimir_gafetes', '_selected_action': [empleado.pk for empleado in empleados],
+        })
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'application/pdf')
+        self.assertIn('attachment; filename="gafetes.pdf"', respuesta['Content-Disposition'])
+        contenido = b''.join(respuesta.streaming_content)
+        respuesta.close()
+        self.assertEqual(paginas_pdf(contenido), 2)
+
+
+@override_settings(QR_GUARDAR_EN_STORAGE=False)
+class PresupuestosSQLTests(TestCase):
+    """Cada vista hace las mismas consultas con 1 o con 100 filas: un N+1 rompe el presupuesto"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        departamento = Departamento.objects.create(nombre='Operaciones', email='op@example.com')
+        hoy = timezone.localdate()
+        for i in range(6):
+            empleado = crear_empleado(f'40{i:02d}', departamento)
+            for dias in range(3):
+                Asistencia.objects.create(
+                    empleado=empleado, fecha=hoy - timedelta(days=dias), hora=time(9, 30),
+                    tipo_movimiento=TipoMovimiento.ENTRADA, retardo=True, minutos_retardo=30
+                )
+            TiempoExtra.objects.create(empleado=empleado, fecha=hoy, horas_extra=1)
+            visitante = Visitante.objects.create(
+                nombre=f'Visitante {i}', email='v@example.com', telefono='555', departamento_visita=departamento,
+                motivo='Junta', fecha_visita=hoy, hora_visita=time(10)
+            )
+            RegistroVisita.objects.create(visitante=visitante)
+        reconstruir_resumen_diario(hoy - timedelta(days=2), hoy)
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_presupuestos_por_vista(self):
+        for nombre, maximo in PRESUPUESTOS:
+            with self.subTest(vista=nombre):
+                with presupuesto_queries(maximo, nombre):
+                    respuesta = self.client.get(reverse(nombre))
+                self.assertEqual(respuesta.status_code, 200)
+
+    @override_settings(PERFIL_SQL=True, PERFIL_SQL_HEADER=True, PERFIL_SQL_MAX_QUERIES=100, PERFIL_SQL_MAX_MS=10000)
+    async def test_perfil_mide_vistas_asincronas(self):
+        respuesta = await AsyncClient().get(reverse('api_dashboard'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotIn('desc="0 consultas"', respuesta.headers['Server-Timing'])
+
+
+@override_settings(QR_GUARDAR_EN_STORAGE=False)
+class LimpiezaArchivosTests(TestCase):
+    def test_solo_modelos_con_archivos_tienen_senales(self):
+        for modelo in (Empleado, Visitante):
+            with self.subTest(modelo=modelo.__name__):
+                self.assertTrue(pre_save.has_listeners(modelo))
+                self.assertTrue(post_init.has_listeners(modelo))
+        # Cada checada se guarda sin pasar por la limpieza de archivos
+        for modelo in (Asistencia, ResumenDiario, RegistroVisita):
+            with self.subTest(modelo=modelo.__name__):
+                self.assertFalse(pre_save.has_listeners(modelo))
+                self.assertFalse(post_delete.has_listeners(modelo))
+
+    def test_qr_reemplazado_se_programa_para_borrar(self):
+        empleado = Empleado.objects.get(pk=crear_empleado('6001', qr_code='qr_codes/viejo.png').pk)
+        empleado.qr_code = 'qr_codes/nuevo.png'
+        empleado.save()
+        self.assertEqual(list(ArchivoPorEliminar.objects.values_list('nombre', flat=True)), ['qr_codes/viejo.png'])
+
+        empleado.delete()
+        self.assertEqual(
+            sorted(ArchivoPorEliminar.objects.values_list('nombre', flat=True)),
+            ['qr_codes/nuevo.png', 'qr_codes/viejo.png']
+        )
+
+
+class EliminarArchivosTests(TestCase):
+    def setUp(self):
+        self.storage = S3Storage(
+            bucket_name='checador-pruebas', location='media', access_key='x', secret_key='x', region_name='us-east-1'
+        )
+        self.stubber = Stubber(self.storage.bucket.meta.client)
+        self.stubber.activate()
+        self.addCleanup(self.stubber.deactivate)
+
+    def test_borra_el_lote_con_una_peticion(self):
+        for nombre in ('qr_codes/a.png', 'qr_codes/b.png', 'qr_codes/c.png'):
+            ArchivoPorEliminar.objects.create(nombre=nombre)
+        self.stubber.add_response(
+            'delete_objects',
+            {'Errors': [{'Key': 'media/qr_codes/b.png', 'Code': 'InternalError', 'Message': 'Reintentar'}]},
+            {
+                'Bucket': 'checador-pruebas',
+                'Delete': {
+                    'Objects': [
+                        {'Key': 'media/qr_codes/a.png'}, {'Key': 'media/qr_codes/b.png'}, {'Key': 'media/qr_codes/c.png'}
+                    ],
+                    'Quiet': True,
+                },
+            },
+        )
+
+        self.assertEqual(eliminar_archivos_pendientes(storage=self.storage), (2, 1))
+        self.stubber.assert_no_pending_responses()
+        fallido = ArchivoPorEliminar.objects.get()
+        self.assertEqual((fallido.nombre, fallido.intentos), ('qr_codes/b.png', 1))
+        self.assertIn('InternalError', fallido.ultimo_error)
+        self.assertGreater(fallido.siguiente_intento, timezone.now())
+        # Espera su siguiente intento: la siguiente pasada no vuelve a llamar a S3
+        self.assertEqual(eliminar_archivos_pendientes(storage=self.storage), (0, 0))
+
+    def test_agotados_no_se_reintentan(self):
+        ArchivoPorEliminar.objects.create(nombre='qr_codes/a.png', intentos=MAX_INTENTOS)
+        # Sin respuestas en el stub: cualquier petición a S3 fallaría
+        self.assertEqual(eliminar_archivos_pendientes(storage=self.storage), (0, 0))
+
+
+class IndicesTests(TestCase):
+    def test_consultas_frecuentes_usan_indices(self):
+        # verificar_indices lanza CommandError si EXPLAIN no muestra el índice esperado
+        salida = StringIO()
+        call_command('verificar_indices', empleados=5, dias=30, repeticiones=1, stdout=salida)
+        self.assertIn('Todas las consultas usan sus índices', salida.getvalue())
+        self.assertFalse(Asistencia.objects.exists())
+
+
+class HorarioCompiladoTests(SimpleTestCase):
+    fecha = date(2025, 3, 5)
+
+    def test_horario_normal_respeta_la_tolerancia(self):
+        horario = compilar_horario(hora_entrada='09:00:00', minutos_tolerancia=15)
+        self.assertEqual(horario.retardo(self.fecha, time(9, 15)), (False, 0))
+        self.assertEqual(horario.retardo(self.fecha, time(9, 15, 1)), (True, 15))
+        self.assertEqual(horario.retardo(self.fecha, time(9, 40)), (True, 40))
+
+    def test_sin_hora_de_entrada_nunca_hay_retardo(self):
+        self.assertEqual(HorarioCompilado().retardo(self.fecha, time(23, 0)), (False, 0))
+
+    def test_turno_24h_se_compara_con_la_entrada_anterior(self):
+        horario = HorarioCompilado(es_turno_24h=True)
+        anterior = (self.fecha - timedelta(days=2), time(8, 0))
+        self.assertEqual(horario.retardo(self.fecha, time(8, 0), anterior), (False, 0))
+        self.assertEqual(horario.retardo(self.fecha, time(10, 0), anterior), (False, 0))
+        self.assertEqual(horario.retardo(self.fecha, time(10, 30), anterior), (True, 150))
+
+    def test_turno_24h_primera_entrada_sin_retardo(self):
+        horario = HorarioCompilado(es_turno_24h=True)
+        self.assertEqual(horario.retardo(self.fecha, time(23, 0)), (False, 0))
+        self.assertEqual(retardos_en_serie(horario, [(self.fecha, time(23, 0))]), [(False, 0)])
+
+    def test_serie_24h_usa_la_entrada_de_un_dia_anterior(self):
+        horario = HorarioCompilado(es_turno_24h=True)
+        entradas = [
+            (self.fecha, time(8, 0)),
+            (self.fecha + timedelta(days=2), time(8, 0)),
+            # Segunda entrada del mismo día: se compara con la de hace dos días, no con la de la mañana
+            (self.fecha + timedelta(days=2), time(20, 0)),
+        ]
+        self.assertEqual(
+            retardos_en_serie(horario, entradas), [(False, 0), (False, 0), (True, 12 * 60)]
+        )
+        # Con la ENTRADA previa al rango la primera también se evalúa
+        anterior = (self.fecha - timedelta(days=2), time(5, 0))
+        self.assertEqual(retardos_en_serie(horario, entradas, anterior)[0], (True, 3 * 60))
+
+    def test_serie_normal_evalua_cada_entrada(self):
+        horario = compilar_horario(hora_entrada=time(9, 0), minutos_tolerancia=10)
+        entradas = [(self.fecha, time(9, 5)), (self.fecha, time(9, 30))]
+        self.assertEqual(retardos_en_serie(horario, entradas), [(False, 0), (True, 30)])
+
+
+@override_settings(QR_GUARDAR_EN_STORAGE=False)
+class RecalcularRetardosTests(TestCase):
+    inicio, fin = date(2025, 3, 3), date(2025, 3, 5)
+
+    def setUp(self):
+        horario = TipoHorario.objects.create(nombre='Matutino', hora_entrada=time(9, 0), minutos_tolerancia=10)
+        self.empleado = crear_empleado('6001', tipo_horario=horario)
+        # Guardadas con la regla anterior: solo la del día 4 cambia con la tolerancia de 10 minutos
+        self.entradas = [
+            Asistencia.objects.create(
+                empleado=self.empleado, fecha=self.inicio + timedelta(days=dias), hora=hora,
+                tipo_movimiento=TipoMovimiento.ENTRADA, retardo=retardo, minutos_retardo=minutos
+            )
+            for dias, (hora, retardo, minutos) in enumerate([
+                (time(9, 5), False, 0), (time(9, 30), False, 0), (time(9, 20), True, 20),
+            ])
+        ]
+        reconstruir_resumen_diario(self.inicio, self.fin)
+
+    def estado(self):
+        return (
+            list(Asistencia.objects.order_by('fecha').values_list('retardo', 'minutos_retardo')),
+            list(ResumenDiario.objects.order_by('fecha').values_list('retardo', 'minutos_retardo')),
+        )
+
+    def test_dry_run_no_escribe(self):
+        antes = self.estado()
+        resultado = recalcular_retardos(self.inicio, self.fin, dry_run=True)
+        self.assertEqual(resultado.revisadas, 3)
+        self.assertEqual([c.asistencia_id for c in resultado.cambios], [self.entradas[1].pk])
+        self.assertEqual(resultado.cambios[0].despues, (True, 30))
+        self.assertEqual(self.estado(), antes)
+
+    def test_actualiza_solo_las_que_cambian_y_el_resumen(self):
+        escritas = []
+        bulk_update = Asistencia.objects.bulk_update
+
+        def registrar(objetos, campos):
+            escritas.extend(asistencia.pk for asistencia in objetos)
+            return bulk_update(objetos, campos)
+
+        with mock.patch.object(Asistencia.objects, 'bulk_update', side_effect=registrar):
+            resultado = recalcular_retardos(self.inicio, self.fin)
+        self.assertEqual(escritas, [self.entradas[1].pk])
+        self.assertEqual(len(resultado.cambios), 1)
+
+        asistencias, resumenes = self.estado()
+        self.assertEqual(asistencias, [(False, 0), (True, 30), (True, 20)])
+        self.assertEqual(resumenes, asistencias)
+        # Una segunda corrida ya no encuentra nada que cambiar
+        self.assertEqual(recalcular_retardos(self.inicio, self.fin).cambios, [])
+
+    def test_comando(self):
+        antes = self.estado()
+        salida = StringIO()
+        call_command('recalcular_retardos', '--desde', '2025-03-03', '--hasta', '2025-03-05', '--dry-run', stdout=salida)
+        self.assertIn('6001 2025-03-04 09:30: a tiempo → retardo 30 min', salida.getvalue())
+        self.assertIn('Modificadas: 1', salida.getvalue())
+        self.assertEqual(self.estado(), antes)
+
+        call_command('recalcular_retardos', '--desde', '2025-03-03', '--hasta', '2025-03-05', stdout=StringIO())
+        self.assertEqual(ResumenDiario.objects.get(fecha=date(2025, 3, 4)).minutos_retardo, 30)
+
+
+@override_settings(QR_GUARDAR_EN_STORAGE=False)
+class RetardosEscalaTests(TestCase):
+    """Las consultas de retardos y del dashboard no crecen con el número de empleados"""
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'x')
+        self.departamento = Departamento.objects.create(nombre='Operaciones')
+        self.hoy = timezone.localdate()
+
+    def poblar(self, cantidad):
+        Empleado.objects.all().delete()
+        User.objects.exclude(pk=self.admin.pk).delete()
+        usuarios = User.objects.bulk_create(
+            User(username=f'escala{i}', first_name='Empleado', last_name=str(i)) for i in range(cantidad)
+        )
+        empleados = Empleado.objects.bulk_create(
+            Empleado(user=usuario, codigo_empleado=f'E{i}', departamento=self.departamento)
+            for i, usuario in enumerate(usuarios)
+        )
+        Asistencia.objects.bulk_create(
+            Asistencia(
+                empleado=empleado, fecha=self.hoy - timedelta(days=dias), hora=time(9, 30),
+                tipo_movimiento=TipoMovimiento.ENTRADA, retardo=True, minutos_retardo=30
+            )
+            for empleado in empleados for dias in range(3)
+        )
+        reconstruir_resumen_diario(self.hoy - timedelta(days=2), self.hoy)
+
+    def test_consultas_constantes(self):
+        self.client.force_login(self.admin)
+        for cantidad in (10, 100, 1000):
+            with self.subTest(empleados=cantidad):
+                self.poblar(cantidad)
+                with self.assertNumQueries(2):
+                    retardos = empleados_con_retardos(self.hoy - timedelta(days=5), self.hoy)
+                self.assertEqual(len(retardos), cantidad)
+                with self.assertNumQueries(6):
+                    respuesta = self.client.get(reverse('dashboard'))
+                self.assertEqual(respuesta.status_code, 200)
+
+
+class MetricasMultiprocesoTests(SimpleTestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        ajuste = override_settings(METRICAS_DIR=self.directorio)
+        ajuste.enable()
+        self.addCleanup(ajuste.disable)
+
+    def test_vuelca_sin_esperar_otro_evento(self):
+        ESCANEOS.inc(resultado='prueba_volcado')
+        reloj.sleep(INTERVALO_VOLCADO * 2)
+        propio = [a for a in os.listdir(self.directorio) if a.startswith(f'{os.getpid()}-')]
+        with open(os.path.join(self.directorio, propio[0])) as f:
+            self.assertIn(['checador_escaneos_total', ['prueba_volcado'], 1], json.load(f))
+
+    def test_worker_terminado_se_archiva_sin_perder_contadores(self):
+        terminado = subprocess.run([sys.executable, '-c', 'import os; print(os.getpid())'], capture_output=True)
+        pid = int(terminado.stdout)
+        with open(os.path.join(self.directorio, f'{pid}-1.json'), 'w') as f:
+            json.dump([['checador_escaneos_total', ['prueba_archivo'], 7]], f)
+
+        for _ in range(2):
+            self.assertIn('checador_escaneos_total{resultado="prueba_archivo"} 7', exportar())
+        self.assertFalse(os.path.exists(os.path.join(self.directorio, f'{pid}-1.json')))
+        self.assertTrue(os.path.exists(os.path.join(self.directorio, 'historico.json')))
+
+
+class CadenaASGITests(SimpleTestCase):
+    @override_settings(DEBUG=True)
+    def test_middleware_no_adapta_la_cadena(self):
+        # Django registra en DEBUG cada middleware que tiene que adaptar
+        with self.assertLogs('django.request', level='DEBUG') as registro:
+            ASGIHandler()
+            logging.getLogger('django.request').debug('cadena cargada')
+        # Los que lanzan MiddlewareNotUsed se registran como adaptados pero no quedan en la cadena
+        no_usados = [linea.split("'")[1] for linea in registro.output if 'MiddlewareNotUsed' in linea]
+        adaptados = [
+            linea for linea in registro.output
+            if 'adapted' in linea and not any(nombre in linea for nombre in no_usados)
+        ]
+        self.assertEqual(adaptados, [])
@@ -5,10 +5,18 @@ urlpatterns = [
     # Health check para DigitalOcean
     path('health/', views.health_check, name='health_check'),
     path('db-status/', views.db_status, name='db_status'),
+    path('ready/', views.readiness, name='readiness'),
+    path('ready/metrics/', views.readiness_prometheus, name='readiness_prometheus'),
+    path('metrics', views.metricas_prometheus, name='metricas'),
     
     # Tablet de recepción
     path('checkin/', views.checkin_view, name='checkin'),
     path('', views.checkin_view_tablet, name='checkin_tablet'),
+    path('api/checkin/', views.api_checkin, name='api_checkin'),
+    path('api/checkin/lote/', views.api_checkin_lote, name='api_checkin_lote'),
+
+    # Imágenes de QR generadas bajo demanda
+    path('qr/<str:tipo>/<uuid:qr_uuid>.<str:formato>', views.qr_view, name='qr'),
 
     # Registro de visitantes (público)
     path('visitante/registro/', views.VisitanteCreateView.as_view(), name='visitante_registro'),
@@ -16,6 +24,7 @@ urlpatterns = [
 
     # Dashboard y reportes (requiere autenticación)
     path('dashboard/', views.dashboard_view, name='dashboard'),
+    path('api/dashboard/', views.api_dashboard, name='api_dashboard'),
     path('reporte/mensual/', views.reporte_mensual_view, name='reporte_mensual'),
     path('reporte/mensual/<int:mes>/<int:anio>/', views.reporte_mensual_view, name='reporte_mensual_detalle'),
 ]
\ No newline at end of file
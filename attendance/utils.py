@@ -1,13 +1,52 @@
-from django.core.mail import EmailMessage, EmailMultiAlternatives
-from django.template.loader import render_to_string
+from django.core.mail import EmailMultiAlternatives
 from django.utils import timezone
+from django.db.models import Count
 from datetime import datetime, timedelta
-from .models import Asistencia, TipoMovimiento, Empleado, ConfiguracionSistema, TiempoExtra, TipoHorario
+from .models import Asistencia, Departamento, ResumenDiario, TipoMovimiento, Empleado, TiempoExtra, TipoHorario
+from .cache import obtener_configuracion, obtener_horario
+from .correo import encolar_correo, enviar_mensajes, enviar_por_departamento
+from .reportes import renderizar_reporte, generar_reporte_por_partes, escribir_reporte
+from .resumenes import resumen_periodo
 import os
 from django.conf import settings
 
-def enviar_email_visitante(visitante):
-    """Envía email con QR al visitante y notifica al departamento"""
+def empleados_con_retardos(fecha_inicio, fecha_fin, minimo=3):
+    """
+    Empleados activos con ``minimo`` o más días con retardo en el rango.
+
+    Cuenta los ``ResumenDiario`` con retardo, es decir, solo la primera
+    ENTRADA de cada día, igual que los reportes (``totales_por_empleado``).
+    Usa un solo conteo agrupado más una consulta de empleados, sin importar
+    cuántos empleados haya. Devuelve una lista de dicts con ``empleado`` y
+    ``retardos`` ordenada por id de empleado.
+    """
+    conteos = dict(
+        ResumenDiario.objects.filter(
+            empleado__activo=True,
+            fecha__gte=fecha_inicio,
+            fecha__lte=fecha_fin,
+            retardo=True
+        )
+        .order_by()
+        .values('empleado')
+        .annotate(retardos=Count('id'))
+        .filter(retardos__gte=minimo)
+        .values_list('empleado', 'retardos')
+    )
+    if not conteos:
+        return []
+
+    empleados = Empleado.objects.filter(pk__in=conteos).select_related(
+        'user', 'departamento'
+    ).order_by('pk')
+    return [
+        {'empleado': empleado, 'retardos': conteos[empleado.pk]}
+        for empleado in empleados
+    ]
+
+
+def construir_emails_visitante(visitante):
+    """Construye el email con QR para el visitante y la notificación al departamento"""
 
     # Email al visitante
     subject_visitante = f'Confirmación de Visita - {visitante.fecha_visita}'
@@ -29,7 +68,7 @@ def enviar_email_visitante(visitante):
             </div>
             <div style="text-align: center; margin: 30px 0;">
                 <p><strong>Tu código QR de acceso:</strong></p>
-                <img src="{visitante.qr_code.url}" alt="QR Code" style="max-width: 250px;">
+                <img src="{visitante.url_imagen_qr(absoluta=True)}" alt="QR Code" style="max-width: 250px;">
                 <p style="font-size: 12px; color: #6b7280;">Presenta este código al llegar a recepción</p>
             </div>
         </div>
@@ -51,8 +90,6 @@ def enviar_email_visitante(visitante):
     #    with open(visitante.qr_code.path, 'rb') as f:
     #        email_visitante.attach('qr_code.png', f.read(), 'image/png')
 
-    email_visitante.send(fail_silently=False)
-
     # Email al departamento
     subject_depto = f'Nueva Visita Programada - {visitante.nombre}'
     mensaje_depto = f"""
@@ -78,7 +115,67 @@ def enviar_email_visitante(visitante):
         [visitante.departamento_visita.email]
     )
     email_depto.attach_alternative(mensaje_depto, "text/html")
-    email_depto.send(fail_silently=False)
+
+    return [email_visitante, email_depto]
+
+
+def fila_resumen(resumen):
+    """Fila de las tablas de período (semanal/quincenal) a partir de un ResumenEmpleado"""
+    empleado = resumen.empleado
+    return {
+        'nombre': empleado.user.get_full_name(),
+        'codigo': empleado.codigo_empleado,
+        'departamento': empleado.departamento.nombre if empleado.departamento else 'N/A',
+        'departamento_id': empleado.departamento_id,
+        'dias_asistidos': resumen.dias_asistidos,
+        'retardos': resumen.retardos,
+        'total_min_retardo': resumen.minutos_retardo,
+        'faltas': resumen.faltas,
+    }
+
+
+def enviar_reporte(plantilla, asunto, texto, contexto, destinatario, listas, extra_departamento=None):
+    """
+    Envía el reporte a ``destinatario`` y a cada departamento su versión.
+
+    La versión de un departamento tiene solo las filas de ``listas`` (claves
+    de ``contexto``) cuyo ``departamento_id`` es el suyo; los departamentos
+    sin filas no reciben correo. ``extra_departamento(departamento)`` puede
+    agregar datos propios del departamento al contexto. Todos los correos
+    salen sobre una sola sesión SMTP.
+    """
+    def construir(contexto_mensaje, destinatarios, asunto_mensaje):
+        email = EmailMultiAlternatives(asunto_mensaje, texto, settings.DEFAULT_FROM_EMAIL, destinatarios)
+        email.attach_alternative(renderizar_reporte(plantilla, contexto_mensaje), "text/html")
+        return email
+
+    def mensaje_departamento(departamento):
+        propio = dict(contexto, departamento=departamento.nombre)
+        for clave in listas:
+            propio[clave] = [fila for fila in contexto[clave] if fila['departamento_id'] == departamento.pk]
+        if not any(propio[clave] for clave in listas):
+            return None
+        if extra_departamento:
+            propio.update(extra_departamento(departamento))
+        return construir(propio, [departamento.email], f'{asunto} - {departamento.nombre}')
+
+    return enviar_por_departamento(
+        Departamento.objects.exclude(email='').order_by('nombre'),
+        mensaje_departamento,
+        mensajes=[construir(contexto, [destinatario], asunto)],
+        lanzar_errores=True,
+    )
+
+
+def enviar_email_visitante(visitante):
+    """Envía email con QR al visitante y notifica al departamento"""
+    enviar_mensajes(construir_emails_visitante(visitante), lanzar_errores=True)
+
+
+def encolar_email_visitante(visitante):
+    """Deja en la bandeja de salida los correos del visitante (los envía procesar_correos)"""
+    for email in construir_emails_visitante(visitante):
+        encolar_correo(email)
 
 
 def generar_reporte_semanal():
@@ -92,136 +189,45 @@ def generar_reporte_semanal():
     fecha_fin = hoy
 
     # Obtener configuración
-    config = ConfiguracionSistema.objects.first()
+    config = obtener_configuracion()
     if not config:
         return
 
     # Obtener datos por empleado
-    empleados = Empleado.objects.filter(activo=True)
-
-    html_reporte = f"""
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; }}
-            table {{ border-collapse: collapse; width: 100%; margin: 20px 0; }}
-            th, td {{ border: 1px solid #ddd; padding: 10px; text-align: center; }}
-            th {{ background-color: #3b82f6; color: white; }}
-            tr:nth-child(even) {{ background-color: #f2f2f2; }}
-            .titulo {{ background-color: #1e40af; color: white; padding: 20px; text-align: center; }}
-            .resumen {{ background-color: #eff6ff; padding: 20px; border-radius: 8px; margin: 20px 0; }}
-            .alerta {{ background-color: #fef2f2; padding: 15px; border-left: 4px solid #ef4444; margin: 20px 0; }}
-        </style>
-    </head>
-    <body>
-        <div class="titulo">
-            <h1>Reporte Semanal de Asistencias</h1>
-            <p>{fecha_inicio.strftime('%d/%m/%Y')} - {fecha_fin.strftime('%d/%m/%Y')}</p>
-        </div>
-
-        <table>
-            <tr>
-                <th>Empleado</th>
-                <th>Código</th>
-                <th>Departamento</th>
-                <th>Días Asistidos</th>
-                <th>Retardos</th>
-                <th>Total Min. Retardo</th>
-                <th>Faltas</th>
-            </tr>
-    """
+    empleados = Empleado.objects.filter(activo=True).select_related('user', 'departamento')
 
+    filas = []
     # Recolectar empleados con retardos consecutivos
     empleados_retardos_consecutivos = []
 
-    for empleado in empleados:
-        asistencias = Asistencia.objects.filter(
-            empleado=empleado,
-            fecha__gte=fecha_inicio,
-            fecha__lte=fecha_fin,
-            tipo_movimiento=TipoMovimiento.ENTRADA
-        )
-
-        dias_asistidos = asistencias.values('fecha').distinct().count()
-        retardos = asistencias.filter(retardo=True).count()
-        total_min_retardo = sum(asistencias.filter(retardo=True).values_list('minutos_retardo', flat=True))
-
-        # Calcular días/turnos laborales según tipo de horario
-        tipo_horario = empleado.tipo_horario
-        if tipo_horario and tipo_horario.es_turno_24h:
-            # Para turnos de 24h: calcular turnos esperados en el período
-            # Ciclo de 48 horas (24h trabajo + 24h descanso)
-            dias_periodo = (fecha_fin - fecha_inicio).days + 1
-            turnos_esperados = dias_periodo // 2  # Un turno cada 2 días
-            faltas = max(0, turnos_esperados - dias_asistidos)
-        else:
-            # Para horarios regulares: lunes a viernes
-            dias_laborales = 0
-            fecha_actual = fecha_inicio
-            while fecha_actual <= fecha_fin:
-                if fecha_actual.weekday() < 5:  # Lunes a viernes
-                    dias_laborales += 1
-                fecha_actual += timedelta(days=1)
-            faltas = dias_laborales - dias_asistidos
-
-        html_reporte += f"""
-            <tr>
-                <td>{empleado.user.get_full_name()}</td>
-                <td>{empleado.codigo_empleado}</td>
-                <td>{empleado.departamento.nombre if empleado.departamento else 'N/A'}</td>
-                <td>{dias_asistidos}</td>
-                <td>{retardos}</td>
-                <td>{total_min_retardo}</td>
-                <td>{faltas}</td>
-            </tr>
-        """
+    # Días laborales: lunes a viernes (un turno cada 2 días para turnos de 24h)
+    for resumen in resumen_periodo(fecha_inicio, fecha_fin, empleados, solo_dias_habiles=True):
+        empleado = resumen.empleado
+        filas.append(fila_resumen(resumen))
 
         # Detectar empleados con retardos consecutivos (3 o más retardos en la semana)
-        if retardos >= 3:
+        if resumen.retardos >= 3:
             empleados_retardos_consecutivos.append({
                 'nombre': empleado.user.get_full_name(),
                 'codigo': empleado.codigo_empleado,
-                'retardos': retardos
+                'departamento_id': empleado.departamento_id,
+                'retardos': resumen.retardos
             })
 
-    html_reporte += "</table>"
-
-    # Agregar alerta de retardos consecutivos si existen
-    if empleados_retardos_consecutivos:
-        html_reporte += """
-        <div class="alerta">
-            <h2>⚠️ Atención: Retardos Recurrentes</h2>
-            <p>Los siguientes empleados tienen 3 o más retardos esta semana:</p>
-            <table>
-                <tr>
-                    <th>Empleado</th>
-                    <th>Código</th>
-                    <th>Retardos (esta semana)</th>
-                </tr>
-        """
-
-        for emp in empleados_retardos_consecutivos:
-            html_reporte += f"""
-                <tr>
-                    <td>{emp['nombre']}</td>
-                    <td>{emp['codigo']}</td>
-                    <td>{emp['retardos']}</td>
-                </tr>
-            """
-
-        html_reporte += "</table></div>"
-
-    html_reporte += "</body></html>"
-
-    # Enviar email
-    email = EmailMultiAlternatives(
+    # Enviar email al gerente y a cada departamento
+    enviar_reporte(
+        'semanal',
         f'Reporte Semanal de Asistencias - Semana del {fecha_inicio.strftime("%d/%m/%Y")}',
         'Reporte semanal de asistencias. Por favor revisa el contenido HTML.',
-        settings.DEFAULT_FROM_EMAIL,
-        [config.email_gerente]
+        {
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin': fecha_fin,
+            'filas': filas,
+            'empleados_retardos': empleados_retardos_consecutivos,
+        },
+        config.email_gerente,
+        listas=['filas', 'empleados_retardos'],
     )
-    email.attach_alternative(html_reporte, "text/html")
-    email.send(fail_silently=False)
 
 
 def generar_reporte_diario():
@@ -229,7 +235,7 @@ def generar_reporte_diario():
     hoy = timezone.now().date()
 
     # Obtener configuración
-    config = ConfiguracionSistema.objects.first()
+    config = obtener_configuracion()
     if not config:
         return
 
@@ -239,115 +245,66 @@ def generar_reporte_diario():
         tipo_movimiento=TipoMovimiento.ENTRADA
     ).select_related('empleado', 'empleado__user')
 
-    total_empleados = Empleado.objects.filter(activo=True).count()
-    llegaron = asistencias_entrada.count()
-    retardos = asistencias_entrada.filter(retardo=True)
+    # Activos y entradas por departamento (para la versión de cada departamento)
+    activos_por_departamento = dict(
+        Empleado.objects.filter(activo=True).order_by().values('departamento')
+        .annotate(total=Count('id')).values_list('departamento', 'total')
+    )
+    entradas_por_departamento = dict(
+        asistencias_entrada.order_by().values('empleado__departamento')
+        .annotate(total=Count('id')).values_list('empleado__departamento', 'total')
+    )
+    total_empleados = sum(activos_por_departamento.values())
+    llegaron = sum(entradas_por_departamento.values())
+    retardos = [
+        {
+            'nombre': asistencia.empleado.user.get_full_name(),
+            'codigo': asistencia.empleado.codigo_empleado,
+            'departamento_id': asistencia.empleado.departamento_id,
+            'tipo_horario': getattr(obtener_horario(asistencia.empleado.tipo_horario_id), 'nombre', 'Estándar'),
+            'hora': asistencia.hora,
+            'minutos_retardo': asistencia.minutos_retardo,
+        }
+        for asistencia in asistencias_entrada.filter(retardo=True)
+    ]
 
     # Empleados con retardos consecutivos (últimos 5 días)
     fecha_inicio = hoy - timedelta(days=5)
     empleados_retardos_consecutivos = []
 
-    for empleado in Empleado.objects.filter(activo=True):
-        retardos_count = Asistencia.objects.filter(
-            empleado=empleado,
-            fecha__gte=fecha_inicio,
-            fecha__lte=hoy,
-            tipo_movimiento=TipoMovimiento.ENTRADA,
-            retardo=True
-        ).count()
-
-        if retardos_count >= 3:
-            empleados_retardos_consecutivos.append({
-                'nombre': empleado.user.get_full_name(),
-                'codigo': empleado.codigo_empleado,
-                'retardos': retardos_count
-            })
-
-    # Generar HTML del reporte
-    html_reporte = f"""
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; }}
-            table {{ border-collapse: collapse; width: 100%; margin: 20px 0; }}
-            th, td {{ border: 1px solid #ddd; padding: 12px; text-align: left; }}
-            th {{ background-color: #3b82f6; color: white; }}
-            tr:nth-child(even) {{ background-color: #f2f2f2; }}
-            .resumen {{ background-color: #eff6ff; padding: 20px; border-radius: 8px; margin: 20px 0; }}
-            .alerta {{ background-color: #fef2f2; padding: 15px; border-left: 4px solid #ef4444; margin: 20px 0; }}
-        </style>
-    </head>
-    <body>
-        <h1>Reporte Diario de Asistencia</h1>
-        <p><strong>Fecha:</strong> {hoy.strftime('%d/%m/%Y')}</p>
-
-        <div class="resumen">
-            <h2>Resumen</h2>
-            <p><strong>Total de Empleados:</strong> {total_empleados}</p>
-            <p><strong>Asistieron:</strong> {llegaron} ({(llegaron/total_empleados*100):.1f}%)</p>
-            <p><strong>Retardos del Día:</strong> {retardos.count()}</p>
-        </div>
-
-        <h2>Retardos del Día</h2>
-        <table>
-            <tr>
-                <th>Empleado</th>
-                <th>Código</th>
-                <th>Tipo de Horario</th>
-                <th>Hora de Entrada</th>
-                <th>Minutos de Retardo</th>
-            </tr>
-    """
-
-    for asistencia in retardos:
-        tipo_horario_nombre = asistencia.empleado.tipo_horario.nombre if asistencia.empleado.tipo_horario else 'Estándar'
-        html_reporte += f"""
-            <tr>
-                <td>{asistencia.empleado.user.get_full_name()}</td>
-                <td>{asistencia.empleado.codigo_empleado}</td>
-                <td>{tipo_horario_nombre}</td>
-                <td>{asistencia.hora.strftime('%H:%M')}</td>
-                <td>{asistencia.minutos_retardo}</td>
-            </tr>
-        """
-
-    html_reporte += "</table>"
-
-    if empleados_retardos_consecutivos:
-        html_reporte += """
-        <div class="alerta">
-            <h2>⚠️ Atención: Retardos Consecutivos</h2>
-            <p>Los siguientes empleados tienen 3 o más retardos en los últimos 5 días:</p>
-            <table>
-                <tr>
-                    <th>Empleado</th>
-                    <th>Código</th>
-                    <th>Retardos (últimos 5 días)</th>
-                </tr>
-        """
-
-        for emp in empleados_retardos_consecutivos:
-            html_reporte += f"""
-                <tr>
-                    <td>{emp['nombre']}</td>
-                    <td>{emp['codigo']}</td>
-                    <td>{emp['retardos']}</td>
-                </tr>
-            """
-
-        html_reporte += "</table></div>"
-
-    html_reporte += "</body></html>"
-
-    # Enviar email
-    email = EmailMultiAlternatives(
+    for item in empleados_con_retardos(fecha_inicio, hoy):
+        empleados_retardos_consecutivos.append({
+            'nombre': item['empleado'].user.get_full_name(),
+            'codigo': item['empleado'].codigo_empleado,
+            'departamento_id': item['empleado'].departamento_id,
+            'retardos': item['retardos']
+        })
+
+    def totales(activos, entradas):
+        return {
+            'total_empleados': activos,
+            'llegaron': entradas,
+            'porcentaje_asistencia': (entradas / activos * 100) if activos else 0,
+        }
+
+    # Enviar email al gerente y a cada departamento con retardos
+    enviar_reporte(
+        'diario',
         f'Reporte Diario de Asistencia - {hoy.strftime("%d/%m/%Y")}',
         'Reporte diario de asistencias. Por favor revisa el contenido HTML.',
-        settings.DEFAULT_FROM_EMAIL,
-        [config.email_gerente]
+        {
+            'fecha': hoy,
+            **totales(total_empleados, llegaron),
+            'retardos': retardos,
+            'empleados_retardos': empleados_retardos_consecutivos,
+            'alineacion': 'left',
+        },
+        config.email_gerente,
+        listas=['retardos', 'empleados_retardos'],
+        extra_departamento=lambda departamento: totales(
+            activos_por_departamento.get(departamento.pk, 0), entradas_por_departamento.get(departamento.pk, 0)
+        ),
     )
-    email.attach_alternative(html_reporte, "text/html")
-    email.send(fail_silently=False)
 
 
 def generar_reporte_quincenal(dia):
@@ -368,100 +325,49 @@ def generar_reporte_quincenal(dia):
             fecha_fin = (hoy.replace(month=hoy.month + 1, day=1) - timedelta(days=1))
         periodo = "Segunda Quincena"
 
-    config = ConfiguracionSistema.objects.first()
+    config = obtener_configuracion()
     if not config:
         return
 
     # Obtener datos por empleado
-    empleados = Empleado.objects.filter(activo=True)
-
-    html_reporte = f"""
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; }}
-            table {{ border-collapse: collapse; width: 100%; margin: 20px 0; }}
-            th, td {{ border: 1px solid #ddd; padding: 10px; text-align: center; }}
-            th {{ background-color: #3b82f6; color: white; }}
-            tr:nth-child(even) {{ background-color: #f2f2f2; }}
-            .titulo {{ background-color: #1e40af; color: white; padding: 20px; text-align: center; }}
-        </style>
-    </head>
-    <body>
-        <div class="titulo">
-            <h1>Reporte de Asistencias - {periodo}</h1>
-            <p>{fecha_inicio.strftime('%d/%m/%Y')} - {fecha_fin.strftime('%d/%m/%Y')}</p>
-        </div>
+    empleados = Empleado.objects.filter(activo=True).select_related('user', 'departamento')
 
-        <table>
-            <tr>
-                <th>Empleado</th>
-                <th>Código</th>
-                <th>Departamento</th>
-                <th>Días Asistidos</th>
-                <th>Retardos</th>
-                <th>Total Min. Retardo</th>
-                <th>Faltas</th>
-            </tr>
-    """
-
-    for empleado in empleados:
-        asistencias = Asistencia.objects.filter(
-            empleado=empleado,
-            fecha__gte=fecha_inicio,
-            fecha__lte=fecha_fin,
-            tipo_movimiento=TipoMovimiento.ENTRADA
-        )
+    # Días laborales: todos los días del período (un turno cada 2 días para turnos de 24h)
+    filas = [
+        fila_resumen(resumen)
+        for resumen in resumen_periodo(fecha_inicio, fecha_fin, empleados, solo_dias_habiles=False)
+    ]
 
-        dias_asistidos = asistencias.values('fecha').distinct().count()
-        retardos = asistencias.filter(retardo=True).count()
-        total_min_retardo = sum(asistencias.filter(retardo=True).values_list('minutos_retardo', flat=True))
-
-        # Calcular días/turnos laborales según tipo de horario
-        tipo_horario = empleado.tipo_horario
-        if tipo_horario and tipo_horario.es_turno_24h:
-            # Para turnos de 24h: calcular turnos esperados en el período
-            dias_periodo = (fecha_fin - fecha_inicio).days + 1
-            turnos_esperados = dias_periodo // 2
-            faltas = max(0, turnos_esperados - dias_asistidos)
-        else:
-            # Para horarios regulares: todos los días del período
-            dias_laborales = (fecha_fin - fecha_inicio).days + 1
-            faltas = dias_laborales - dias_asistidos
-
-        html_reporte += f"""
-            <tr>
-                <td>{empleado.user.get_full_name()}</td>
-                <td>{empleado.codigo_empleado}</td>
-                <td>{empleado.departamento.nombre if empleado.departamento else 'N/A'}</td>
-                <td>{dias_asistidos}</td>
-                <td>{retardos}</td>
-                <td>{total_min_retardo}</td>
-                <td>{faltas}</td>
-            </tr>
-        """
-
-    html_reporte += "</table></body></html>"
-
-    # Enviar email
-    email = EmailMultiAlternatives(
+    # Enviar email al gerente y a cada departamento
+    enviar_reporte(
+        'quincenal',
         f'Reporte Quincenal - {periodo} - {hoy.strftime("%B %Y")}',
         'Reporte quincenal de asistencias. Por favor revisa el contenido HTML.',
-        settings.DEFAULT_FROM_EMAIL,
-        [config.email_gerente]
+        {
+            'periodo': periodo,
+            'fecha_inicio': fecha_inicio,
+            'fecha_fin': fecha_fin,
+            'filas': filas,
+        },
+        config.email_gerente,
+        listas=['filas'],
     )
-    email.attach_alternative(html_reporte, "text/html")
-    email.send(fail_silently=False)
 
 
-def generar_reporte_tiempo_extra_mensual():
-    """Genera el reporte mensual de tiempo extra y lo guarda en la red"""
+def generar_reporte_tiempo_extra_mensual(storage=None):
+    """
+    Genera el reporte mensual de tiempo extra y lo guarda en la red.
+
+    El HTML se escribe fila por fila conforme se leen los registros, sin
+    armar el documento en memoria. Con ``storage`` (por ejemplo
+    ``ReportesStorage()``) se sube al backend en lugar de la ruta de red.
+    """
     hoy = timezone.now()
     mes = hoy.month
     anio = hoy.year
 
-    config = ConfiguracionSistema.objects.first()
-    if not config or not config.ruta_red_reportes:
+    config = obtener_configuracion()
+    if not config or (storage is None and not config.ruta_red_reportes):
         return
 
     # Obtener tiempos extra del mes
@@ -469,94 +375,47 @@ def generar_reporte_tiempo_extra_mensual():
         fecha__month=mes,
         fecha__year=anio,
         aprobado=True
-    ).select_related('empleado', 'empleado__user')
-
-    # Generar HTML
-    html_reporte = f"""
-    <html>
-    <head>
-        <style>
-            body {{ font-family: Arial, sans-serif; }}
-            table {{ border-collapse: collapse; width: 100%; margin: 20px 0; }}
-            th, td {{ border: 1px solid #ddd; padding: 10px; text-align: left; }}
-            th {{ background-color: #10b981; color: white; }}
-            tr:nth-child(even) {{ background-color: #f2f2f2; }}
-            .total {{ background-color: #d1fae5; font-weight: bold; }}
-        </style>
-    </head>
-    <body>
-        <h1>Reporte de Tiempo Extra</h1>
-        <p><strong>Período:</strong> {hoy.strftime('%B %Y')}</p>
-
-        <table>
-            <tr>
-                <th>Empleado</th>
-                <th>Código</th>
-                <th>Fecha</th>
-                <th>Horas Extra</th>
-                <th>Descripción</th>
-            </tr>
-    """
+    ).select_related('empleado', 'empleado__user').order_by('fecha', 'pk')
 
     total_horas = 0
     empleados_resumen = {}
 
-    for te in tiempos_extra:
-        html_reporte += f"""
-            <tr>
-                <td>{te.empleado.user.get_full_name()}</td>
-                <td>{te.empleado.codigo_empleado}</td>
-                <td>{te.fecha.strftime('%d/%m/%Y')}</td>
-                <td>{te.horas_extra}</td>
-                <td>{te.descripcion}</td>
-            </tr>
-        """
-        total_horas += float(te.horas_extra)
-
-        emp_id = te.empleado.id
-        if emp_id not in empleados_resumen:
-            empleados_resumen[emp_id] = {
-                'nombre': te.empleado.user.get_full_name(),
+    def filas():
+        nonlocal total_horas
+        for te in tiempos_extra.iterator(chunk_size=500):
+            nombre = te.empleado.user.get_full_name()
+            total_horas += float(te.horas_extra)
+
+            emp_id = te.empleado_id
+            if emp_id not in empleados_resumen:
+                empleados_resumen[emp_id] = {
+                    'nombre': nombre,
+                    'codigo': te.empleado.codigo_empleado,
+                    'horas': 0
+                }
+            empleados_resumen[emp_id]['horas'] += float(te.horas_extra)
+
+            yield {
+                'nombre': nombre,
                 'codigo': te.empleado.codigo_empleado,
-                'horas': 0
+                'fecha': te.fecha,
+                'horas_extra': te.horas_extra,
+                'descripcion': te.descripcion,
             }
-        empleados_resumen[emp_id]['horas'] += float(te.horas_extra)
-
-    html_reporte += f"""
-            <tr class="total">
-                <td colspan="3">TOTAL</td>
-                <td>{total_horas:.2f}</td>
-                <td></td>
-            </tr>
-        </table>
-
-        <h2>Resumen por Empleado</h2>
-        <table>
-            <tr>
-                <th>Empleado</th>
-                <th>Código</th>
-                <th>Total Horas Extra</th>
-            </tr>
-    """
 
-    for emp in empleados_resumen.values():
-        html_reporte += f"""
-            <tr>
-                <td>{emp['nombre']}</td>
-                <td>{emp['codigo']}</td>
-                <td>{emp['horas']:.2f}</td>
-            </tr>
-        """
-
-    html_reporte += "</table></body></html>"
+    fragmentos = generar_reporte_por_partes(
+        'tiempo_extra',
+        {'periodo': hoy},
+        filas(),
+        contexto_final=lambda: {'total_horas': total_horas, 'resumen': empleados_resumen.values()}
+    )
 
-    # Guardar en ruta de red
+    # Guardar en ruta de red (o en el storage indicado)
     nombre_archivo = f"reporte_tiempo_extra_{anio}_{mes:02d}.html"
-    ruta_completa = os.path.join(config.ruta_red_reportes, nombre_archivo)
+    destino = nombre_archivo if storage is not None else os.path.join(config.ruta_red_reportes, nombre_archivo)
 
     try:
-        with open(ruta_completa, 'w', encoding='utf-8') as f:
-            f.write(html_reporte)
+        ruta_completa = escribir_reporte(fragmentos, destino, storage=storage)
         print(f"Reporte guardado en: {ruta_completa}")
     except Exception as e:
-        print(f"Error al guardar reporte: {e}")
\ No newline at end of file
+        print(f"Error al guardar reporte: {e}")
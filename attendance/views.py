@@ -1,18 +1,36 @@
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, redirect
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, Http404
 from django.views.generic import CreateView, ListView
+from django.conf import settings
 from django.contrib import messages
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.db import transaction
 from django.db.models import Count, Q
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+import calendar
+import hmac
+import uuid
 from .models import (
-    Empleado, Asistencia, TipoMovimiento, Visitante,
-    RegistroVisita, TiempoExtra, ConfiguracionSistema
+    Empleado, Asistencia, TipoMovimiento, Visitante, TiempoExtra
 )
 from .forms import VisitanteForm, CheckInForm
-from .utils import enviar_email_visitante, generar_reporte_diario, generar_reporte_quincenal
+from .utils import (
+    encolar_email_visitante, generar_reporte_diario, generar_reporte_quincenal,
+    empleados_con_retardos
+)
+from .qr import FORMATOS, TIPOS, contenido_qr, etag_qr, renderizar_qr
+from .checadas import (
+    ChecadaRechazada, registrar_checada, registrar_lote, registrar_visita,
+    resolver_qr, resolver_visitante, resultado_checada
+)
+from .resumenes import resumen_periodo
+from .disponibilidad import como_json, como_prometheus, estado_dependencias, listo
+from .metricas import ESCANEOS, exportar
 import json
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_POST
 
 # Health check endpoint para DigitalOcean
 @csrf_exempt
@@ -22,39 +40,47 @@ def health_check(request):
 
 @csrf_exempt
 def db_status(request):
-    """Check database connection status"""
+    """Estado de la base de datos (resultado cacheado de la verificación) y métricas de conexión"""
     from django.db import connection
-    import socket
-
-    try:
-        # Configurar timeout
-        default_timeout = socket.getdefaulttimeout()
-        socket.setdefaulttimeout(5.0)
+    from checador.conexiones import estado_conexion
 
-        with connection.cursor() as cursor:
-            cursor.execute("SELECT 1")
-            result = cursor.fetchone()
-
-        socket.setdefaulttimeout(default_timeout)
-
-        return JsonResponse({
-            "status": "connected",
-            "database": connection.settings_dict['NAME'],
-            "host": connection.settings_dict['HOST']
-        })
-    except socket.timeout:
-        return JsonResponse({
-            "status": "timeout",
-            "error": "Database connection timed out after 5 seconds",
-            "help": "Database may still be provisioning or Trusted Sources not configured"
-        }, status=503)
-    except Exception as e:
+    db = next(v for v in estado_dependencias() if v.nombre == 'db')
+    if not db.ok:
         return JsonResponse({
             "status": "error",
-            "error": str(e),
-            "type": type(e).__name__
+            "error": db.detalle,
+            "help": "Database may still be provisioning or Trusted Sources not configured"
         }, status=503)
 
+    return JsonResponse({
+        "status": "connected",
+        "database": connection.settings_dict['NAME'],
+        "host": connection.settings_dict['HOST'],
+        "latencia_ms": db.latencia_ms,
+        "conexiones": estado_conexion(connection),
+    })
+
+@csrf_exempt
+def readiness(request):
+    """Disponibilidad de base de datos, storage y SMTP; 503 si falla una dependencia crítica"""
+    resultados = estado_dependencias()
+    return JsonResponse(como_json(resultados), status=200 if listo(resultados) else 503)
+
+@csrf_exempt
+def readiness_prometheus(request):
+    """Lo mismo que ``readiness`` en formato de texto de Prometheus"""
+    return HttpResponse(
+        como_prometheus(estado_dependencias()), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+@csrf_exempt
+def metricas_prometheus(request):
+    """Métricas de escaneos de todos los workers y estado de las dependencias, para Prometheus"""
+    return HttpResponse(
+        exportar() + como_prometheus(estado_dependencias()),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
 # Vista para tablet de recepción
 def checkin_view(request):
     """Vista principal para la tablet de checkin en recepción"""
@@ -70,15 +96,16 @@ def checkin_view(request):
                     visitante = Visitante.objects.get(qr_uuid=uuid_visitante)
                     return procesar_checkin_visitante(request, visitante)
                 except Visitante.DoesNotExist:
+                    ESCANEOS.inc(resultado='qr_invalido')
                     messages.error(request, 'Visitante no encontrado')
                     return redirect('checkin')
 
             # Verificar si es empleado
-            try:
-                empleado = Empleado.objects.get(qr_uuid=qr_code, activo=True)
+            empleado = resolver_qr(qr_code)
+            if empleado:
                 return procesar_checkin_empleado(request, empleado)
-            except Empleado.DoesNotExist:
-                messages.error(request, 'Código QR no válido')
+            ESCANEOS.inc(resultado='qr_invalido')
+            messages.error(request, 'Código QR no válido')
     else:
         form = CheckInForm()
 
@@ -93,11 +120,9 @@ def checkin_view_tablet(request):
             qr_code = form.cleaned_data['qr_code']
 
             # Verificar si es empleado
-            try:
-                empleado = Empleado.objects.get(qr_uuid=qr_code, activo=True)
+            empleado = resolver_qr(qr_code)
+            if empleado:
                 return procesar_checkin_empleado(request, empleado, redirect_to='checkin_tablet')
-            except Empleado.DoesNotExist:
-                pass
 
             # Verificar si es visitante
             try:
@@ -108,6 +133,7 @@ def checkin_view_tablet(request):
             except Visitante.DoesNotExist:
                 pass
 
+            ESCANEOS.inc(resultado='qr_invalido')
             messages.error(request, 'Código QR no válido')
     else:
         form = CheckInForm()
@@ -115,102 +141,149 @@ def checkin_view_tablet(request):
     return render(request, 'attendance/checkin_tablet.html', {'form': form})
 
 def procesar_checkin_empleado(request, empleado, redirect_to='checkin'):
-    """Procesa el check-in de un empleado"""
-    hoy = timezone.now().date()
-    ahora = timezone.now().time()
-    ultima_asistencia = Asistencia.objects.filter(
-        empleado=empleado,
-        fecha=hoy
-    ).order_by('-hora').first()
-
-    # Obtener tipo de horario del empleado
-    tipo_horario = empleado.tipo_horario
-
-    # Determinar el tipo de movimiento según el horario
-    if not ultima_asistencia:
-        tipo = TipoMovimiento.ENTRADA
-    else:
-        # Lógica según tipo de horario
-        if tipo_horario and tipo_horario.es_turno_24h:
-            # Turnos de 24 horas: solo ENTRADA y SALIDA
-            if ultima_asistencia.tipo_movimiento == TipoMovimiento.ENTRADA:
-                tipo = TipoMovimiento.SALIDA
-            else:
-                tipo = TipoMovimiento.ENTRADA
-        elif tipo_horario and not tipo_horario.tiene_horario_comida:
-            # Horario regular sin comida: solo ENTRADA y SALIDA
-            if ultima_asistencia.tipo_movimiento == TipoMovimiento.ENTRADA:
-                tipo = TipoMovimiento.SALIDA
-            else:
-                tipo = TipoMovimiento.ENTRADA
-        else:
-            # Horario con comida (default): secuencia completa
-            if ultima_asistencia.tipo_movimiento == TipoMovimiento.ENTRADA:
-                tipo = TipoMovimiento.SALIDA_COMIDA
-            elif ultima_asistencia.tipo_movimiento == TipoMovimiento.SALIDA_COMIDA:
-                tipo = TipoMovimiento.ENTRADA_COMIDA
-            elif ultima_asistencia.tipo_movimiento == TipoMovimiento.ENTRADA_COMIDA:
-                tipo = TipoMovimiento.SALIDA
-            else:
-                tipo = TipoMovimiento.ENTRADA
-
-    # Validar horario de comida si aplica
-    if tipo == TipoMovimiento.SALIDA_COMIDA:
-        if tipo_horario and tipo_horario.tiene_horario_comida:
-            # Validar que esté dentro del rango de comida
-            if tipo_horario.hora_inicio_comida and tipo_horario.hora_fin_comida:
-                if not (tipo_horario.hora_inicio_comida <= ahora <= tipo_horario.hora_fin_comida):
-                    messages.error(
-                        request,
-                        f"No puedes salir a comer fuera del horario permitido ({tipo_horario.hora_inicio_comida.strftime('%H:%M')} - {tipo_horario.hora_fin_comida.strftime('%H:%M')})"
-                    )
-                    return redirect(redirect_to)
-        elif tipo_horario and not tipo_horario.tiene_horario_comida:
-            # No tiene horario de comida, no permitir este movimiento
-            messages.error(request, "Tu horario no incluye salida a comida")
-            return redirect(redirect_to)
-
-    asistencia = Asistencia.objects.create(
-        empleado=empleado,
-        tipo_movimiento=tipo
-    )
-
-    # Calcular retardo si es entrada
-    if tipo == TipoMovimiento.ENTRADA:
-        config = ConfiguracionSistema.objects.first()
-        if tipo_horario and tipo_horario.hora_entrada:
-            asistencia.calcular_retardo(str(tipo_horario.hora_entrada), tipo_horario.minutos_tolerancia)
-        elif config:
-            asistencia.calcular_retardo(str(config.hora_entrada), config.minutos_tolerancia)
-        asistencia.save()
+    """Procesa el check-in de un empleado (``empleado`` es un EmpleadoCache)"""
+    try:
+        asistencia = registrar_checada(empleado)
+    except ChecadaRechazada as e:
+        messages.error(request, str(e))
+        return redirect(redirect_to)
 
-    mensaje = f"{empleado.user.get_full_name()} - {tipo}"
+    mensaje = f"{empleado.nombre_completo} - {asistencia.tipo_movimiento}"
     if asistencia.retardo:
         mensaje += f" (Retardo: {asistencia.minutos_retardo} min)"
 
     messages.success(request, mensaje)
     return redirect(redirect_to)
 
+@require_POST
+async def api_checkin(request):
+    """
+    Registra un escaneo y responde el movimiento en JSON, sin redirect ni
+    mensajes de sesión.
+
+    Acepta ``qr_code`` (y opcionalmente ``id``, el id de evento de la cola de
+    la tablet) como JSON o como formulario. Es asíncrona: con workers ASGI un
+    escaneo lento no bloquea al worker. El registro usa una transacción con
+    SELECT ... FOR UPDATE, que el ORM asíncrono no soporta, así que corre en
+    un hilo con ``sync_to_async``.
+    """
+    if request.content_type == 'application/json':
+        try:
+            datos = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': 'JSON inválido'}, status=400)
+        if not isinstance(datos, dict):
+            return JsonResponse({'error': 'JSON inválido'}, status=400)
+    else:
+        datos = request.POST
+
+    qr_code = str(datos.get('qr_code') or '').strip()
+    if not qr_code:
+        return JsonResponse({'error': 'Falta qr_code'}, status=400)
+
+    if qr_code.startswith('VISITANTE:'):
+        visitante = await sync_to_async(resolver_visitante)(qr_code)
+        if visitante is None:
+            ESCANEOS.inc(resultado='qr_invalido')
+            return JsonResponse({'error': 'Visitante no encontrado'}, status=404)
+        return JsonResponse({
+            'visitante': visitante.nombre,
+            'departamento': str(visitante.departamento_visita),
+            'tipo_movimiento': await sync_to_async(registrar_visita)(visitante),
+        })
+
+    evento_id = None
+    if datos.get('id'):
+        try:
+            evento_id = uuid.UUID(str(datos['id']))
+        except ValueError:
+            return JsonResponse({'error': 'id de evento inválido'}, status=400)
+
+    empleado = await sync_to_async(resolver_qr)(qr_code)
+    if empleado is None:
+        ESCANEOS.inc(resultado='qr_invalido')
+        return JsonResponse({'error': 'Código QR no válido'}, status=404)
+
+    try:
+        asistencia = await sync_to_async(registrar_checada)(empleado, evento_id=evento_id)
+    except ChecadaRechazada as e:
+        return JsonResponse({'error': str(e), 'empleado': empleado.nombre_completo}, status=409)
+    return JsonResponse(resultado_checada(asistencia, empleado))
+
+MAX_EVENTOS_LOTE = 200
+
+def _tablet_autorizada(request):
+    """True si el request trae el token de una de las tablets registradas en TABLET_TOKENS"""
+    token = request.headers.get('X-Tablet-Token', '')
+    return bool(token) and any(hmac.compare_digest(token, valido) for valido in settings.TABLET_TOKENS)
+
+@require_POST
+async def api_checkin_lote(request):
+    """
+    Recibe en lote las checadas que la tablet guardó localmente.
+
+    Espera ``{"eventos": [{"id", "qr_code", "momento"}, ...]}`` con ``momento``
+    en ISO 8601 y responde un resultado por evento (ver checadas.registrar_lote).
+    Solo la atienden las tablets con token (header ``X-Tablet-Token``).
+    """
+    if not _tablet_autorizada(request):
+        return JsonResponse({'error': 'Tablet no autorizada'}, status=401)
+    try:
+        datos = json.loads(request.body)
+        crudos = datos['eventos']
+        if not isinstance(crudos, list):
+            raise TypeError('eventos debe ser una lista')
+    except (ValueError, KeyError, TypeError) as e:
+        return JsonResponse({'error': f'Cuerpo inválido: {e}'}, status=400)
+    if len(crudos) > MAX_EVENTOS_LOTE:
+        return JsonResponse({'error': f'Máximo {MAX_EVENTOS_LOTE} eventos por lote'}, status=400)
+
+    eventos, invalidos = [], []
+    for crudo in crudos:
+        try:
+            momento = parse_datetime(crudo['momento'])
+            if momento is None:
+                raise ValueError('momento inválido')
+            if timezone.is_naive(momento):
+                momento = timezone.make_aware(momento)
+            eventos.append({
+                'id': uuid.UUID(str(crudo['id'])),
+                'qr_code': str(crudo['qr_code']).strip(),
+                'momento': momento,
+            })
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            invalidos.append({
+                'id': crudo.get('id') if isinstance(crudo, dict) else None,
+                'estado': 'invalido',
+                'mensaje': str(e),
+            })
+
+    return JsonResponse({'resultados': await sync_to_async(registrar_lote)(eventos) + invalidos})
+
 def procesar_checkin_visitante(request, visitante, redirect_to='checkin'):
     """Procesa el check-in de un visitante"""
-    # Verificar si ya tiene un registro abierto
-    registro_abierto = RegistroVisita.objects.filter(
-        visitante=visitante,
-        hora_salida__isnull=True
-    ).first()
-
-    if registro_abierto:
-        # Registrar salida
-        registro_abierto.hora_salida = timezone.now()
-        registro_abierto.save()
+    if registrar_visita(visitante) == TipoMovimiento.SALIDA:
         messages.success(request, f"Salida registrada: {visitante.nombre}")
     else:
-        # Registrar entrada
-        RegistroVisita.objects.create(visitante=visitante)
         messages.success(request, f"Entrada registrada: {visitante.nombre} - Visita a {visitante.departamento_visita}")
 
     return redirect(redirect_to)
 
+def _etag_qr(request, tipo, qr_uuid, formato):
+    return etag_qr(contenido_qr(tipo, qr_uuid), formato)
+
+@condition(etag_func=_etag_qr)
+def qr_view(request, tipo, qr_uuid, formato):
+    """
+    Imagen del QR de un empleado o visitante generada a partir de su ``qr_uuid``.
+    La imagen nunca cambia para un mismo uuid, así que se puede cachear indefinidamente.
+    """
+    if tipo not in TIPOS or formato not in FORMATOS:
+        raise Http404("QR no válido")
+    response = HttpResponse(renderizar_qr(contenido_qr(tipo, qr_uuid), formato), content_type=FORMATOS[formato])
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 # Vista de formulario de visitantes (pública)
 class VisitanteCreateView(CreateView):
     model = Visitante
@@ -219,9 +292,11 @@ class VisitanteCreateView(CreateView):
     success_url = '/visitante/exito/'
 
     def form_valid(self, form):
-        response = super().form_valid(form)
-        # Enviar email con QR al visitante y al departamento
-        enviar_email_visitante(self.object)
+        # Guardar el visitante y encolar sus correos en la misma transacción;
+        # el envío SMTP lo hace el worker procesar_correos fuera del request
+        with transaction.atomic():
+            response = super().form_valid(form)
+            encolar_email_visitante(self.object)
         messages.success(self.request, 'Tu visita ha sido registrada. Revisa tu correo para el código QR.')
         return response
 
@@ -232,7 +307,7 @@ def visitante_exito(request):
 # Dashboard para gerencia
 def dashboard_view(request):
     """Dashboard con estadísticas de asistencia"""
-    hoy = timezone.now().date()
+    hoy = timezone.localdate()
 
     # Estadísticas del día
     asistencias_hoy = Asistencia.objects.filter(
@@ -246,22 +321,7 @@ def dashboard_view(request):
 
     # Empleados con retardos consecutivos (últimos 5 días)
     fecha_inicio = hoy - timedelta(days=5)
-    empleados_retardos = []
-
-    for empleado in Empleado.objects.filter(activo=True):
-        retardos = Asistencia.objects.filter(
-            empleado=empleado,
-            fecha__gte=fecha_inicio,
-            fecha__lte=hoy,
-            tipo_movimiento=TipoMovimiento.ENTRADA,
-            retardo=True
-        ).count()
-
-        if retardos >= 3:
-            empleados_retardos.append({
-                'empleado': empleado,
-                'retardos': retardos
-            })
+    empleados_retardos = empleados_con_retardos(fecha_inicio, hoy)
 
     visitas_hoy = Visitante.objects.filter(
         fecha_visita=hoy
@@ -278,42 +338,77 @@ def dashboard_view(request):
 
     return render(request, 'attendance/dashboard.html', context)
 
+async def api_dashboard(request):
+    """Estadísticas del día del dashboard en JSON (para refrescarlo sin recargar la página)"""
+    hoy = timezone.localdate()
+
+    asistencias_hoy = Asistencia.objects.filter(
+        fecha=hoy,
+        tipo_movimiento=TipoMovimiento.ENTRADA
+    )
+    total_empleados = await Empleado.objects.filter(activo=True).acount()
+    llegaron_hoy = await asistencias_hoy.acount()
+    retardos_hoy = await asistencias_hoy.filter(retardo=True).acount()
+
+    empleados_retardos = await sync_to_async(empleados_con_retardos)(hoy - timedelta(days=5), hoy)
+
+    visitas_hoy = [
+        {
+            'nombre': visitante.nombre,
+            'empresa': visitante.empresa,
+            'departamento': visitante.departamento_visita.nombre,
+            'hora': visitante.hora_visita.strftime('%H:%M'),
+            'confirmado': visitante.confirmado,
+        }
+        async for visitante in Visitante.objects.filter(
+            fecha_visita=hoy
+        ).select_related('departamento_visita').order_by('-hora_visita')
+    ]
+
+    return JsonResponse({
+        'fecha': hoy.isoformat(),
+        'total_empleados': total_empleados,
+        'llegaron_hoy': llegaron_hoy,
+        'retardos_hoy': retardos_hoy,
+        'empleados_retardos': [
+            {
+                'nombre': item['empleado'].user.get_full_name(),
+                'codigo': item['empleado'].codigo_empleado,
+                'retardos': item['retardos'],
+            }
+            for item in empleados_retardos
+        ],
+        'visitas_hoy': visitas_hoy,
+    })
+
 # Vista de reportes
 def reporte_mensual_view(request, mes=None, anio=None):
     """Vista para consultar reportes mensuales"""
     if not mes or not anio:
-        hoy = timezone.now()
+        hoy = timezone.localdate()
         mes = hoy.month
         anio = hoy.year
-
-    # Obtener todas las asistencias del mes
-    asistencias = Asistencia.objects.filter(
-        fecha__month=mes,
-        fecha__year=anio
-    ).select_related('empleado', 'empleado__user')
-
-    # Agrupar por empleado
-    empleados_data = {}
-    for asistencia in asistencias:
-        emp_id = asistencia.empleado.id
-        if emp_id not in empleados_data:
-            empleados_data[emp_id] = {
-                'empleado': asistencia.empleado,
-                'total_dias': 0,
-                'retardos': 0,
-                'total_minutos_retardo': 0,
-            }
-
-        if asistencia.tipo_movimiento == TipoMovimiento.ENTRADA:
-            empleados_data[emp_id]['total_dias'] += 1
-            if asistencia.retardo:
-                empleados_data[emp_id]['retardos'] += 1
-                empleados_data[emp_id]['total_minutos_retardo'] += asistencia.minutos_retardo
+    elif not 1 <= mes <= 12:
+        raise Http404("Mes no válido")
+
+    # Resumen del mes con una sola consulta agrupada (solo empleados con entradas)
+    fecha_inicio = date(anio, mes, 1)
+    fecha_fin = date(anio, mes, calendar.monthrange(anio, mes)[1])
+
+    empleados_data = [
+        {
+            'empleado': resumen.empleado,
+            'total_dias': resumen.dias_asistidos,
+            'retardos': resumen.retardos,
+            'total_minutos_retardo': resumen.minutos_retardo,
+        }
+        for resumen in resumen_periodo(fecha_inicio, fecha_fin)
+    ]
 
     context = {
         'mes': mes,
         'anio': anio,
-        'empleados_data': empleados_data.values(),
+        'empleados_data': empleados_data,
         'years_disponibles': range(2024, datetime.now().year + 1), # Generacion de years
     }
 
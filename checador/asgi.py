@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'checador.settings')
 
 application = get_asgi_application()
+
+# Configuración y horarios en memoria antes de atender la primera checada
+from attendance.cache import precargar_catalogos  # noqa: E402
+
+precargar_catalogos()
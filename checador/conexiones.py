@@ -0,0 +1,76 @@
+"""
+Métricas de las conexiones persistentes a la base de datos.
+
+Con ``CONN_MAX_AGE`` cada worker reutiliza su conexión entre requests en
+lugar de pagar el handshake TLS con el MySQL administrado en cada uno.
+``ConexionInstrumentada`` se mezcla con el ``DatabaseWrapper`` del backend
+(ver ``checador.db_mysql``) para medir cuánto tarda cada conexión nueva y
+cuántos requests atiende; ``/db-status/`` lo reporta con
+``estado_conexion``.
+"""
+import threading
+import time
+
+_lock = threading.Lock()
+# Totales del proceso (todas las conexiones de todos los hilos)
+_totales = {'conexiones': 0, 'handshake_ms': 0.0, 'reutilizaciones': 0}
+
+
+class ConexionInstrumentada:
+    """Mixin para ``DatabaseWrapper`` que mide handshakes y reutilización"""
+
+    creada = None  # time.time() de la conexión actual
+    handshake_ms = None
+    reutilizaciones = 0
+    _nuevo_request = False
+
+    def get_new_connection(self, conn_params):
+        inicio = time.perf_counter()
+        conexion = super().get_new_connection(conn_params)
+        self.handshake_ms = (time.perf_counter() - inicio) * 1000
+        self.creada = time.time()
+        self.reutilizaciones = 0
+        with _lock:
+            _totales['conexiones'] += 1
+            _totales['handshake_ms'] += self.handshake_ms
+        return conexion
+
+    def close_if_unusable_or_obsolete(self):
+        # Django lo llama al empezar y al terminar cada request
+        super().close_if_unusable_or_obsolete()
+        self._nuevo_request = True
+
+    def _cursor(self, name=None):
+        if self._nuevo_request:
+            self._nuevo_request = False
+            if self.connection is not None:
+                # Primer cursor del request sobre una conexión que ya estaba abierta
+                self.reutilizaciones += 1
+                with _lock:
+                    _totales['reutilizaciones'] += 1
+        return super()._cursor(name)
+
+
+def estado_conexion(connection):
+    """Edad, reutilizaciones y handshake de la conexión del hilo, más los totales del proceso"""
+    with _lock:
+        totales = dict(_totales)
+    estado = {
+        'conn_max_age': connection.settings_dict.get('CONN_MAX_AGE'),
+        'conn_health_checks': connection.settings_dict.get('CONN_HEALTH_CHECKS'),
+        'proceso': {
+            'conexiones_abiertas': totales['conexiones'],
+            'reutilizaciones': totales['reutilizaciones'],
+            'handshake_promedio_ms': (
+                round(totales['handshake_ms'] / totales['conexiones'], 2) if totales['conexiones'] else None
+            ),
+        },
+    }
+    # ``django.db.connection`` es un proxy: se pregunta por el atributo, no por la clase
+    if getattr(connection, 'creada', None) is not None:
+        estado['conexion'] = {
+            'edad_s': round(time.time() - connection.creada, 1),
+            'reutilizaciones': connection.reutilizaciones,
+            'handshake_ms': round(connection.handshake_ms, 2),
+        }
+    return estado
@@ -0,0 +1,8 @@
+"""Backend MySQL de Django con métricas de conexión (ver checador/conexiones.py)"""
+from django.db.backends.mysql import base
+
+from checador.conexiones import ConexionInstrumentada
+
+
+class DatabaseWrapper(ConexionInstrumentada, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,37 @@
+"""
+WhiteNoise con soporte para la cadena de middleware asíncrona.
+
+``WhiteNoiseMiddleware`` (6.x) solo es síncrono: con él en ``MIDDLEWARE``
+Django adapta toda la cadena bajo ASGI y cada request corre en un hilo,
+así que las vistas asíncronas no ahorran nada. Esta subclase atiende los
+archivos estáticos igual que WhiteNoise y, para todo lo demás, deja pasar
+el request sin salir del event loop. Bajo WSGI se comporta exactamente
+igual que el original.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class EstaticosMiddleware(WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None):
+        super().__init__(get_response)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = await sync_to_async(self.find_file)(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            # Abrir el archivo y leer sus headers es E/S de disco
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
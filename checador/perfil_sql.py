@@ -0,0 +1,125 @@
+"""
+Perfil de las consultas SQL de cada request.
+
+``PerfilSQLMiddleware`` es opcional (``PERFIL_SQL=True``): en una fracción
+de los requests (``PERFIL_SQL_MUESTREO``) cuenta las consultas, suma su
+tiempo y guarda las más lentas y las repetidas (la firma de un N+1). Si el
+request rebasa ``PERFIL_SQL_MAX_QUERIES`` o ``PERFIL_SQL_MAX_MS`` deja una
+línea de log con un JSON; con ``PERFIL_SQL_HEADER`` además responde el
+header ``Server-Timing`` que muestran las herramientas del navegador.
+
+``presupuesto_queries`` usa el mismo perfil para exigir un máximo de
+consultas a un bloque (ver los presupuestos por vista en attendance/tests.py).
+"""
+import json
+import logging
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class PerfilSQL:
+    """``execute_wrapper`` que registra (ms, sql) de cada consulta en todas las conexiones"""
+
+    def __init__(self):
+        self.consultas = []
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas.append(((time.perf_counter() - inicio) * 1000, sql))
+
+    @contextmanager
+    def activo(self):
+        with ExitStack() as pila:
+            for alias in connections:
+                pila.enter_context(connections[alias].execute_wrapper(self))
+            yield self
+
+    @property
+    def total(self):
+        return len(self.consultas)
+
+    @property
+    def ms(self):
+        return sum(ms for ms, _ in self.consultas)
+
+    def lentas(self, cantidad=3):
+        return sorted(self.consultas, key=lambda c: c[0], reverse=True)[:cantidad]
+
+    def repetidas(self, cantidad=3):
+        """Sentencias ejecutadas más de una vez, de la más repetida a la menos"""
+        conteo = Counter(sql for _, sql in self.consultas)
+        return [(sql, veces) for sql, veces in conteo.most_common(cantidad) if veces > 1]
+
+    def resumen(self, cantidad=3):
+        return {
+            'consultas': self.total,
+            'db_ms': round(self.ms, 1),
+            'lentas': [{'ms': round(ms, 1), 'sql': sql[:500]} for ms, sql in self.lentas(cantidad)],
+            'repetidas': [{'veces': veces, 'sql': sql[:500]} for sql, veces in self.repetidas(cantidad)],
+        }
+
+
+@contextmanager
+def presupuesto_queries(maximo, etiqueta='Bloque'):
+    """
+    Lanza AssertionError si el bloque ejecuta más de ``maximo`` consultas.
+
+    A diferencia de ``assertNumQueries`` acepta cualquier cantidad hasta el
+    máximo, así que una optimización no rompe el presupuesto pero un N+1 sí.
+    """
+    perfil = PerfilSQL()
+    with perfil.activo():
+        yield perfil
+    if perfil.total > maximo:
+        raise AssertionError(
+            f"{etiqueta}: {perfil.total} consultas (presupuesto {maximo})\n"
+            + json.dumps(perfil.resumen(), ensure_ascii=False, indent=2)
+        )
+
+
+class PerfilSQLMiddleware:
+    """
+    Perfil SQL por request con muestreo, log de requests pesados y header Server-Timing.
+
+    Solo síncrono: ``connections`` es por hilo y las vistas asíncronas hacen
+    sus consultas en el hilo de ``sync_to_async``, fuera del alcance de un
+    ``execute_wrapper`` instalado en el hilo del event loop. Bajo ASGI Django
+    adapta la cadena y la vista corre completa en un hilo, donde sí se mide.
+    """
+
+    sync_capable = True
+    async_capable = False
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFIL_SQL', False):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.muestreo = settings.PERFIL_SQL_MUESTREO
+        self.max_queries = settings.PERFIL_SQL_MAX_QUERIES
+        self.max_ms = settings.PERFIL_SQL_MAX_MS
+        self.header = settings.PERFIL_SQL_HEADER
+
+    def __call__(self, request):
+        if random.random() >= self.muestreo:
+            return self.get_response(request)
+        perfil = PerfilSQL()
+        with perfil.activo():
+            response = self.get_response(request)
+        if perfil.total > self.max_queries or perfil.ms > self.max_ms:
+            datos = {'metodo': request.method, 'ruta': request.path, 'status': response.status_code}
+            datos.update(perfil.resumen())
+            logger.warning(f"🐢 Request con SQL pesado: {json.dumps(datos, ensure_ascii=False)}")
+        if self.header:
+            response.headers['Server-Timing'] = f'db;dur={perfil.ms:.1f};desc="{perfil.total} consultas"'
+        return response
@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import environ
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -46,8 +47,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Inactivo salvo con PERFIL_SQL=True
+    'checador.perfil_sql.PerfilSQLMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise que no obliga a adaptar la cadena a síncrona bajo ASGI
+    'checador.estaticos.EstaticosMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -82,7 +86,8 @@ WSGI_APPLICATION = 'checador.wsgi.application'
 print("OJO....Base de Datos Digital Ocean....OJO")
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.mysql",
+        # Backend MySQL de Django con métricas de conexión para /db-status/
+        "ENGINE": "checador.db_mysql",
         "NAME": env.str('DATABASE', default='db'),
         "USER": env.str('USERNAME', default='user'),
         "PASSWORD": env.str('PASSWORD', default='pass'),
@@ -92,6 +97,12 @@ DATABASES = {
             'ssl_mode': env.str('SSLMODE', default='REQUIRED'),
             'connect_timeout': 10,  # Timeout de conexión en segundos
         },
+        # Conexiones persistentes: cada worker reutiliza la suya hasta CONN_MAX_AGE
+        # segundos en lugar de repetir el handshake TLS en cada request (0 = cerrar
+        # al terminar cada request). Con CONN_HEALTH_CHECKS se verifica antes de
+        # reutilizarla, por si el servidor la cerró por inactividad.
+        "CONN_MAX_AGE": env.int('CONN_MAX_AGE', default=60),
+        "CONN_HEALTH_CHECKS": env.bool('CONN_HEALTH_CHECKS', default=True),
     }
 }
 
@@ -179,6 +190,51 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = 'apikey'  # Cambiar
 EMAIL_HOST_PASSWORD = env.str('EMAIL_HOST_PASSWORD')  # Usar App Password de Gmail
 DEFAULT_FROM_EMAIL = 'checadorKasu@transportekasu.com.mx'
+EMAIL_TIMEOUT = env.int('EMAIL_TIMEOUT', default=30)  # Segundos por operación SMTP
+
+# /api/checkin/lote/: tokens de las tablets (uno por dispositivo, header X-Tablet-Token;
+# sin tokens el endpoint rechaza todo; cada tablet guarda el suyo al abrir
+# /#tablet_token=<token>) y antigüedad máxima en minutos de una checada guardada sin conexión
+TABLET_TOKENS = env.list('TABLET_TOKENS', default=[])
+LOTE_ANTIGUEDAD_MAXIMA = env.int('LOTE_ANTIGUEDAD_MAXIMA', default=120)
+
+# El caché default es local a cada worker. "compartido" guarda las generaciones que
+# invalidan los cachés en memoria de QR y catálogos en todos los workers: una tabla de
+# la base de datos (la crea la migración 0011) o, p. ej., redis://host:6379/1
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'compartido': env.cache_url('CACHE_COMPARTIDO_URL', default='dbcache://attendance_cache_compartido'),
+}
+
+# Caché de resolución de QR de empleados (segundos que vive cada entrada por worker)
+QR_CACHE_TTL = env.int('QR_CACHE_TTL', default=300)
+# Configuración y tipos de horario en memoria; editarlos los invalida en todos los
+# workers a través del caché compartido, el TTL es solo un respaldo
+CATALOGOS_CACHE_TTL = env.int('CATALOGOS_CACHE_TTL', default=3600)
+
+# /ready/ y /db-status/: segundos que se reutiliza el resultado de las verificaciones
+# de base de datos, storage y SMTP, y timeout de cada una
+DISPONIBILIDAD_TTL = env.int('DISPONIBILIDAD_TTL', default=15)
+DISPONIBILIDAD_TIMEOUT = env.int('DISPONIBILIDAD_TIMEOUT', default=3)
+
+# Perfil SQL por request (opcional): fracción de requests perfilados, umbrales para
+# dejar en el log las consultas más lentas y repetidas, y header Server-Timing
+PERFIL_SQL = env.bool('PERFIL_SQL', default=False)
+PERFIL_SQL_MUESTREO = env.float('PERFIL_SQL_MUESTREO', default=1.0)
+PERFIL_SQL_MAX_QUERIES = env.int('PERFIL_SQL_MAX_QUERIES', default=30)
+PERFIL_SQL_MAX_MS = env.int('PERFIL_SQL_MAX_MS', default=200)
+PERFIL_SQL_HEADER = env.bool('PERFIL_SQL_HEADER', default=DEBUG)
+
+# Directorio compartido por los workers de gunicorn para sumar sus métricas en /metrics
+# (vacío: cada worker reporta solo las suyas)
+METRICAS_DIR = env('METRICAS_DIR', default=os.path.join(tempfile.gettempdir(), 'checador_metricas'))
+
+# Imágenes de QR: se generan bajo demanda en /qr/<tipo>/<uuid>.<png|svg>.
+# Con QR_GUARDAR_EN_STORAGE=False ya no se generan ni suben a Spaces al guardar.
+QR_GUARDAR_EN_STORAGE = env.bool('QR_GUARDAR_EN_STORAGE', default=True)
+QR_CACHE_TAMANO = env.int('QR_CACHE_TAMANO', default=512)  # Imágenes en memoria por worker
+# URL pública del sitio para enlaces absolutos en correos (p. ej. https://checador.ejemplo.com)
+SITIO_URL = env.str('SITIO_URL', default='')
 
 # Celery deshabilitado. Los reportes periódicos se ejecutan vía GitHub Actions.
 # CELERY_BROKER_URL = ''
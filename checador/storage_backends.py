@@ -231,39 +231,70 @@ class FileUploadMiddleware:
 
 # === SEÑALES PARA MANEJO AUTOMÁTICO ===
 
-from django.db.models.signals import post_delete, pre_save
-from django.dispatch import receiver
+from functools import partial
 
-@receiver(post_delete)
-def delete_file_on_model_delete(sender, instance, **kwargs):
+from django.db import models
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+
+ORIGINAL_FILES_ATTR = '_archivos_originales'
+
+def _file_fields(model):
+    return [f for f in model._meta.concrete_fields if isinstance(f, models.FileField)]
+
+def _file_name(value):
+    return getattr(value, 'name', value) or ''
+
+def remember_original_files(sender, instance, **kwargs):
+    """
+    Guarda los nombres de archivo con los que se cargó (o se guardó) la instancia,
+    para detectar cambios sin volver a consultar la base de datos
+    """
+    originales = {}
+    for field in _file_fields(sender):
+        # Los campos diferidos (only/defer) no están en __dict__ y se ignoran
+        if field.attname in instance.__dict__:
+            originales[field.attname] = _file_name(instance.__dict__[field.attname])
+    setattr(instance, ORIGINAL_FILES_ATTR, originales)
+
+def delete_file_on_model_delete(sender, instance, delete_file=delete_file_from_storage, **kwargs):
     """
     Elimina archivos del storage cuando se elimina un modelo
     """
-    # Buscar campos de archivo en el modelo
-    for field in instance._meta.fields:
-        if hasattr(field, 'upload_to'):
-            file_field = getattr(instance, field.name)
-            if file_field:
-                delete_file_from_storage(file_field.name)
-
-@receiver(pre_save)
-def delete_old_file_on_change(sender, instance, **kwargs):
+    for field in _file_fields(sender):
+        file_field = getattr(instance, field.name)
+        if file_field:
+            delete_file(file_field.name)
+
+def delete_old_file_on_change(sender, instance, delete_file=delete_file_from_storage, **kwargs):
     """
     Elimina archivo anterior cuando se actualiza con uno nuevo
     """
-    if not instance.pk:
+    if instance._state.adding:
         return  # Es un nuevo objeto, no hay archivo anterior
 
-    try:
-        old_instance = sender.objects.get(pk=instance.pk)
-    except sender.DoesNotExist:
-        return
-
-    # Verificar campos de archivo
-    for field in instance._meta.fields:
-        if hasattr(field, 'upload_to'):
-            old_file = getattr(old_instance, field.name)
-            new_file = getattr(instance, field.name)
-
-            if old_file and old_file != new_file:
-                delete_file_from_storage(old_file.name)
\ No newline at end of file
+    originales = getattr(instance, ORIGINAL_FILES_ATTR, {})
+    for field in _file_fields(sender):
+        if field.attname not in originales:
+            continue
+        old_name = originales[field.attname]
+        new_name = _file_name(getattr(instance, field.attname))
+        if old_name and old_name != new_name:
+            delete_file(old_name)
+
+def connect_file_cleanup(model, delete_file=delete_file_from_storage):
+    """
+    Conecta la limpieza de archivos del storage para un modelo con FileField/ImageField.
+    Solo los modelos registrados pagan el costo de las señales. ``delete_file``
+    recibe el nombre del archivo a borrar (por defecto se borra en el momento).
+    """
+    uid = f'file_cleanup_{model._meta.label_lower}'
+    post_init.connect(remember_original_files, sender=model, dispatch_uid=uid, weak=False)
+    post_save.connect(remember_original_files, sender=model, dispatch_uid=uid, weak=False)
+    pre_save.connect(
+        partial(delete_old_file_on_change, delete_file=delete_file),
+        sender=model, dispatch_uid=uid, weak=False
+    )
+    post_delete.connect(
+        partial(delete_file_on_model_delete, delete_file=delete_file),
+        sender=model, dispatch_uid=uid, weak=False
+    )
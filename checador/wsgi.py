@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'checador.settings')
 
 application = get_wsgi_application()
+
+# Configuración y horarios en memoria antes de atender la primera checada
+from attendance.cache import precargar_catalogos  # noqa: E402
+
+precargar_catalogos()
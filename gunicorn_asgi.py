@@ -0,0 +1,23 @@
+# Perfil ASGI: gunicorn administra workers de uvicorn que atienden las vistas
+# asíncronas (/api/checkin/, /api/dashboard/) sin bloquear el worker mientras
+# esperan a la base de datos. Toda la cadena de middleware es asíncrona
+# (ver checador/estaticos.py); activar PERFIL_SQL la vuelve síncrona.
+#
+#   gunicorn checador.asgi:application -c gunicorn_asgi.py
+#
+# Con ASGI cada request corre en su propio hilo de sync_to_async, así que las
+# conexiones persistentes no se reutilizan entre requests (y quedarían
+# abiertas): este perfil fuerza CONN_MAX_AGE=0.
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8080')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = "uvicorn_worker.UvicornWorker"
+timeout = 30
+graceful_timeout = 10
+keepalive = 5
+errorlog = "-"
+accesslog = "-"
+loglevel = "info"
+raw_env = ["CONN_MAX_AGE=0"]
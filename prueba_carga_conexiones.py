@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+"""
+Prueba de carga: latencia de escaneo con y sin reutilización de conexiones.
+
+Ejecuta N requests dentro del proceso con el cliente de pruebas de Django
+contra la base de datos configurada, cerrando las conexiones viejas antes y
+después de cada uno igual que el handler de gunicorn. Primero con
+CONN_MAX_AGE=0 (una conexión y un handshake TLS por request) y luego con
+conexiones persistentes, y compara p50/p99.
+
+    python prueba_carga_conexiones.py --requests 200
+    python prueba_carga_conexiones.py --qr <qr_uuid de un empleado de prueba> --hilos 4
+
+Sin --qr se mide /db-status/ (conexión + SELECT 1). Con --qr se hace POST a
+/api/checkin/ como la tablet: REGISTRA CHECADAS REALES, úsalo con un
+empleado de prueba o en staging.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+import django
+
+
+def percentil(valores, p):
+    return statistics.quantiles(valores, n=100, method='inclusive')[p - 1]
+
+
+def medir(total, hilos, conn_max_age, qr):
+    from django.db import close_old_connections, connections
+    from django.test import Client
+
+    # connect() lee CONN_MAX_AGE de settings_dict al abrir cada conexión
+    for alias in connections:
+        connections.settings[alias]['CONN_MAX_AGE'] = conn_max_age
+    connections.close_all()
+
+    latencias = []
+    lock = threading.Lock()
+    por_hilo = [total // hilos + (1 if i < total % hilos else 0) for i in range(hilos)]
+
+    def trabajador(cantidad):
+        cliente = Client()
+        propias = []
+        for _ in range(cantidad):
+            inicio = time.perf_counter()
+            # El cliente de pruebas desconecta close_old_connections de las señales de request
+            close_old_connections()
+            if qr:
+                respuesta = cliente.post('/api/checkin/', {'qr_code': qr}, content_type='application/json')
+            else:
+                respuesta = cliente.get('/db-status/')
+            close_old_connections()
+            propias.append((time.perf_counter() - inicio) * 1000)
+            if respuesta.status_code >= 500:
+                print(f"  ✗ HTTP {respuesta.status_code}: {respuesta.content[:200]!r}")
+        connections.close_all()
+        with lock:
+            latencias.extend(propias)
+
+    threads = [threading.Thread(target=trabajador, args=(cantidad,)) for cantidad in por_hilo]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencias
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--requests', type=int, default=200, help='Requests por escenario')
+    parser.add_argument('--hilos', type=int, default=1, help='Hilos concurrentes (uno por worker simulado)')
+    parser.add_argument('--conn-max-age', type=int, default=60, help='CONN_MAX_AGE del escenario con reutilización')
+    parser.add_argument('--qr', help='qr_uuid de un empleado de prueba para medir /api/checkin/')
+    args = parser.parse_args()
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'checador.settings')
+    django.setup()
+
+    from django.conf import settings
+    # El cliente de pruebas usa el host "testserver"
+    if '*' not in settings.ALLOWED_HOSTS:
+        settings.ALLOWED_HOSTS.append('testserver')
+
+    destino = '/api/checkin/' if args.qr else '/db-status/'
+    print(f"Prueba de carga contra {destino}: {args.requests} requests, {args.hilos} hilo(s)")
+
+    resultados = {}
+    for etiqueta, conn_max_age in (('Sin reutilización (CONN_MAX_AGE=0)', 0),
+                                   (f'Con reutilización (CONN_MAX_AGE={args.conn_max_age})', args.conn_max_age)):
+        latencias = medir(args.requests, args.hilos, conn_max_age, args.qr)
+        if len(latencias) < 2:
+            print("Se necesitan al menos 2 requests por escenario")
+            sys.exit(1)
+        resultados[conn_max_age] = latencias
+        print(
+            f"{etiqueta}: p50 {percentil(latencias, 50):.1f} ms | p99 {percentil(latencias, 99):.1f} ms | "
+            f"máx {max(latencias):.1f} ms"
+        )
+
+    sin, con = resultados[0], resultados[args.conn_max_age]
+    print(f"Mejora en p50: {percentil(sin, 50) - percentil(con, 50):.1f} ms por request")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+"""
+Benchmark de escaneos concurrentes contra uno o más servidores.
+
+Sirve para comparar el despliegue síncrono (gunicorn + workers sync) con el
+perfil ASGI (gunicorn_asgi.py, workers de uvicorn): se levantan ambos con la
+misma base de datos y el mismo número de workers y se les manda la misma
+carga de POST /api/checkin/ desde varios hilos.
+
+    gunicorn checador.wsgi:application --bind 127.0.0.1:8001 --workers 2
+    PORT=8002 WEB_CONCURRENCY=2 gunicorn checador.asgi:application -c gunicorn_asgi.py
+    python prueba_concurrencia_checadas.py http://127.0.0.1:8001 http://127.0.0.1:8002 \\
+        --qr <qr_uuid> --qr <qr_uuid> --concurrencia 32 --requests 500
+
+REGISTRA CHECADAS REALES: úsalo con empleados de prueba o en staging.
+"""
+import argparse
+import http.cookiejar
+import json
+import statistics
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from itertools import cycle
+
+
+def token_csrf(base):
+    """Obtiene la cookie csrftoken de la página de la tablet"""
+    cookies = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(cookies))
+    opener.open(f"{base}/", timeout=10).read()
+    for cookie in cookies:
+        if cookie.name == 'csrftoken':
+            return cookie.value
+    raise SystemExit(f"{base} no regresó la cookie csrftoken")
+
+
+def escanear(base, token, qr_code):
+    peticion = urllib.request.Request(
+        f"{base}/api/checkin/",
+        data=json.dumps({'qr_code': qr_code}).encode(),
+        headers={
+            'Content-Type': 'application/json',
+            'X-CSRFToken': token,
+            'Cookie': f'csrftoken={token}',
+            'Referer': f'{base}/',
+        },
+        method='POST',
+    )
+    inicio = time.perf_counter()
+    try:
+        with urllib.request.urlopen(peticion, timeout=60) as respuesta:
+            respuesta.read()
+            estado = respuesta.status
+    except urllib.error.HTTPError as e:
+        estado = e.code
+    except OSError as e:
+        estado = type(e).__name__
+    return (time.perf_counter() - inicio) * 1000, estado
+
+
+def medir(base, qrs, total, concurrencia):
+    token = token_csrf(base)
+    codigos = cycle(qrs)
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+        resultados = list(pool.map(lambda qr: escanear(base, token, qr), [next(codigos) for _ in range(total)]))
+    segundos = time.perf_counter() - inicio
+
+    latencias = sorted(ms for ms, _ in resultados)
+    percentiles = statistics.quantiles(latencias, n=100, method='inclusive')
+    estados = Counter(estado for _, estado in resultados)
+    print(
+        f"{base}: {total / segundos:.1f} escaneos/s | p50 {percentiles[49]:.0f} ms | "
+        f"p99 {percentiles[98]:.0f} ms | respuestas {dict(estados)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('servidores', nargs='+', help='URL base de cada servidor a comparar')
+    parser.add_argument('--qr', action='append', required=True, help='qr_uuid de un empleado de prueba (se puede repetir)')
+    parser.add_argument('--requests', type=int, default=300, help='Escaneos por servidor')
+    parser.add_argument('--concurrencia', type=int, default=16, help='Escaneos simultáneos')
+    args = parser.parse_args()
+
+    print(f"{args.requests} escaneos por servidor, {args.concurrencia} simultáneos, {len(args.qr)} gafete(s)")
+    for base in args.servidores:
+        medir(base.rstrip('/'), args.qr, args.requests, args.concurrencia)
+
+
+if __name__ == '__main__':
+    main()